@@ -25,6 +25,75 @@ class Settings(BaseSettings):
     ML_AUTH_URL: str = "https://auth.mercadolivre.com.br/authorization"
     ML_TOKEN_URL: str = "https://api.mercadolibre.com/oauth/token"
     ML_API_URL: str = "https://api.mercadolibre.com"
+    # Renova o access_token quando faltar menos que isso (segundos) para expirar
+    ML_TOKEN_REFRESH_MARGIN: int = int(os.getenv("ML_TOKEN_REFRESH_MARGIN", "300"))
+    # Tempo que um token fica no cache do processo antes de ser relido de tokens_ml
+    # (login/refresh feitos por outra instância valem em até ML_TOKEN_CACHE_TTL segundos)
+    ML_TOKEN_CACHE_TTL: int = int(os.getenv("ML_TOKEN_CACHE_TTL", "60"))
+    ML_TOKEN_CACHE_SIZE: int = int(os.getenv("ML_TOKEN_CACHE_SIZE", "10000"))
+    
+    # Cliente HTTP compartilhado (pool de conexões com a API do ML)
+    ML_HTTP_TIMEOUT: float = float(os.getenv("ML_HTTP_TIMEOUT", "30"))
+    ML_HTTP_MAX_CONNECTIONS: int = int(os.getenv("ML_HTTP_MAX_CONNECTIONS", "100"))
+    ML_HTTP_MAX_KEEPALIVE: int = int(os.getenv("ML_HTTP_MAX_KEEPALIVE", "20"))
+    ML_HTTP2_ENABLED: bool = os.getenv("ML_HTTP2_ENABLED", "True").lower() == "true"
+    
+    # Cota da aplicação na API do ML (token bucket por processo)
+    ML_RATE_LIMIT_PER_SECOND: float = float(os.getenv("ML_RATE_LIMIT_PER_SECOND", "20"))
+    ML_RATE_LIMIT_BURST: int = int(os.getenv("ML_RATE_LIMIT_BURST", "20"))
+    # Limite por vendedor (token de acesso), para um tenant não consumir a cota inteira
+    ML_SELLER_RATE_LIMIT_PER_SECOND: float = float(os.getenv("ML_SELLER_RATE_LIMIT_PER_SECOND", "5"))
+    ML_SELLER_RATE_LIMIT_BURST: int = int(os.getenv("ML_SELLER_RATE_LIMIT_BURST", "10"))
+    # Retry de 429 (respeita Retry-After) e 5xx/erros de rede em métodos idempotentes
+    ML_RETRY_MAX_ATTEMPTS: int = int(os.getenv("ML_RETRY_MAX_ATTEMPTS", "4"))
+    ML_RETRY_BASE_SECONDS: float = float(os.getenv("ML_RETRY_BASE_SECONDS", "0.5"))
+    ML_RETRY_MAX_SECONDS: float = float(os.getenv("ML_RETRY_MAX_SECONDS", "30"))
+    
+    # Cache de dados de referência do ML (listing types, exposures, domínios)
+    ML_SITE_ID: str = os.getenv("ML_SITE_ID", "MLB")
+    ML_REFERENCE_CACHE_TTL: int = int(os.getenv("ML_REFERENCE_CACHE_TTL", "21600"))
+    # Depois do TTL, ainda responde do cache por este tempo enquanto revalida em background
+    ML_REFERENCE_CACHE_STALE: int = int(os.getenv("ML_REFERENCE_CACHE_STALE", "86400"))
+    ML_REFERENCE_CACHE_WARMUP: bool = os.getenv("ML_REFERENCE_CACHE_WARMUP", "True").lower() == "true"
+    
+    # Cache curto de BuyBox (price_to_win, produto, competidores) por item/produto
+    ML_BUYBOX_CACHE_TTL: float = float(os.getenv("ML_BUYBOX_CACHE_TTL", "45"))
+    ML_BUYBOX_CACHE_SIZE: int = int(os.getenv("ML_BUYBOX_CACHE_SIZE", "5000"))
+    # Análise de BuyBox em lote (POST /ml/buybox/analysis/batch)
+    ML_BUYBOX_BATCH_MAX_ITEMS: int = int(os.getenv("ML_BUYBOX_BATCH_MAX_ITEMS", "1000"))
+    ML_BUYBOX_BATCH_CONCURRENCY: int = int(os.getenv("ML_BUYBOX_BATCH_CONCURRENCY", "10"))
+    
+    # Histórico de BuyBox (buybox_snapshots): captura agendada de price_to_win/concorrência
+    # Desligado por padrão: habilite em UMA instância (cada instância ligada roda o ciclo inteiro)
+    BUYBOX_SNAPSHOT_ENABLED: bool = os.getenv("BUYBOX_SNAPSHOT_ENABLED", "False").lower() == "true"
+    BUYBOX_SNAPSHOT_INTERVAL_MINUTES: int = int(os.getenv("BUYBOX_SNAPSHOT_INTERVAL_MINUTES", "60"))
+    BUYBOX_SNAPSHOT_CONCURRENCY: int = int(os.getenv("BUYBOX_SNAPSHOT_CONCURRENCY", "5"))
+    BUYBOX_SNAPSHOT_INSERT_BATCH: int = int(os.getenv("BUYBOX_SNAPSHOT_INSERT_BATCH", "500"))
+    BUYBOX_SNAPSHOT_RETENTION_DAYS: int = int(os.getenv("BUYBOX_SNAPSHOT_RETENTION_DAYS", "90"))
+    
+    # Sincronização de anúncios
+    ML_SYNC_CONCURRENCY: int = int(os.getenv("ML_SYNC_CONCURRENCY", "10"))
+    ML_SYNC_UPSERT_BATCH: int = int(os.getenv("ML_SYNC_UPSERT_BATCH", "300"))
+    
+    # Fila de webhooks do ML (ml_webhook_queue) e workers
+    WEBHOOK_WORKERS: int = int(os.getenv("WEBHOOK_WORKERS", "4"))
+    WEBHOOK_MAX_ATTEMPTS: int = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "5"))
+    WEBHOOK_POLL_INTERVAL: float = float(os.getenv("WEBHOOK_POLL_INTERVAL", "1.0"))
+    WEBHOOK_CLAIM_BATCH: int = int(os.getenv("WEBHOOK_CLAIM_BATCH", "50"))
+    # Notificações de items do mesmo vendedor resolvidas juntas (multiget aceita 20 IDs)
+    WEBHOOK_BATCH_SIZE: int = int(os.getenv("WEBHOOK_BATCH_SIZE", "20"))
+    WEBHOOK_LOCK_TIMEOUT: int = int(os.getenv("WEBHOOK_LOCK_TIMEOUT", "300"))
+    WEBHOOK_RETRY_BASE_SECONDS: float = float(os.getenv("WEBHOOK_RETRY_BASE_SECONDS", "5"))
+    WEBHOOK_RETRY_MAX_SECONDS: float = float(os.getenv("WEBHOOK_RETRY_MAX_SECONDS", "900"))
+    # Notificações repetidas de (topic, resource) esperam esta janela e viram um único job
+    WEBHOOK_DEBOUNCE_SECONDS: int = int(os.getenv("WEBHOOK_DEBOUNCE_SECONDS", "2"))
+    WEBHOOK_DEBOUNCE_MAX_SECONDS: int = int(os.getenv("WEBHOOK_DEBOUNCE_MAX_SECONDS", "30"))
+    
+    # Pool de threads das consultas ao Supabase (supabase-py é síncrono)
+    DB_MAX_WORKERS: int = int(os.getenv("DB_MAX_WORKERS", "20"))
+    
+    # Movimentação de estoque em lote (POST /estoque/movimentacao/lote)
+    ESTOQUE_LOTE_MAX_ITENS: int = int(os.getenv("ESTOQUE_LOTE_MAX_ITENS", "1000"))
     
     # Render Configuration
     RENDER_SERVICE_ID: str = os.getenv("RENDER_SERVICE_ID", "")
@@ -57,6 +126,14 @@ class Settings(BaseSettings):
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     
+    # Pool de hash de senhas (bcrypt em register/login)
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+    PASSWORD_HASH_MAX_QUEUE: int = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "64"))
+    
+    # Cache de usuários autenticados (get_current_user)
+    AUTH_USER_CACHE_TTL: int = int(os.getenv("AUTH_USER_CACHE_TTL", "60"))
+    AUTH_USER_CACHE_SIZE: int = int(os.getenv("AUTH_USER_CACHE_SIZE", "10000"))
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -4,11 +4,53 @@ Funções auxiliares para proteção de rotas
 """
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from typing import Any, Dict, Optional
 import jwt
 from app.config.settings import settings, get_supabase_client
+from app.services.db_executor import run_query
+from app.utils.cache import TTLCache
 
 security = HTTPBearer()
 
+# Registros de usuarios por id: evita um SELECT em cada request autenticado
+# (suspensões feitas fora da API valem em até AUTH_USER_CACHE_TTL segundos)
+_usuarios_cache = TTLCache(
+    maxsize=settings.AUTH_USER_CACHE_SIZE,
+    ttl=settings.AUTH_USER_CACHE_TTL
+)
+
+
+async def carregar_usuario(user_id: str) -> Optional[Dict[str, Any]]:
+    """Busca o usuário pelo id, usando o cache em memória"""
+    usuario = _usuarios_cache.get(user_id)
+    if usuario is not None:
+        return usuario
+    
+    supabase = get_supabase_client()
+    result = await run_query(supabase.table("usuarios").select("*").eq("id", user_id).maybe_single())
+    
+    if not result or not result.data:
+        return None
+    
+    atualizar_usuario_cache(result.data)
+    return result.data
+
+
+def atualizar_usuario_cache(usuario: Dict[str, Any]) -> None:
+    """
+    Atualiza o cache com um registro lido do banco
+    Usuário suspenso sai do cache para a próxima request reler o status
+    """
+    if usuario.get("status") == "suspended":
+        invalidar_usuario(usuario["id"])
+    else:
+        _usuarios_cache.set(usuario["id"], usuario)
+
+
+def invalidar_usuario(user_id: str) -> None:
+    """Remove o usuário do cache (suspensão, alteração de dados)"""
+    _usuarios_cache.invalidate(user_id)
+
 
 def decode_token(token: str) -> dict:
     """Decodifica JWT token"""
@@ -29,16 +71,15 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     token = credentials.credentials
     payload = decode_token(token)
     
-    supabase = get_supabase_client()
-    result = supabase.table("usuarios").select("*").eq("id", payload["user_id"]).maybe_single().execute()
+    usuario = await carregar_usuario(payload["user_id"])
     
-    if not result or not result.data:
+    if not usuario:
         raise HTTPException(status_code=401, detail="Usuário não encontrado")
     
-    if result.data.get("status") == "suspended":
+    if usuario.get("status") == "suspended":
         raise HTTPException(status_code=403, detail="Usuário desativado")
     
-    return result.data
+    return dict(usuario)
 
 
 async def get_current_user_id(current_user: dict = Depends(get_current_user)) -> str:
@@ -8,8 +8,13 @@ from pydantic import BaseModel, EmailStr
 from datetime import datetime, timedelta
 from typing import Optional
 import jwt
-import bcrypt
 from app.config.settings import settings, get_supabase_client
+from app.middleware.auth import atualizar_usuario_cache, carregar_usuario
+from app.services.password_hasher import (
+    FilaSenhasCheiaError,
+    hash_password_async,
+    verify_password_async
+)
 
 router = APIRouter(prefix="/auth", tags=["Autenticação"])
 security = HTTPBearer()
@@ -33,16 +38,6 @@ class TokenResponse(BaseModel):
     user: dict
 
 
-def hash_password(password: str) -> str:
-    """Hash de senha usando bcrypt"""
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-
-
-def verify_password(password: str, hashed: str) -> bool:
-    """Verifica senha contra hash"""
-    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
-
-
 def create_access_token(user_id: str, email: str) -> str:
     """Cria JWT token"""
     payload = {
@@ -69,13 +64,12 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     token = credentials.credentials
     payload = decode_token(token)
     
-    supabase = get_supabase_client()
-    result = supabase.table("usuarios").select("*").eq("id", payload["user_id"]).maybe_single().execute()
+    usuario = await carregar_usuario(payload["user_id"])
     
-    if not result.data:
+    if not usuario:
         raise HTTPException(status_code=401, detail="Usuário não encontrado")
     
-    return result.data
+    return dict(usuario)
 
 
 @router.post("/register", response_model=TokenResponse, status_code=201)
@@ -101,7 +95,10 @@ async def register(data: UserRegister):
         print(f"Erro ao verificar email existente: {e}")
     
     # Cria usuário
-    hashed_password = hash_password(data.password)
+    try:
+        hashed_password = await hash_password_async(data.password)
+    except FilaSenhasCheiaError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     user_data = {
         "email": data.email,
         "password_hash": hashed_password,
@@ -156,9 +153,17 @@ async def login(data: UserLogin):
     user = result.data
     
     # Verifica senha
-    if not verify_password(data.password, user["password_hash"]):
+    try:
+        senha_valida = await verify_password_async(data.password, user["password_hash"])
+    except FilaSenhasCheiaError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    if not senha_valida:
         raise HTTPException(status_code=401, detail="Credenciais inválidas")
     
+    # Registro recém-lido: renova o cache (ou remove, se suspenso)
+    atualizar_usuario_cache(user)
+    
     # Verifica se está ativo
     if user.get("status") == "suspended":
         raise HTTPException(status_code=403, detail="Usuário desativado")
@@ -5,10 +5,12 @@ from fastapi import APIRouter, HTTPException, Query, Form, Request
 from fastapi.responses import RedirectResponse, HTMLResponse
 import httpx
 from typing import Optional
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from urllib.parse import quote
 
 from app.config.settings import settings, get_supabase_client
+from app.services.ml_http_client import get_ml_http_client
+from app.services.ml_token_manager import get_ml_token_manager
 
 router = APIRouter(prefix="/auth/ml", tags=["Mercado Livre Auth"])
 
@@ -116,23 +118,23 @@ async def mercadolivre_callback(
     print(f"[DEBUG] =======================================")
     
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                settings.ML_TOKEN_URL,
-                data=token_data,  # Usar 'data' em vez de 'json' para application/x-www-form-urlencoded
-                headers={
-                    "Accept": "application/json",
-                    "Content-Type": "application/x-www-form-urlencoded"
-                }
-            )
-            print(f"[DEBUG] ============ ML RESPONSE ============")
-            print(f"[DEBUG] Status: {response.status_code}")
-            print(f"[DEBUG] Headers: {dict(response.headers)}")
-            print(f"[DEBUG] Body: {response.text}")
-            print(f"[DEBUG] ====================================")
-            
-            response.raise_for_status()
-            token_response = response.json()
+        client = get_ml_http_client()
+        response = await client.post(
+            settings.ML_TOKEN_URL,
+            data=token_data,  # Usar 'data' em vez de 'json' para application/x-www-form-urlencoded
+            headers={
+                "Accept": "application/json",
+                "Content-Type": "application/x-www-form-urlencoded"
+            }
+        )
+        print(f"[DEBUG] ============ ML RESPONSE ============")
+        print(f"[DEBUG] Status: {response.status_code}")
+        print(f"[DEBUG] Headers: {dict(response.headers)}")
+        print(f"[DEBUG] Body: {response.text}")
+        print(f"[DEBUG] ====================================")
+        
+        response.raise_for_status()
+        token_response = response.json()
         
         # Extrair informações do token
         access_token = token_response.get("access_token")
@@ -150,7 +152,7 @@ async def mercadolivre_callback(
         # Conforme docs ML: https://developers.mercadolivre.com.br/pt_br/autenticacao-e-autorizacao
         # Usamos upsert com on_conflict no user_id (requer UNIQUE constraint no banco)
         supabase = get_supabase_client()
-        supabase.table("tokens_ml").upsert({
+        token_row = {
             "user_id": state,  # Nosso user_id interno
             "ml_user_id": ml_user_id,
             "access_token": access_token,
@@ -159,7 +161,12 @@ async def mercadolivre_callback(
             "nickname": user_info.get("nickname"),
             "email": user_info.get("email"),
             "site_id": user_info.get("site_id", "MLB")
-        }, on_conflict="user_id").execute()
+        }
+        supabase.table("tokens_ml").upsert(token_row, on_conflict="user_id").execute()
+        
+        # Novo login substitui o token em cache
+        get_ml_token_manager().invalidar(state)
+        get_ml_token_manager().armazenar(token_row)
         
         return HTMLResponse(content=f"""
             <html>
@@ -204,60 +211,21 @@ async def refresh_mercadolivre_token(user_id: str):
     - Manter usuário autenticado por mais tempo
     - Evitar re-autenticação manual
     """
-    supabase = get_supabase_client()
-    
-    # Buscar refresh_token do usuário
-    result = supabase.table("tokens_ml")\
-        .select("refresh_token, ml_user_id")\
-        .eq("user_id", user_id)\
-        .maybe_single()\
-        .execute()
-    
-    if not result.data:
-        raise HTTPException(status_code=404, detail="Token não encontrado. Faça login novamente.")
-    
-    refresh_token = result.data.get("refresh_token")
-    if not refresh_token:
-        raise HTTPException(status_code=400, detail="Refresh token não disponível")
-    
-    token_data = {
-        "grant_type": "refresh_token",
-        "client_id": settings.ML_CLIENT_ID,
-        "client_secret": settings.ML_CLIENT_SECRET,
-        "refresh_token": refresh_token
-    }
-    
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                settings.ML_TOKEN_URL,
-                data=token_data,  # Usar 'data' em vez de 'json'
-                headers={
-                    "Accept": "application/json",
-                    "Content-Type": "application/x-www-form-urlencoded"
-                }
-            )
-            response.raise_for_status()
-            token_response = response.json()
-        
-        # Atualizar no Supabase
-        expires_in = token_response.get("expires_in", 21600)
-        expires_at = datetime.utcnow() + timedelta(seconds=expires_in)
-        
-        supabase.table("tokens_ml").update({
-            "access_token": token_response.get("access_token"),
-            "refresh_token": token_response.get("refresh_token"),
-            "expires_at": expires_at.isoformat()
-        }).eq("user_id", user_id).execute()
-        
-        return {
-            "status": "success",
-            "message": "Token renovado com sucesso",
-            "expires_in": expires_in
-        }
-        
+        token = await get_ml_token_manager().renovar(user_id)
+    except ValueError as e:
+        status_code = 404 if "não encontrado" in str(e) else 400
+        raise HTTPException(status_code=status_code, detail=str(e))
     except httpx.HTTPError as e:
         raise HTTPException(status_code=500, detail=f"Erro ao renovar token: {str(e)}")
+    
+    expires_in = int((token["expires_at"] - datetime.now(timezone.utc)).total_seconds())
+    
+    return {
+        "status": "success",
+        "message": "Token renovado com sucesso",
+        "expires_in": expires_in
+    }
 
 
 async def get_ml_user_info(access_token: str) -> dict:
@@ -265,13 +233,13 @@ async def get_ml_user_info(access_token: str) -> dict:
     Busca informações do usuário no Mercado Livre
     """
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{settings.ML_API_URL}/users/me",
-                headers={"Authorization": f"Bearer {access_token}"}
-            )
-            response.raise_for_status()
-            return response.json()
+        client = get_ml_http_client()
+        response = await client.get(
+            f"{settings.ML_API_URL}/users/me",
+            headers={"Authorization": f"Bearer {access_token}"}
+        )
+        response.raise_for_status()
+        return response.json()
     except httpx.HTTPError:
         return {}
 
@@ -329,6 +297,8 @@ async def disconnect_mercadolivre(user_id: str):
         .eq("user_id", user_id)\
         .execute()
     
+    get_ml_token_manager().invalidar(user_id)
+    
     if not result.data:
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
     
@@ -4,9 +4,13 @@ Router para rotas adicionais de produtos e catálogo
 from fastapi import APIRouter, HTTPException, Query
 from typing import List, Optional
 import requests
+import httpx
 
 from app.config.settings import settings
 from app.services.supabase_service import SupabaseService
+from app.services.ml_http_client import get_ml_http_client
+from app.services.ml_items import buscar_itens_multiget, iterar_ids_anuncios
+from app.services.ml_buybox_cache import metadados_cache
 
 router = APIRouter(prefix="/api", tags=["Products & Catalog"])
 
@@ -25,25 +29,25 @@ async def sync_products(user_id: int):
             raise HTTPException(status_code=401, detail="Usuário não autenticado")
         
         access_token = token_info.get("access_token")
-        
-        # Buscar produtos no ML
-        response = requests.get(
-            f"{settings.ML_API_URL}/users/{user_id}/items/search",
-            headers={"Authorization": f"Bearer {access_token}"}
-        )
-        response.raise_for_status()
-        data = response.json()
+        internal_user_id = token_info.get("user_id", user_id)
+        ml_user_id = token_info.get("ml_user_id") or user_id
+        http = get_ml_http_client()
+        
+        # Buscar todos os produtos no ML (scan paginado) e detalhes em lotes de 20
+        # (multiget) com apenas os campos salvos
+        itens = {}
+        async for pagina, _total in iterar_ids_anuncios(http, access_token, ml_user_id):
+            itens.update(await buscar_itens_multiget(
+                http,
+                access_token,
+                pagina,
+                ["id", "title", "price", "available_quantity", "condition",
+                 "category_id", "thumbnail", "permalink", "status"]
+            ))
         
         # Processar e salvar produtos
         products_saved = []
-        for item_id in data.get("results", []):
-            # Buscar detalhes do produto
-            product_response = requests.get(
-                f"{settings.ML_API_URL}/items/{item_id}",
-                headers={"Authorization": f"Bearer {access_token}"}
-            )
-            product_data = product_response.json()
-            
+        for product_data in itens.values():
             # Preparar dados para salvar
             product_to_save = {
                 "user_id": internal_user_id,
@@ -67,7 +71,7 @@ async def sync_products(user_id: int):
             "products": products_saved
         }
         
-    except requests.exceptions.RequestException as e:
+    except (httpx.HTTPError, ValueError) as e:
         raise HTTPException(status_code=500, detail=f"Erro ao sincronizar produtos: {str(e)}")
 
 
@@ -281,7 +285,7 @@ async def get_buybox_competition(
             
             internal_user_id = result.data[0]["user_id"]
         
-        ml_service = MercadoLivreService(supabase, internal_user_id)
+        ml_service = MercadoLivreService(supabase, internal_user_id, get_ml_http_client())
         
         buybox_data = await ml_service.buscar_price_to_win(item_id)
         
@@ -291,7 +295,8 @@ async def get_buybox_competition(
         return {
             "status": "success",
             "item_id": item_id,
-            "buybox_data": buybox_data
+            "buybox_data": buybox_data,
+            "cache": metadados_cache(buybox_data.get("cache_age_seconds", 0))
         }
         
     except ValueError as e:
@@ -335,7 +340,7 @@ async def get_product_competitors(
             
             internal_user_id = result.data[0]["user_id"]
         
-        ml_service = MercadoLivreService(supabase, internal_user_id)
+        ml_service = MercadoLivreService(supabase, internal_user_id, get_ml_http_client())
         
         competitors_data = await ml_service.buscar_competidores_produto(catalog_product_id)
         
@@ -345,7 +350,8 @@ async def get_product_competitors(
         return {
             "status": "success",
             "catalog_product_id": catalog_product_id,
-            "competitors_data": competitors_data
+            "competitors_data": competitors_data,
+            "cache": metadados_cache(competitors_data.get("cache_age_seconds", 0))
         }
         
     except ValueError as e:
@@ -384,7 +390,7 @@ async def get_catalog_items(
             
             internal_user_id = result.data[0]["user_id"]
         
-        ml_service = MercadoLivreService(supabase, internal_user_id)
+        ml_service = MercadoLivreService(supabase, internal_user_id, get_ml_http_client())
         
         catalog_items = await ml_service.buscar_catalog_items()
         
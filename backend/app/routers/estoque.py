@@ -5,6 +5,7 @@ Endpoints para gestão de estoque e movimentações
 from fastapi import APIRouter, HTTPException, Depends, Query
 from typing import List, Optional
 from decimal import Decimal
+import httpx
 from pydantic import BaseModel, Field
 from app.models.schemas import (
     EstoqueResponse,
@@ -12,7 +13,8 @@ from app.models.schemas import (
 )
 from app.services.estoque_service import EstoqueService
 from app.services.ml_sync_service import MLSyncService
-from app.config.settings import get_supabase_client
+from app.config.settings import settings, get_supabase_client
+from app.services.ml_http_client import get_ml_http_client
 from app.middleware.auth import get_current_user_id
 
 router = APIRouter(prefix="/estoque", tags=["Estoque"])
@@ -29,16 +31,41 @@ class MovimentacaoRequest(BaseModel):
     documento: Optional[str] = None
 
 
+class MovimentacaoLoteRequest(BaseModel):
+    movimentacoes: List[MovimentacaoRequest] = Field(
+        ..., min_length=1, max_length=settings.ESTOQUE_LOTE_MAX_ITENS
+    )
+    atomico: bool = False
+
+
+class ResultadoMovimentacaoLote(BaseModel):
+    indice: int
+    produto_id: Optional[int] = None
+    sucesso: bool
+    erro: Optional[str] = None
+    estoque: Optional[EstoqueResponse] = None
+
+
+class MovimentacaoLoteResponse(BaseModel):
+    total: int
+    sucesso: int
+    falhas: int
+    resultados: List[ResultadoMovimentacaoLote]
+
+
 def get_estoque_service(user_id: str = Depends(get_current_user_id)) -> EstoqueService:
     """Dependency injection do service com autenticação JWT"""
     supabase = get_supabase_client()
     return EstoqueService(supabase, user_id)
 
 
-def get_ml_sync_service(user_id: str = Depends(get_current_user_id)) -> MLSyncService:
+def get_ml_sync_service(
+    user_id: str = Depends(get_current_user_id),
+    http_client: httpx.AsyncClient = Depends(get_ml_http_client)
+) -> MLSyncService:
     """Dependency injection do service de sincronização ML com autenticação JWT"""
     supabase = get_supabase_client()
-    return MLSyncService(supabase, user_id)
+    return MLSyncService(supabase, user_id, http_client)
 
 
 @router.get("/produto/{produto_id}", response_model=EstoqueResponse)
@@ -93,6 +120,39 @@ async def movimentar_estoque(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/movimentacao/lote", response_model=MovimentacaoLoteResponse)
+async def movimentar_estoque_lote(
+    lote: MovimentacaoLoteRequest,
+    service: EstoqueService = Depends(get_estoque_service)
+):
+    """
+    Registra várias movimentações em uma única chamada (ex: nota fiscal de fornecedor)
+    
+    - **movimentacoes**: Lista de movimentações, mesmos campos de /movimentacao
+    - **atomico**: Se true, qualquer linha com erro desfaz o lote inteiro
+    
+    Tudo roda em uma transação no banco; o resultado vem por linha
+    (**indice** = posição na lista enviada).
+    """
+    try:
+        resultados = await service.movimentar_estoque_lote(
+            [mov.model_dump() for mov in lote.movimentacoes],
+            atomico=lote.atomico
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    sucesso = sum(1 for r in resultados if r["sucesso"])
+    return {
+        "total": len(resultados),
+        "sucesso": sucesso,
+        "falhas": len(resultados) - sucesso,
+        "resultados": resultados
+    }
+
+
 @router.get("/movimentacoes/{produto_id}")
 async def listar_movimentacoes(
     produto_id: int,
@@ -128,14 +188,16 @@ async def produtos_abaixo_minimo(
 async def sincronizar_estoque_produto(
     produto_id: int,
     nova_quantidade: int = Query(..., ge=0, description="Nova quantidade a sincronizar"),
+    verificar_ml: bool = Query(False, description="Compara com a quantidade atual no ML antes de enviar"),
     service: MLSyncService = Depends(get_ml_sync_service)
 ):
     """
     Sincroniza estoque de um produto específico com ML
-    Atualiza todos os anúncios vinculados
+    Atualiza todos os anúncios vinculados cuja quantidade é diferente
+    (os demais voltam como **ignorados**)
     """
     try:
-        return await service.sincronizar_estoque_produto(produto_id, nova_quantidade)
+        return await service.sincronizar_estoque_produto(produto_id, nova_quantidade, verificar_ml)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -144,14 +206,16 @@ async def sincronizar_estoque_produto(
 
 @router.post("/sync/todos")
 async def sincronizar_todos_estoques(
+    verificar_ml: bool = Query(False, description="Compara com a quantidade atual no ML antes de enviar"),
     service: MLSyncService = Depends(get_ml_sync_service)
 ):
     """
     Sincroniza estoque de todos os produtos com ML
     Atualiza automaticamente baseado no estoque local
+    Só envia anúncios cuja quantidade mudou (contagem em **ignorados**)
     """
     try:
-        return await service.sincronizar_todos_estoques()
+        return await service.sincronizar_todos_estoques(verificar_ml)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
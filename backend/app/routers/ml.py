@@ -3,13 +3,18 @@ Router - Mercado Livre
 Endpoints para integração com API do ML
 """
 from fastapi import APIRouter, HTTPException, Depends, Query
-from typing import List
+from typing import List, Optional
+import httpx
 from decimal import Decimal
 from datetime import datetime
 from pydantic import BaseModel, Field
 from app.models.schemas import AnuncioMLResponse
 from app.services.ml_service import MercadoLivreService
-from app.config.settings import get_supabase_client
+from app.services.ml_buybox_cache import metadados_cache
+from app.services.buybox_snapshot_service import BuyBoxSnapshotService, contar_mudancas
+from app.config.settings import settings, get_supabase_client
+from app.services.ml_http_client import get_ml_http_client
+from app.services.ml_token_manager import get_ml_token_manager
 from app.middleware.auth import get_current_user_id
 from app.utils.version import get_version_info
 
@@ -41,10 +46,21 @@ class StatusAnuncioRequest(BaseModel):
     ml_id: str
 
 
-def get_ml_service(user_id: str = Depends(get_current_user_id)) -> MercadoLivreService:
+def get_ml_service(
+    user_id: str = Depends(get_current_user_id),
+    http_client: httpx.AsyncClient = Depends(get_ml_http_client)
+) -> MercadoLivreService:
     """Dependency injection do service"""
     supabase = get_supabase_client()
-    return MercadoLivreService(supabase, user_id)
+    return MercadoLivreService(supabase, user_id, http_client)
+
+
+def get_buybox_snapshot_service(
+    user_id: str = Depends(get_current_user_id),
+    http_client: httpx.AsyncClient = Depends(get_ml_http_client)
+) -> BuyBoxSnapshotService:
+    supabase = get_supabase_client()
+    return BuyBoxSnapshotService(supabase, user_id, http_client)
 
 
 @router.get("/status")
@@ -106,6 +122,8 @@ async def desconectar_ml(user_id: str = Depends(get_current_user_id)):
             .eq("user_id", user_id)\
             .execute()
         
+        get_ml_token_manager().invalidar(user_id)
+        
         # Remoção concluída
         
         return {
@@ -118,6 +136,7 @@ async def desconectar_ml(user_id: str = Depends(get_current_user_id)):
 
 @router.post("/sincronizar", response_model=List[AnuncioMLResponse])
 async def sincronizar_anuncios(
+    concorrencia: Optional[int] = Query(None, ge=1, le=50, description="Detalhes buscados em paralelo"),
     service: MercadoLivreService = Depends(get_ml_service)
 ):
     """
@@ -128,9 +147,11 @@ async def sincronizar_anuncios(
     - Primeira sincronização
     - Atualização periódica (via cron)
     - Refresh manual pelo usuário
+    
+    - **concorrencia**: limite de requisições paralelas ao ML (padrão: ML_SYNC_CONCURRENCY)
     """
     try:
-        return await service.sincronizar_anuncios()
+        return await service.sincronizar_anuncios(concorrencia=concorrencia)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -322,7 +343,8 @@ async def buscar_buybox(
         
         return {
             "success": True,
-            "data": buybox_data
+            "data": buybox_data,
+            "cache": metadados_cache(buybox_data.get("cache_age_seconds", 0))
         }
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -330,6 +352,49 @@ async def buscar_buybox(
         raise HTTPException(status_code=500, detail=f"Erro ao buscar BuyBox: {str(e)}")
 
 
+@router.get("/catalog/buybox/{item_id}/historico")
+async def historico_buybox(
+    item_id: str,
+    dias: int = Query(7, ge=1, le=settings.BUYBOX_SNAPSHOT_RETENTION_DAYS),
+    service: BuyBoxSnapshotService = Depends(get_buybox_snapshot_service)
+):
+    """
+    Série temporal de BuyBox do item (capturas agendadas em buybox_snapshots)
+    Status, preço, price_to_win, vencedor e menor preço da concorrência por captura
+    """
+    try:
+        historico = await service.historico(item_id, dias)
+        
+        return {
+            "success": True,
+            "item_id": item_id,
+            "dias": dias,
+            "total": len(historico),
+            "mudancas": contar_mudancas(historico),
+            "data": historico
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao buscar histórico de BuyBox: {str(e)}")
+
+
+@router.post("/catalog/buybox/snapshots")
+async def capturar_snapshots_buybox(
+    service: BuyBoxSnapshotService = Depends(get_buybox_snapshot_service)
+):
+    """Captura agora (fora do agendamento) a BuyBox de todos os itens de catálogo do usuário"""
+    try:
+        resumo = await service.capturar()
+        
+        return {
+            "success": True,
+            **resumo
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao capturar snapshots de BuyBox: {str(e)}")
+
+
 @router.get("/perguntas")
 async def listar_perguntas(
     status: str = Query("unanswered", regex="^(unanswered|answered|all)$"),
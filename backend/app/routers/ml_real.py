@@ -4,17 +4,29 @@ Para integração com dados verdadeiros de BuyBox e concorrência
 Usando APIs OFICIAIS: price_to_win, products, items
 """
 
-from fastapi import APIRouter, HTTPException, Depends, Query
-from typing import List, Dict, Any, Optional
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import List, Dict, Any, Optional, Tuple
+import asyncio
+import contextlib
 import json
-import os
 from datetime import datetime
 
+from ..config.settings import settings
+
 # Importar a API oficial
 from ..services.ml_official_api import ml_official_api
+from ..services.ml_buybox_cache import metadados_cache
 
 router = APIRouter(prefix="/ml", tags=["Mercado Livre API Oficial"])
 
+class BuyBoxBatchRequest(BaseModel):
+    item_ids: List[str] = Field(
+        ..., min_length=1, max_length=settings.ML_BUYBOX_BATCH_MAX_ITEMS
+    )
+
+
 @router.get("/buybox/analysis/{item_id}")
 async def get_buybox_analysis_official(item_id: str):
     """
@@ -23,85 +35,205 @@ async def get_buybox_analysis_official(item_id: str):
     """
     try:
         # Obter dados da API oficial price_to_win
-        price_to_win_data = ml_official_api.get_item_price_to_win(item_id)
+        price_to_win_data = await ml_official_api.get_item_price_to_win(item_id)
         
         # Obter produto do catálogo (se disponível)
         catalog_product_id = price_to_win_data.get('catalog_product_id')
-        product_data = None
-        competitors_data = None
+        product_data, competitors_data, partial_errors = None, None, []
         
         if catalog_product_id:
-            # Buscar dados do produto e competidores
-            product_data = ml_official_api.get_product_buybox_winner(catalog_product_id)
-            competitors_data = ml_official_api.get_product_competitors(catalog_product_id)
+            product_data, competitors_data, partial_errors = await buscar_contexto_produto(catalog_product_id)
         
-        # Análise completa integrada
-        analysis = {
-            "item_id": item_id,
-            "analysis_timestamp": datetime.now().isoformat(),
-            "api_source": "official_mercadolibre",
-            "catalog_product_id": catalog_product_id,
-            
-            # Dados do price_to_win (oficial)
-            "buybox_status": {
-                "current_status": price_to_win_data.get('status'),
-                "is_winning": price_to_win_data.get('status') == 'winning',
-                "is_competing": price_to_win_data.get('status') == 'competing',
-                "is_sharing_first_place": price_to_win_data.get('status') == 'sharing_first_place',
-                "is_listed_only": price_to_win_data.get('status') == 'listed',
-                "visit_share": price_to_win_data.get('visit_share'),
-                "competitors_sharing_first_place": price_to_win_data.get('competitors_sharing_first_place'),
-                "consistent": price_to_win_data.get('consistent', False)
-            },
-            
-            # Análise de preços
-            "pricing_analysis": {
-                "current_price": price_to_win_data.get('current_price'),
-                "price_to_win": price_to_win_data.get('price_to_win'),
-                "currency_id": price_to_win_data.get('currency_id'),
-                "price_adjustment_needed": price_to_win_data.get('price_to_win') is not None,
-                "price_gap": calculate_price_gap(
-                    price_to_win_data.get('current_price'), 
-                    price_to_win_data.get('price_to_win')
-                )
-            },
-            
-            # Boosts e oportunidades
-            "competitive_advantages": {
-                "active_boosts": [b for b in price_to_win_data.get('boosts', []) if b.get('is_active')],
-                "available_opportunities": [b for b in price_to_win_data.get('boosts', []) if b.get('is_opportunity')],
-                "boost_score": calculate_boost_score(price_to_win_data.get('boosts', []))
-            },
-            
-            # Competitividade geral
-            "competitive_analysis": price_to_win_data.get('competitive_analysis', {}),
-            
-            # Dados do produto (se disponível)
-            "product_context": product_data,
-            
-            # Lista de competidores (se disponível) 
-            "competitors_summary": {
-                "total_competitors": competitors_data.get('total_competitors', 0) if competitors_data else 0,
-                "top_competitors": competitors_data.get('competitors', [])[:5] if competitors_data else [],
-                "competitor_price_range": calculate_competitor_price_range(competitors_data) if competitors_data else None
-            },
-            
-            # Razões para não competir (se aplicável)
-            "blocking_reasons": price_to_win_data.get('reason', []),
-            "blocking_reasons_solved": generate_reason_solutions(price_to_win_data.get('reason', [])),
-            
-            # Winner atual
-            "current_winner": price_to_win_data.get('winner', {}),
+        return montar_analise_buybox(item_id, price_to_win_data, product_data, competitors_data, partial_errors)
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro na análise oficial: {str(e)}")
+
+@router.post("/buybox/analysis/batch")
+async def get_buybox_analysis_batch(payload: BuyBoxBatchRequest):
+    """
+    Análise de BuyBox do portfólio inteiro em uma requisição
+    
+    - price_to_win em paralelo, no máximo ML_BUYBOX_BATCH_CONCURRENCY por vez
+    - produto/competidores buscados uma vez por catalog_product_id (itens que
+      dividem a mesma página de produto reaproveitam o resultado)
+    - resposta NDJSON (application/x-ndjson): uma linha por item na ordem em que
+      ficam prontos ({"type": "analysis"} ou {"type": "error"}) e uma linha
+      final {"type": "summary"}
+    - sem dados de exemplo: produto/competidores que falharem no ML ficam vazios e
+      aparecem em analysis.partial_errors de cada item daquele produto
+    """
+    item_ids = list(dict.fromkeys(i.strip() for i in payload.item_ids if i and i.strip()))
+    
+    async def gerar():
+        limite = asyncio.Semaphore(settings.ML_BUYBOX_BATCH_CONCURRENCY)
+        produtos: Dict[str, asyncio.Task] = {}
+        tarefas = [asyncio.ensure_future(analisar_item_lote(item_id, limite, produtos)) for item_id in item_ids]
+        erros = 0
+        parciais = 0
+        
+        try:
+            for proxima in asyncio.as_completed(tarefas):
+                linha = await proxima
+                if linha["type"] == "error":
+                    erros += 1
+                elif linha["analysis"]["partial_errors"]:
+                    parciais += 1
+                yield json.dumps(linha, default=str) + "\n"
             
-            # Recomendações estratégicas
-            "strategic_recommendations": price_to_win_data.get('competitive_analysis', {}).get('recommendations', []),
-            "immediate_opportunities": price_to_win_data.get('competitive_analysis', {}).get('opportunities', [])
-        }
+            yield json.dumps({
+                "type": "summary",
+                "total_items": len(item_ids),
+                "analyzed": len(item_ids) - erros,
+                "errors": erros,
+                "partial": parciais,
+                "catalog_products": len(produtos),
+                "analysis_timestamp": datetime.now().isoformat()
+            }) + "\n"
+        finally:
+            # Cliente desconectou: não deixa chamadas ao ML rodando à toa
+            for tarefa in [*tarefas, *produtos.values()]:
+                tarefa.cancel()
+    
+    return StreamingResponse(gerar(), media_type="application/x-ndjson")
+
+async def analisar_item_lote(
+    item_id: str,
+    limite: asyncio.Semaphore,
+    produtos: Dict[str, asyncio.Task]
+) -> Dict[str, Any]:
+    """Uma linha do NDJSON do lote; erros viram {"type": "error"} em vez de derrubar o stream"""
+    try:
+        async with limite:
+            price_to_win_data = await ml_official_api.get_item_price_to_win(item_id, usar_fallback=False)
         
-        return analysis
+        # Sem price_to_win real o item vira linha de erro: o fallback traz um
+        # catalog_product_id fixo e agruparia todos os itens com falha num produto fictício
+        if not price_to_win_data:
+            return {"type": "error", "item_id": item_id, "error": "price_to_win indisponível para o item"}
         
+        catalog_product_id = price_to_win_data.get('catalog_product_id')
+        product_data, competitors_data, partial_errors = None, None, []
+        
+        if catalog_product_id:
+            tarefa = produtos.get(catalog_product_id)
+            if tarefa is None:
+                tarefa = asyncio.ensure_future(buscar_contexto_produto(catalog_product_id, limite))
+                produtos[catalog_product_id] = tarefa
+            # shield: a tarefa é compartilhada pelos itens do mesmo produto
+            product_data, competitors_data, partial_errors = await asyncio.shield(tarefa)
+        
+        return {
+            "type": "analysis",
+            "item_id": item_id,
+            "analysis": montar_analise_buybox(
+                item_id, price_to_win_data, product_data, competitors_data, list(partial_errors)
+            )
+        }
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro na análise oficial: {str(e)}")
+        print(f"[ERROR] Falha na análise em lote de {item_id}: {type(e).__name__}: {e}")
+        return {"type": "error", "item_id": item_id, "error": str(e)}
+
+async def buscar_contexto_produto(
+    catalog_product_id: str,
+    limite: Optional[asyncio.Semaphore] = None
+) -> Tuple[Optional[Dict], Optional[Dict], List[Dict[str, str]]]:
+    """
+    Produto (winner) e competidores só dependem do catalog_product_id: buscados em
+    paralelo; falha em um deles não derruba a análise (a seção fica vazia)
+    """
+    async with limite or contextlib.nullcontext():
+        product_data, competitors_data = await asyncio.gather(
+            ml_official_api.get_product_buybox_winner(catalog_product_id, usar_fallback=False),
+            ml_official_api.get_product_competitors(catalog_product_id, usar_fallback=False),
+            return_exceptions=True
+        )
+    
+    partial_errors = []
+    product_data = resultado_parcial("product_context", product_data, partial_errors)
+    competitors_data = resultado_parcial("competitors_summary", competitors_data, partial_errors)
+    return product_data, competitors_data, partial_errors
+
+def montar_analise_buybox(
+    item_id: str,
+    price_to_win_data: Dict[str, Any],
+    product_data: Optional[Dict[str, Any]],
+    competitors_data: Optional[Dict[str, Any]],
+    partial_errors: List[Dict[str, str]]
+) -> Dict[str, Any]:
+    """Análise completa integrada (mesmo formato no endpoint individual e no lote)"""
+    catalog_product_id = price_to_win_data.get('catalog_product_id')
+    
+    return {
+        "item_id": item_id,
+        "analysis_timestamp": datetime.now().isoformat(),
+        "api_source": "official_mercadolibre",
+        "catalog_product_id": catalog_product_id,
+        
+        # Dados do price_to_win (oficial)
+        "buybox_status": {
+            "current_status": price_to_win_data.get('status'),
+            "is_winning": price_to_win_data.get('status') == 'winning',
+            "is_competing": price_to_win_data.get('status') == 'competing',
+            "is_sharing_first_place": price_to_win_data.get('status') == 'sharing_first_place',
+            "is_listed_only": price_to_win_data.get('status') == 'listed',
+            "visit_share": price_to_win_data.get('visit_share'),
+            "competitors_sharing_first_place": price_to_win_data.get('competitors_sharing_first_place'),
+            "consistent": price_to_win_data.get('consistent', False)
+        },
+        
+        # Análise de preços
+        "pricing_analysis": {
+            "current_price": price_to_win_data.get('current_price'),
+            "price_to_win": price_to_win_data.get('price_to_win'),
+            "currency_id": price_to_win_data.get('currency_id'),
+            "price_adjustment_needed": price_to_win_data.get('price_to_win') is not None,
+            "price_gap": calculate_price_gap(
+                price_to_win_data.get('current_price'), 
+                price_to_win_data.get('price_to_win')
+            )
+        },
+        
+        # Boosts e oportunidades
+        "competitive_advantages": {
+            "active_boosts": [b for b in price_to_win_data.get('boosts', []) if b.get('is_active')],
+            "available_opportunities": [b for b in price_to_win_data.get('boosts', []) if b.get('is_opportunity')],
+            "boost_score": calculate_boost_score(price_to_win_data.get('boosts', []))
+        },
+        
+        # Competitividade geral
+        "competitive_analysis": price_to_win_data.get('competitive_analysis', {}),
+        
+        # Dados do produto (se disponível)
+        "product_context": product_data,
+        
+        # Lista de competidores (se disponível) 
+        "competitors_summary": {
+            "total_competitors": competitors_data.get('total_competitors', 0) if competitors_data else 0,
+            "top_competitors": competitors_data.get('competitors', [])[:5] if competitors_data else [],
+            "competitor_price_range": calculate_competitor_price_range(competitors_data) if competitors_data else None
+        },
+        
+        # Razões para não competir (se aplicável)
+        "blocking_reasons": price_to_win_data.get('reason', []),
+        "blocking_reasons_solved": generate_reason_solutions(price_to_win_data.get('reason', [])),
+        
+        # Winner atual
+        "current_winner": price_to_win_data.get('winner', {}),
+        
+        # Recomendações estratégicas
+        "strategic_recommendations": price_to_win_data.get('competitive_analysis', {}).get('recommendations', []),
+        "immediate_opportunities": price_to_win_data.get('competitive_analysis', {}).get('opportunities', []),
+        
+        # Seções que não puderam ser obtidas
+        "partial_errors": partial_errors,
+        
+        # Frescor dos dados (cache curto de BuyBox)
+        "cache": metadados_cache(*[
+            dados.get('cache_age_seconds', 0)
+            for dados in (price_to_win_data, product_data, competitors_data) if dados
+        ])
+    }
 
 @router.get("/competitors/official/{product_id}")
 async def get_competitors_official(
@@ -129,26 +261,31 @@ async def get_competitors_official(
             filters['price'] = price_range
         
         # Buscar competidores pela API oficial
-        competitors_data = ml_official_api.get_product_competitors(product_id, filters)
+        competitors_data = await ml_official_api.get_product_competitors(product_id, filters)
         
         # Enriquecer dados com análise de price_to_win para cada competidor
-        enriched_competitors = []
+        # (consultas em paralelo; o rate limit do cliente HTTP controla o ritmo)
+        enriched_competitors = [dict(c) for c in competitors_data.get('competitors', [])[:limit]]
         
-        for competitor in competitors_data.get('competitors', [])[:limit]:
-            competitor_item_id = competitor.get('item_id')
-            
-            # Tentar obter price_to_win do competidor (pode falhar por rate limit)
-            try:
-                competitor_buybox = ml_official_api.get_item_price_to_win(competitor_item_id)
-                competitor['buybox_analysis'] = {
-                    'status': competitor_buybox.get('status'),
-                    'visit_share': competitor_buybox.get('visit_share'),
-                    'competitive_level': competitor_buybox.get('competitive_analysis', {}).get('competitive_level')
-                }
-            except:
+        competitors_buybox = await asyncio.gather(
+            *[
+                ml_official_api.get_item_price_to_win(c.get('item_id'), usar_fallback=False)
+                for c in enriched_competitors
+            ],
+            return_exceptions=True
+        )
+        
+        for competitor, competitor_buybox in zip(enriched_competitors, competitors_buybox):
+            # price_to_win do competidor pode falhar (ex.: rate limit): segue sem a análise
+            if isinstance(competitor_buybox, Exception) or competitor_buybox is None:
                 competitor['buybox_analysis'] = None
+                continue
             
-            enriched_competitors.append(competitor)
+            competitor['buybox_analysis'] = {
+                'status': competitor_buybox.get('status'),
+                'visit_share': competitor_buybox.get('visit_share'),
+                'competitive_level': competitor_buybox.get('competitive_analysis', {}).get('competitive_level')
+            }
         
         # Análise do mercado
         market_analysis = analyze_competitor_market(enriched_competitors)
@@ -174,7 +311,7 @@ async def get_buybox_winner_official(product_id: str):
     """
     try:
         # Obter dados oficiais do produto
-        product_data = ml_official_api.get_product_buybox_winner(product_id)
+        product_data = await ml_official_api.get_product_buybox_winner(product_id)
         
         winner_data = product_data.get('winner', {})
         
@@ -226,6 +363,19 @@ async def get_buybox_winner_official(product_id: str):
         raise HTTPException(status_code=500, detail=f"Erro ao analisar winner oficial: {str(e)}")
 
 # Funções auxiliares
+def resultado_parcial(secao: str, resultado: Any, erros: List[Dict[str, str]]) -> Optional[Any]:
+    """
+    Resultado de asyncio.gather(return_exceptions=True) sem fallback: exceção ou
+    None (ML falhou) vira None + registro em erros
+    """
+    if isinstance(resultado, Exception):
+        print(f"[ERROR] Falha ao obter {secao}: {type(resultado).__name__}: {resultado}")
+        erros.append({"section": secao, "error": str(resultado)})
+        return None
+    if resultado is None:
+        erros.append({"section": secao, "error": "indisponível no Mercado Livre"})
+    return resultado
+
 def calculate_price_gap(current_price: Optional[float], price_to_win: Optional[float]) -> Optional[Dict]:
     """Calcular gap de preço para ganhar"""
     if not current_price or not price_to_win:
@@ -423,7 +573,7 @@ async def get_listing_types_by_site(site_id: str):
     Exemplo: MLB, MLA, MLM, etc.
     """
     try:
-        data = ml_official_api.get_listing_types(site_id)
+        data = await ml_official_api.get_listing_types(site_id)
         return {
             "site_id": site_id,
             "listing_types": data,
@@ -440,7 +590,7 @@ async def get_listing_type_specs(site_id: str, listing_type_id: str):
     Retorna: fees, duração, exposição, etc.
     """
     try:
-        data = ml_official_api.get_listing_type_details(site_id, listing_type_id)
+        data = await ml_official_api.get_listing_type_details(site_id, listing_type_id)
         return data
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao buscar especificações: {str(e)}")
@@ -455,7 +605,7 @@ async def get_available_listing_types_for_user(
     Verificar tipos de publicação disponíveis para um usuário em uma categoria
     """
     try:
-        data = ml_official_api.get_user_available_listing_types(user_id, category_id)
+        data = await ml_official_api.get_user_available_listing_types(user_id, category_id)
         return data
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao verificar tipos disponíveis: {str(e)}")
@@ -468,7 +618,7 @@ async def get_listing_exposures(site_id: str):
     Retorna: lowest, low, mid, high, highest
     """
     try:
-        data = ml_official_api.get_listing_exposures(site_id)
+        data = await ml_official_api.get_listing_exposures(site_id)
         return {
             "site_id": site_id,
             "exposures": data
@@ -483,7 +633,7 @@ async def get_listing_exposure_details(site_id: str, exposure_id: str):
     Obter detalhes de um nível de exposição específico
     """
     try:
-        data = ml_official_api.get_listing_exposure_by_id(site_id, exposure_id)
+        data = await ml_official_api.get_listing_exposure_by_id(site_id, exposure_id)
         return data
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao buscar exposição: {str(e)}")
@@ -495,7 +645,7 @@ async def get_item_available_listing_types(item_id: str):
     Verificar tipos de publicação disponíveis para um item específico
     """
     try:
-        data = ml_official_api.get_item_available_listing_types(item_id)
+        data = await ml_official_api.get_item_available_listing_types(item_id)
         return {
             "item_id": item_id,
             "available_listing_types": data
@@ -511,7 +661,7 @@ async def get_item_available_upgrades(item_id: str):
     Retorna tipos de publicação com maior exposição
     """
     try:
-        data = ml_official_api.get_item_available_upgrades(item_id)
+        data = await ml_official_api.get_item_available_upgrades(item_id)
         return {
             "item_id": item_id,
             "available_upgrades": data
@@ -527,7 +677,7 @@ async def get_item_available_downgrades(item_id: str):
     Retorna tipos de publicação com menor exposição
     """
     try:
-        data = ml_official_api.get_item_available_downgrades(item_id)
+        data = await ml_official_api.get_item_available_downgrades(item_id)
         return {
             "item_id": item_id,
             "available_downgrades": data
@@ -550,7 +700,7 @@ async def update_item_listing_type(
         if not listing_type_id:
             raise HTTPException(status_code=400, detail="Campo 'id' é obrigatório")
         
-        data = ml_official_api.update_item_listing_type(item_id, listing_type_id)
+        data = await ml_official_api.update_item_listing_type(item_id, listing_type_id)
         return {
             "item_id": item_id,
             "new_listing_type": listing_type_id,
@@ -582,7 +732,7 @@ async def get_seller_catalog_items(
     - GET /ml/catalog/seller/123456/items?catalog_listing=true&status=active
     """
     try:
-        data = ml_official_api.search_catalog_items_by_seller(user_id, catalog_listing, status)
+        data = await ml_official_api.search_catalog_items_by_seller(user_id, catalog_listing, status)
         return {
             "seller_id": user_id,
             "catalog_listing": catalog_listing,
@@ -606,7 +756,7 @@ async def check_catalog_eligibility(item_id: str):
     - variations: elegibilidade de cada variação
     """
     try:
-        data = ml_official_api.check_catalog_eligibility(item_id)
+        data = await ml_official_api.check_catalog_eligibility(item_id)
         return {
             "item_id": item_id,
             "eligibility": data,
@@ -630,7 +780,7 @@ async def check_multiple_catalog_eligibility(
     """
     try:
         ids_list = item_ids.split(',')
-        data = ml_official_api.check_multiple_catalog_eligibility(ids_list)
+        data = await ml_official_api.check_multiple_catalog_eligibility(ids_list)
         
         return {
             "total_items_checked": len(ids_list),
@@ -662,7 +812,7 @@ async def search_catalog_products(
     - GET /ml/catalog/products/search?site_id=MLA&listing_strategy=catalog_required
     """
     try:
-        data = ml_official_api.search_catalog_products(
+        data = await ml_official_api.search_catalog_products(
             site_id=site_id,
             status=status,
             q=q,
@@ -703,7 +853,7 @@ async def get_catalog_product_details(product_id: str):
     - Faixa de preços
     """
     try:
-        data = ml_official_api.get_catalog_product_details(product_id)
+        data = await ml_official_api.get_catalog_product_details(product_id)
         
         return {
             "product_id": product_id,
@@ -748,7 +898,7 @@ async def create_catalog_listing(item_data: Dict[str, Any]):
                 detail=f"Campos obrigatórios faltando: {', '.join(missing_fields)}"
             )
         
-        data = ml_official_api.create_catalog_listing(item_data)
+        data = await ml_official_api.create_catalog_listing(item_data)
         
         if 'error' in data:
             raise HTTPException(status_code=400, detail=data)
@@ -796,7 +946,7 @@ async def create_catalog_optin(optin_data: Dict[str, Any]):
                 detail="Campos 'item_id' e 'catalog_product_id' são obrigatórios"
             )
         
-        data = ml_official_api.create_catalog_optin(item_id, catalog_product_id, variation_id)
+        data = await ml_official_api.create_catalog_optin(item_id, catalog_product_id, variation_id)
         
         if 'error' in data:
             raise HTTPException(status_code=400, detail=data)
@@ -828,7 +978,7 @@ async def get_catalog_forewarning_date(item_id: str):
     - date_expired: Data já expirou
     """
     try:
-        data = ml_official_api.get_catalog_forewarning_date(item_id)
+        data = await ml_official_api.get_catalog_forewarning_date(item_id)
         
         return {
             "item_id": item_id,
@@ -850,7 +1000,7 @@ async def get_catalog_sync_status(item_id: str):
     - UNSYNC: Dessincronizado (precisa correção)
     """
     try:
-        data = ml_official_api.get_catalog_sync_status(item_id)
+        data = await ml_official_api.get_catalog_sync_status(item_id)
         
         return {
             "item_id": item_id,
@@ -872,7 +1022,7 @@ async def fix_catalog_sync(item_id: str):
     Use este endpoint quando o item estiver com status UNSYNC
     """
     try:
-        data = ml_official_api.fix_catalog_sync(item_id)
+        data = await ml_official_api.fix_catalog_sync(item_id)
         
         return {
             "item_id": item_id,
@@ -898,7 +1048,7 @@ async def get_user_catalog_quota(user_id: str):
     - Usuários não permitidos retornam erro 403
     """
     try:
-        data = ml_official_api.get_user_catalog_quota(user_id)
+        data = await ml_official_api.get_user_catalog_quota(user_id)
         
         if 'error' in data:
             raise HTTPException(status_code=403, detail=data.get('error'))
@@ -928,7 +1078,7 @@ async def get_available_domains_for_suggestions(site_id: str):
     - Nome e fotos de exemplo de cada domínio
     """
     try:
-        data = ml_official_api.get_available_domains_for_suggestions(site_id)
+        data = await ml_official_api.get_available_domains_for_suggestions(site_id)
         
         domains = data.get('domains', [])
         available_domains = [d for d in domains if d.get('available')]
@@ -958,7 +1108,7 @@ async def get_domain_technical_specs(
     - output: Apenas campos que serão exibidos
     """
     try:
-        data = ml_official_api.get_domain_technical_specs(domain_id, spec_type)
+        data = await ml_official_api.get_domain_technical_specs(domain_id, spec_type)
         
         return {
             "domain_id": domain_id,
@@ -987,7 +1137,7 @@ async def validate_catalog_suggestion(suggestion_data: Dict[str, Any]):
     }
     """
     try:
-        result = ml_official_api.validate_catalog_suggestion(suggestion_data)
+        result = await ml_official_api.validate_catalog_suggestion(suggestion_data)
         
         is_valid = result.get('valid', False)
         
@@ -1022,7 +1172,7 @@ async def create_catalog_suggestion(suggestion_data: Dict[str, Any]):
     }
     """
     try:
-        data = ml_official_api.create_catalog_suggestion(suggestion_data)
+        data = await ml_official_api.create_catalog_suggestion(suggestion_data)
         
         if 'error' in data:
             raise HTTPException(status_code=400, detail=data)
@@ -1053,7 +1203,7 @@ async def get_catalog_suggestion(suggestion_id: str):
     - REJECTED: Rejeitada
     """
     try:
-        data = ml_official_api.get_catalog_suggestion(suggestion_id)
+        data = await ml_official_api.get_catalog_suggestion(suggestion_id)
         
         if 'error' in data:
             raise HTTPException(status_code=404, detail=data.get('error'))
@@ -1083,7 +1233,7 @@ async def update_catalog_suggestion(
     Body JSON: Mesma estrutura do create, com campos a modificar
     """
     try:
-        data = ml_official_api.update_catalog_suggestion(suggestion_id, suggestion_data)
+        data = await ml_official_api.update_catalog_suggestion(suggestion_id, suggestion_data)
         
         if 'error' in data:
             raise HTTPException(status_code=400, detail=data)
@@ -1121,7 +1271,7 @@ async def list_user_suggestions(
     try:
         domain_list = domain_ids.split(',') if domain_ids else None
         
-        data = ml_official_api.list_user_suggestions(
+        data = await ml_official_api.list_user_suggestions(
             user_id=user_id,
             limit=limit,
             offset=offset,
@@ -1153,7 +1303,7 @@ async def get_suggestion_validations(suggestion_id: str):
     Retorna lista de erros e avisos encontrados
     """
     try:
-        data = ml_official_api.get_suggestion_validations(suggestion_id)
+        data = await ml_official_api.get_suggestion_validations(suggestion_id)
         
         validations = data.get('validations', [])
         errors = [v for v in validations if v.get('type') == 'error']
@@ -1189,7 +1339,7 @@ async def create_suggestion_description(
         if not description:
             raise HTTPException(status_code=400, detail="Campo 'description' é obrigatório")
         
-        data = ml_official_api.create_suggestion_description(suggestion_id, description)
+        data = await ml_official_api.create_suggestion_description(suggestion_id, description)
         
         return {
             "suggestion_id": suggestion_id,
@@ -1221,7 +1371,7 @@ async def update_suggestion_description(
         if not description:
             raise HTTPException(status_code=400, detail="Campo 'description' é obrigatório")
         
-        data = ml_official_api.update_suggestion_description(suggestion_id, description)
+        data = await ml_official_api.update_suggestion_description(suggestion_id, description)
         
         return {
             "suggestion_id": suggestion_id,
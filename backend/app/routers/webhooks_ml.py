@@ -3,11 +3,17 @@ Router - Webhooks Mercado Livre
 Recebe notificações de vendas, perguntas, mensagens
 """
 from fastapi import APIRouter, Request, HTTPException, BackgroundTasks
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 import httpx
 from datetime import datetime
 
 from app.config.settings import settings, get_supabase_client
+from app.services.ml_http_client import get_ml_http_client
+from app.services.ml_items import buscar_itens_multiget
+from app.services.db_executor import run_query
+from app.services.ml_token_manager import get_ml_token_manager
+from app.services.estoque_service import EstoqueService
+from app.services.webhook_queue import enfileirar_notificacao, get_webhook_stats
 
 router = APIRouter(prefix="/webhooks/ml", tags=["Mercado Livre Webhooks"])
 
@@ -44,11 +50,17 @@ async def receive_ml_notification(
             "received": datetime.utcnow().isoformat()
         }
         
-        # Processar em background para responder rápido ao ML
-        background_tasks.add_task(
-            process_notification,
-            notification_data
-        )
+        # Grava na fila persistente (workers processam com retry); ML espera 200 rápido
+        try:
+            await enfileirar_notificacao(notification_data)
+        except Exception as e:
+            # Fila indisponível: processa em background como antes para não perder o evento
+            print(f"[ERROR] Falha ao enfileirar notificação, processando em background: {e}")
+            background_tasks.add_task(
+                process_notification_safe,
+                notification_data,
+                get_ml_http_client()
+            )
         
         # ML espera resposta 200 rápida
         return {"status": "received"}
@@ -59,9 +71,24 @@ async def receive_ml_notification(
         return {"status": "error", "message": str(e)}
 
 
-async def process_notification(data: Dict[str, Any]):
+async def process_notification_safe(
+    data: Dict[str, Any],
+    http_client: Optional[httpx.AsyncClient] = None
+):
+    """Processa fora da fila (sem retry), só registrando o erro"""
+    try:
+        await process_notification(data, http_client)
+    except Exception:
+        pass
+
+
+async def process_notification(
+    data: Dict[str, Any],
+    http_client: Optional[httpx.AsyncClient] = None
+):
     """
-    Processa notificação do ML em background
+    Processa notificação do ML (chamado pelos workers da fila)
+    Exceções sobem para o worker reagendar com backoff
     """
     topic = data.get("topic")
     resource = data.get("resource")
@@ -70,33 +97,38 @@ async def process_notification(data: Dict[str, Any]):
     try:
         # Salvar notificação no banco
         supabase = get_supabase_client()
-        supabase.table("logs_sistema").insert({
+        await run_query(supabase.table("logs_sistema").insert({
             "tipo": f"ml_webhook_{topic}",
             "nivel": "info",
             "origem": "ml_webhook",
             "acao": f"Webhook recebido: {topic}",
             "detalhes": data,
             "created_at": datetime.utcnow().isoformat()
-        }).execute()
+        }))
         
         # Processar por tipo
         if topic == "orders":
-            await process_order_notification(resource, user_id)
+            await process_order_notification(resource, user_id, http_client)
         
         elif topic == "items":
-            await process_item_notification(resource, user_id)
+            await process_item_notification(resource, user_id, http_client)
         
         elif topic == "questions":
-            await process_question_notification(resource, user_id)
+            await process_question_notification(resource, user_id, http_client)
         
         elif topic == "messages":
-            await process_message_notification(resource, user_id)
+            await process_message_notification(resource, user_id, http_client)
         
     except Exception as e:
         print(f"Erro ao processar notificação: {e}")
+        raise
 
 
-async def process_order_notification(resource: str, ml_user_id: str):
+async def process_order_notification(
+    resource: str,
+    ml_user_id: str,
+    http_client: Optional[httpx.AsyncClient] = None
+):
     """
     Processa notificação de pedido
     - Busca detalhes do pedido na API do ML
@@ -105,32 +137,31 @@ async def process_order_notification(resource: str, ml_user_id: str):
     """
     # Buscar token do usuário
     supabase = get_supabase_client()
-    token_result = supabase.table("tokens_ml")\
-        .select("access_token, user_id")\
-        .eq("ml_user_id", int(ml_user_id))\
-        .maybe_single()\
-        .execute()
+    token_ml = await get_ml_token_manager().get_token_por_ml_user(ml_user_id)
     
-    if not token_result.data:
+    if not token_ml:
         print(f"Token não encontrado para ml_user_id: {ml_user_id}")
         return
     
-    access_token = token_result.data["access_token"]
-    our_user_id = token_result.data["user_id"]
+    access_token = token_ml["access_token"]
+    our_user_id = token_ml["user_id"]
     
     # Buscar detalhes do pedido
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                resource,
-                headers={"Authorization": f"Bearer {access_token}"}
-            )
-            response.raise_for_status()
-            order_data = response.json()
+        client = http_client or get_ml_http_client()
+        response = await client.get(
+            resource,
+            headers={"Authorization": f"Bearer {access_token}"}
+        )
+        response.raise_for_status()
+        order_data = response.json()
+        
+        # Reserva/baixa/libera estoque (idempotente por pedido: retries não baixam em dobro)
+        movimentacoes = await EstoqueService(supabase, our_user_id).aplicar_pedido_ml(order_data)
         
         # Salvar pedido (você pode criar tabela 'pedidos' se quiser)
         # Por enquanto, apenas log
-        supabase.table("logs_sistema").insert({
+        await run_query(supabase.table("logs_sistema").insert({
             "tipo": "ml_order_processed",
             "nivel": "info",
             "origem": "ml_webhook",
@@ -139,88 +170,194 @@ async def process_order_notification(resource: str, ml_user_id: str):
                 "order_id": order_data.get("id"),
                 "status": order_data.get("status"),
                 "buyer_id": order_data.get("buyer", {}).get("id"),
-                "total_amount": order_data.get("total_amount")
+                "total_amount": order_data.get("total_amount"),
+                "movimentacoes_estoque": [
+                    {
+                        "produto_id": mov["produto_id"],
+                        "tipo": mov["tipo_movimentacao"],
+                        "quantidade": mov["quantidade"]
+                    }
+                    for mov in movimentacoes
+                ]
             }
-        }).execute()
-        
-        # TODO: Atualizar estoque automaticamente
+        }))
         
     except Exception as e:
         print(f"Erro ao processar pedido: {e}")
+        raise
 
 
-async def process_item_notification(resource: str, ml_user_id: str):
+async def process_item_notification(
+    resource: str,
+    ml_user_id: str,
+    http_client: Optional[httpx.AsyncClient] = None
+):
     """
     Processa notificação de alteração em anúncio
     - Sincroniza dados do anúncio
     """
     supabase = get_supabase_client()
-    token_result = supabase.table("tokens_ml")\
-        .select("access_token, user_id")\
-        .eq("ml_user_id", int(ml_user_id))\
-        .maybe_single()\
-        .execute()
+    token_ml = await get_ml_token_manager().get_token_por_ml_user(ml_user_id)
     
-    if not token_result.data:
+    if not token_ml:
         return
     
-    access_token = token_result.data["access_token"]
+    access_token = token_ml["access_token"]
     
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                resource,
-                headers={"Authorization": f"Bearer {access_token}"}
-            )
-            response.raise_for_status()
-            item_data = response.json()
+        client = http_client or get_ml_http_client()
+        response = await client.get(
+            resource,
+            headers={"Authorization": f"Bearer {access_token}"}
+        )
+        response.raise_for_status()
+        item_data = response.json()
         
         # Atualizar anúncio no banco
-        ml_id = item_data.get("id")
-        supabase.table("anuncios_ml").upsert({
-            "ml_id": ml_id,
-            "user_id": token_result.data["user_id"],
-            "title": item_data.get("title"),
-            "price": str(item_data.get("price")),
-            "available_quantity": item_data.get("available_quantity"),
-            "status": item_data.get("status")
-        }, on_conflict="ml_id").execute()
+        await run_query(supabase.table("anuncios_ml").upsert(
+            _mapear_item_notificacao(item_data, token_ml["user_id"]),
+            on_conflict="ml_id"
+        ))
         
     except Exception as e:
         print(f"Erro ao processar item: {e}")
+        raise
+
+
+ATRIBUTOS_ITEM_NOTIFICACAO = ["id", "title", "price", "available_quantity", "status"]
+
+
+def _mapear_item_notificacao(item_data: Dict[str, Any], user_id: str) -> Dict[str, Any]:
+    """Campos de anuncios_ml atualizados por notificações de items"""
+    return {
+        "ml_id": item_data.get("id"),
+        "user_id": user_id,
+        "title": item_data.get("title"),
+        "price": str(item_data.get("price")),
+        "available_quantity": item_data.get("available_quantity"),
+        "status": item_data.get("status")
+    }
 
 
-async def process_question_notification(resource: str, ml_user_id: str):
+async def process_item_notifications_batch(
+    jobs: List[Dict[str, Any]],
+    http_client: Optional[httpx.AsyncClient] = None
+) -> Dict[Any, Exception]:
+    """
+    Processa um lote de notificações de items do mesmo vendedor (workers da fila)
+    - Um multiget /items?ids= para todos os anúncios do lote
+    - Um único upsert em anuncios_ml (linha a linha se o lote falhar)
+    Retorna {job_id: exceção} dos jobs que devem ser reagendados
+    """
+    supabase = get_supabase_client()
+    ml_user_id = jobs[0].get("ml_user_id")
+    
+    # Log das notificações em um único insert (só na 1ª tentativa: retries não duplicam o log)
+    novos = [job for job in jobs if (job.get("attempts") or 1) <= 1]
+    if novos:
+        try:
+            await run_query(supabase.table("logs_sistema").insert([{
+                "tipo": "ml_webhook_items",
+                "nivel": "info",
+                "origem": "ml_webhook",
+                "acao": "Webhook recebido: items",
+                "detalhes": job.get("payload") or {},
+                "created_at": datetime.utcnow().isoformat()
+            } for job in novos]))
+        except Exception as e:
+            print(f"[ERROR] Falha ao registrar log do lote de items: {e}")
+    
+    token_ml = await get_ml_token_manager().get_token_por_ml_user(ml_user_id)
+    if not token_ml:
+        # Reagenda (e depois marca failed) em vez de apagar jobs não processados
+        erro = ValueError(f"Token não encontrado para ml_user_id: {ml_user_id}")
+        return {job["id"]: erro for job in jobs}
+    
+    # /items/MLB123 -> MLB123 (resources fora desse formato seguem o fluxo individual)
+    ids_por_job: Dict[Any, str] = {}
+    falhas: Dict[Any, Exception] = {}
+    for job in jobs:
+        partes = (job.get("resource") or "").strip("/").split("/")
+        if len(partes) == 2 and partes[0] == "items":
+            ids_por_job[job["id"]] = partes[1]
+        else:
+            try:
+                await process_item_notification(job["resource"], ml_user_id, http_client)
+            except Exception as e:
+                falhas[job["id"]] = e
+    
+    if not ids_por_job:
+        return falhas
+    
+    client = http_client or get_ml_http_client()
+    itens = await buscar_itens_multiget(
+        client,
+        token_ml["access_token"],
+        list(dict.fromkeys(ids_por_job.values())),
+        ATRIBUTOS_ITEM_NOTIFICACAO
+    )
+    
+    erros_por_anuncio: Dict[str, Exception] = {}
+    linhas = []
+    for ml_id, item in itens.items():
+        try:
+            linhas.append(_mapear_item_notificacao(item, token_ml["user_id"]))
+        except Exception as e:
+            erros_por_anuncio[ml_id] = e
+    
+    if linhas:
+        try:
+            await run_query(supabase.table("anuncios_ml").upsert(linhas, on_conflict="ml_id"))
+        except Exception as e:
+            # Uma linha inválida derruba o lote inteiro: isola salvando uma a uma
+            print(f"[ERROR] Upsert em lote falhou ({len(linhas)} anúncios), salvando individualmente: {e}")
+            for linha in linhas:
+                try:
+                    await run_query(supabase.table("anuncios_ml").upsert(linha, on_conflict="ml_id"))
+                except Exception as e_linha:
+                    erros_por_anuncio[linha["ml_id"]] = e_linha
+    
+    for job_id, ml_id in ids_por_job.items():
+        if ml_id in erros_por_anuncio:
+            falhas[job_id] = erros_por_anuncio[ml_id]
+        elif ml_id not in itens:
+            falhas[job_id] = ValueError(f"Anúncio {ml_id} não retornado pelo ML")
+    
+    print(f"Lote de items processado: {len(itens)} anúncios, {len(jobs)} notificações")
+    return falhas
+
+
+async def process_question_notification(
+    resource: str,
+    ml_user_id: str,
+    http_client: Optional[httpx.AsyncClient] = None
+):
     """
     Processa notificação de pergunta
     - Salva pergunta no banco
     - Pode integrar com IA para resposta automática
     """
     supabase = get_supabase_client()
-    token_result = supabase.table("tokens_ml")\
-        .select("access_token, user_id")\
-        .eq("ml_user_id", int(ml_user_id))\
-        .maybe_single()\
-        .execute()
+    token_ml = await get_ml_token_manager().get_token_por_ml_user(ml_user_id)
     
-    if not token_result.data:
+    if not token_ml:
         print(f"Token não encontrado para ml_user_id: {ml_user_id}")
         return
     
-    access_token = token_result.data["access_token"]
-    our_user_id = token_result.data["user_id"]
+    access_token = token_ml["access_token"]
+    our_user_id = token_ml["user_id"]
     
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                resource,
-                headers={"Authorization": f"Bearer {access_token}"}
-            )
-            response.raise_for_status()
-            question_data = response.json()
+        client = http_client or get_ml_http_client()
+        response = await client.get(
+            resource,
+            headers={"Authorization": f"Bearer {access_token}"}
+        )
+        response.raise_for_status()
+        question_data = response.json()
         
         # Salvar pergunta
-        supabase.table("logs_sistema").insert({
+        await run_query(supabase.table("logs_sistema").insert({
             "tipo": "ml_question_received",
             "nivel": "info",
             "origem": "ml_webhook",
@@ -232,44 +369,45 @@ async def process_question_notification(resource: str, ml_user_id: str):
                 "from_user_id": question_data.get("from", {}).get("id"),
                 "status": question_data.get("status")
             }
-        }).execute()
+        }))
         
         print(f"Pergunta processada: {question_data.get('id')}")
         
     except Exception as e:
         print(f"Erro ao processar pergunta: {e}")
+        raise
 
 
-async def process_message_notification(resource: str, ml_user_id: str):
+async def process_message_notification(
+    resource: str,
+    ml_user_id: str,
+    http_client: Optional[httpx.AsyncClient] = None
+):
     """
     Processa notificação de mensagem
     - Salva mensagem no banco
     - Notifica usuário
     """
     supabase = get_supabase_client()
-    token_result = supabase.table("tokens_ml")\
-        .select("access_token, user_id")\
-        .eq("ml_user_id", int(ml_user_id))\
-        .maybe_single()\
-        .execute()
+    token_ml = await get_ml_token_manager().get_token_por_ml_user(ml_user_id)
     
-    if not token_result.data:
+    if not token_ml:
         print(f"Token não encontrado para ml_user_id: {ml_user_id}")
         return
     
-    access_token = token_result.data["access_token"]
+    access_token = token_ml["access_token"]
     
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                resource,
-                headers={"Authorization": f"Bearer {access_token}"}
-            )
-            response.raise_for_status()
-            message_data = response.json()
+        client = http_client or get_ml_http_client()
+        response = await client.get(
+            resource,
+            headers={"Authorization": f"Bearer {access_token}"}
+        )
+        response.raise_for_status()
+        message_data = response.json()
         
         # Salvar mensagem
-        supabase.table("logs_sistema").insert({
+        await run_query(supabase.table("logs_sistema").insert({
             "tipo": "ml_message_received",
             "nivel": "info",
             "origem": "ml_webhook",
@@ -281,12 +419,27 @@ async def process_message_notification(resource: str, ml_user_id: str):
                 "text": message_data.get("text"),
                 "status": message_data.get("status")
             }
-        }).execute()
+        }))
         
         print(f"Mensagem processada: {message_data.get('id')}")
         
     except Exception as e:
         print(f"Erro ao processar mensagem: {e}")
+        raise
+
+
+@router.get("/stats")
+async def webhook_stats():
+    """
+    Contadores da fila de notificações deste processo
+    
+    - intake: recebidas, enfileiradas e deduplicadas (fundidas em job pendente)
+    - workers: processados, falhas, reagendados, descartados
+    """
+    return {
+        "status": "ok",
+        **get_webhook_stats()
+    }
 
 
 @router.get("/test")
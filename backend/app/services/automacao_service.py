@@ -6,6 +6,7 @@ from typing import List, Dict, Any, Optional
 from datetime import datetime
 from decimal import Decimal
 from supabase import Client
+from app.services.db_executor import run_query
 from app.models.schemas import (
     RegraAutomacaoCreate,
     RegraAutomacaoResponse,
@@ -29,7 +30,7 @@ class AutomacaoService:
             "ativo": regra.ativo
         }
         
-        result = self.db.table("regras_automacao").insert(data).execute()
+        result = await run_query(self.db.table("regras_automacao").insert(data))
         return RegraAutomacaoResponse(**result.data[0])
     
     async def listar_regras(
@@ -45,7 +46,7 @@ class AutomacaoService:
         if apenas_ativas:
             query = query.eq("ativo", True)
         
-        result = query.execute()
+        result = await run_query(query)
         return [RegraAutomacaoResponse(**item) for item in result.data]
     
     async def executar_regras(self) -> Dict[str, Any]:
@@ -119,19 +120,20 @@ class AutomacaoService:
             resultado = await self._executar_regra_reativacao(regra)
         
         # Registra log
-        self.db.table("logs_automacao").insert({
+        await run_query(self.db.table("logs_automacao").insert({
             "regra_id": regra.id,
             "user_id": self.user_id,
             "sucesso": resultado["sucesso"],
             "detalhes": resultado
-        }).execute()
+        }))
         
         # Incrementa contador
         if resultado["sucesso"]:
-            self.db.table("regras_automacao")\
-                .update({"vezes_executada": regra.vezes_executada + 1})\
-                .eq("id", regra.id)\
-                .execute()
+            await run_query(
+                self.db.table("regras_automacao")
+                .update({"vezes_executada": regra.vezes_executada + 1})
+                .eq("id", regra.id)
+            )
         
         return resultado
     
@@ -165,22 +167,24 @@ class AutomacaoService:
             
             for ml_id in anuncios:
                 # Busca preço atual
-                anuncio = self.db.table("anuncios_ml")\
-                    .select("price")\
-                    .eq("ml_id", ml_id)\
-                    .eq("user_id", self.user_id)\
-                    .maybe_single()\
-                    .execute()
+                anuncio = await run_query(
+                    self.db.table("anuncios_ml")
+                    .select("price")
+                    .eq("ml_id", ml_id)
+                    .eq("user_id", self.user_id)
+                    .maybe_single()
+                )
                 
                 if anuncio.data:
                     preco_atual = Decimal(str(anuncio.data["price"]))
                     novo_preco = preco_atual * (1 - percentual / 100)
                     
                     # Atualiza no banco (aqui, na prática chamaria ml_service)
-                    self.db.table("anuncios_ml")\
-                        .update({"price": str(novo_preco)})\
-                        .eq("ml_id", ml_id)\
-                        .execute()
+                    await run_query(
+                        self.db.table("anuncios_ml")
+                        .update({"price": str(novo_preco)})
+                        .eq("ml_id", ml_id)
+                    )
                     
                     resultado["acoes_executadas"].append({
                         "anuncio": ml_id,
@@ -226,20 +230,22 @@ class AutomacaoService:
     
     async def desativar_regra(self, regra_id: int) -> bool:
         """Desativa uma regra"""
-        result = self.db.table("regras_automacao")\
-            .update({"ativo": False})\
-            .eq("id", regra_id)\
-            .eq("user_id", self.user_id)\
-            .execute()
+        result = await run_query(
+            self.db.table("regras_automacao")
+            .update({"ativo": False})
+            .eq("id", regra_id)
+            .eq("user_id", self.user_id)
+        )
         
         return len(result.data) > 0
     
     async def deletar_regra(self, regra_id: int) -> bool:
         """Deleta uma regra"""
-        result = self.db.table("regras_automacao")\
-            .delete()\
-            .eq("id", regra_id)\
-            .eq("user_id", self.user_id)\
-            .execute()
+        result = await run_query(
+            self.db.table("regras_automacao")
+            .delete()
+            .eq("id", regra_id)
+            .eq("user_id", self.user_id)
+        )
         
         return len(result.data) > 0
@@ -0,0 +1,234 @@
+"""
+Service - Histórico de BuyBox
+Captura periódica de price_to_win e preços da concorrência dos itens de catálogo,
+gravada em buybox_snapshots (ver sql/buybox_snapshots.sql)
+"""
+import asyncio
+import httpx
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+from supabase import Client
+from app.config.settings import settings, get_supabase_client
+from app.services.db_executor import run_query
+from app.services.ml_service import MercadoLivreService
+
+
+# Colunas devolvidas no histórico (a tabela não guarda nada além disso)
+COLUNAS_HISTORICO = (
+    "capturado_em, status, preco, price_to_win, visit_share, vencedor_item_id, "
+    "preco_vencedor, menor_preco_concorrente, total_concorrentes"
+)
+
+
+class BuyBoxSnapshotService:
+    def __init__(
+        self,
+        supabase_client: Client,
+        user_id: str,
+        http_client: Optional[httpx.AsyncClient] = None
+    ):
+        self.db = supabase_client
+        self.user_id = user_id
+        self.ml = MercadoLivreService(supabase_client, user_id, http_client)
+
+    async def capturar(self) -> Dict[str, Any]:
+        """
+        Uma observação por item de catálogo do usuário
+        - price_to_win em paralelo (BUYBOX_SNAPSHOT_CONCURRENCY por vez)
+        - concorrentes uma vez por catalog_product_id
+        - gravação em lotes de BUYBOX_SNAPSHOT_INSERT_BATCH (um INSERT por lote)
+        Considera todos os anúncios locais (paginados), não só os mais recentes
+        """
+        itens = await self.ml.buscar_catalog_items(await self._listar_ml_ids())
+        if not itens:
+            return {"itens": 0, "gravados": 0, "falhas": 0}
+
+        semaforo = asyncio.Semaphore(settings.BUYBOX_SNAPSHOT_CONCURRENCY)
+
+        async def _limitado(corrotina):
+            async with semaforo:
+                return await corrotina
+
+        produtos = list(dict.fromkeys(item["catalog_product_id"] for item in itens))
+
+        precos_to_win, concorrencias = await asyncio.gather(
+            asyncio.gather(
+                *[_limitado(self.ml.buscar_price_to_win(item["ml_id"])) for item in itens],
+                return_exceptions=True
+            ),
+            asyncio.gather(
+                *[_limitado(self.ml.buscar_competidores_produto(produto)) for produto in produtos],
+                return_exceptions=True
+            )
+        )
+        concorrencia_por_produto = dict(zip(produtos, concorrencias))
+
+        snapshots = []
+        falhas = 0
+        for item, price_to_win in zip(itens, precos_to_win):
+            if isinstance(price_to_win, Exception) or not price_to_win.get("has_catalog"):
+                falhas += 1
+                continue
+
+            concorrencia = concorrencia_por_produto.get(item["catalog_product_id"])
+            if isinstance(concorrencia, Exception) or (concorrencia or {}).get("error"):
+                concorrencia = None
+
+            snapshots.append(self._montar_snapshot(item, price_to_win, concorrencia))
+
+        gravados = await self._gravar(snapshots)
+
+        return {"itens": len(itens), "gravados": gravados, "falhas": falhas}
+
+    async def _listar_ml_ids(self) -> List[str]:
+        linhas = await paginar(lambda: (
+            self.db.table("anuncios_ml")
+            .select("ml_id")
+            .eq("user_id", self.user_id)
+            .order("ml_id")
+        ))
+        return [l["ml_id"] for l in linhas if l.get("ml_id")]
+
+    @staticmethod
+    def _montar_snapshot(
+        item: Dict[str, Any],
+        price_to_win: Dict[str, Any],
+        concorrencia: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        vencedor = price_to_win.get("winner") or {}
+        faixa = (concorrencia or {}).get("price_range") or {}
+
+        return {
+            "ml_item_id": item["ml_id"],
+            "catalog_product_id": item["catalog_product_id"],
+            "status": price_to_win.get("status"),
+            "preco": price_to_win.get("current_price"),
+            "price_to_win": price_to_win.get("price_to_win"),
+            "visit_share": price_to_win.get("visit_share"),
+            "vencedor_item_id": vencedor.get("item_id"),
+            "preco_vencedor": vencedor.get("price"),
+            "menor_preco_concorrente": faixa.get("min_price"),
+            "total_concorrentes": concorrencia.get("total_competitors") if concorrencia else None
+        }
+
+    async def _gravar(self, snapshots: List[Dict[str, Any]]) -> int:
+        gravados = 0
+        lote = settings.BUYBOX_SNAPSHOT_INSERT_BATCH
+
+        for inicio in range(0, len(snapshots), lote):
+            result = await run_query(self.db.rpc("registrar_buybox_snapshots", {
+                "p_user_id": self.user_id,
+                "p_snapshots": snapshots[inicio:inicio + lote]
+            }))
+            gravados += result.data or 0
+
+        return gravados
+
+    async def historico(self, ml_item_id: str, dias: int = 7) -> List[Dict[str, Any]]:
+        """Observações do item nos últimos `dias`, da mais recente para a mais antiga"""
+        desde = (datetime.now(timezone.utc) - timedelta(days=dias)).isoformat()
+
+        return await paginar(lambda: (
+            self.db.table("buybox_snapshots")
+            .select(COLUNAS_HISTORICO)
+            .eq("user_id", self.user_id)
+            .eq("ml_item_id", ml_item_id)
+            .gte("capturado_em", desde)
+            .order("capturado_em", desc=True)
+        ))
+
+
+async def paginar(montar_query: Callable[[], Any], tamanho: int = 1000) -> List[Dict[str, Any]]:
+    """Lê todas as páginas de uma consulta (PostgREST limita as linhas por resposta)"""
+    linhas: List[Dict[str, Any]] = []
+    while True:
+        result = await run_query(montar_query().range(len(linhas), len(linhas) + tamanho - 1))
+        pagina = result.data or []
+        linhas.extend(pagina)
+        if len(pagina) < tamanho:
+            return linhas
+
+
+def contar_mudancas(historico: List[Dict[str, Any]]) -> int:
+    """Quantas observações consecutivas mudaram status, preço ou price_to_win"""
+    campos = ("status", "preco", "price_to_win")
+    return sum(
+        1 for atual, anterior in zip(historico, historico[1:])
+        if any(atual.get(c) != anterior.get(c) for c in campos)
+    )
+
+
+# ============ CAPTURA AGENDADA ============
+
+_tarefa_agendador: Optional[asyncio.Task] = None
+_metricas = {
+    "ciclos": 0,
+    "usuarios": 0,
+    "gravados": 0,
+    "falhas": 0,
+    "ultimo_ciclo": None
+}
+
+
+async def capturar_todos_usuarios() -> None:
+    """Um ciclo: captura os usuários com conta ML conectada, um por vez, e aplica a retenção"""
+    supabase = get_supabase_client()
+    linhas = await paginar(lambda: supabase.table("tokens_ml").select("user_id").order("user_id"))
+    usuarios = list(dict.fromkeys(r["user_id"] for r in linhas if r.get("user_id")))
+
+    for user_id in usuarios:
+        try:
+            resumo = await BuyBoxSnapshotService(supabase, user_id).capturar()
+            _metricas["gravados"] += resumo["gravados"]
+            _metricas["falhas"] += resumo["falhas"]
+        except Exception as e:
+            _metricas["falhas"] += 1
+            print(f"[ERROR] Falha nos snapshots de BuyBox do user_id={user_id}: {type(e).__name__}: {e}")
+
+    await run_query(supabase.rpc("limpar_buybox_snapshots", {
+        "p_dias": settings.BUYBOX_SNAPSHOT_RETENTION_DAYS
+    }))
+
+    _metricas["ciclos"] += 1
+    _metricas["usuarios"] = len(usuarios)
+    _metricas["ultimo_ciclo"] = datetime.now(timezone.utc).isoformat()
+
+
+def iniciar_snapshots_buybox() -> None:
+    """
+    Dispara a captura a cada BUYBOX_SNAPSHOT_INTERVAL_MINUTES em background
+    Só roda com BUYBOX_SNAPSHOT_ENABLED (desligado por padrão): habilite em apenas
+    uma instância, senão cada uma grava o ciclo inteiro de novo
+    """
+    global _tarefa_agendador
+
+    if not settings.BUYBOX_SNAPSHOT_ENABLED or _tarefa_agendador is not None:
+        return
+
+    async def _agendador():
+        while True:
+            try:
+                await capturar_todos_usuarios()
+            except Exception as e:
+                print(f"[ERROR] Falha no ciclo de snapshots de BuyBox: {type(e).__name__}: {e}")
+            await asyncio.sleep(settings.BUYBOX_SNAPSHOT_INTERVAL_MINUTES * 60)
+
+    _tarefa_agendador = asyncio.create_task(_agendador())
+
+
+async def parar_snapshots_buybox() -> None:
+    global _tarefa_agendador
+
+    if _tarefa_agendador is not None:
+        _tarefa_agendador.cancel()
+        await asyncio.gather(_tarefa_agendador, return_exceptions=True)
+
+    _tarefa_agendador = None
+
+
+def get_buybox_snapshot_stats() -> Dict[str, Any]:
+    return {
+        "habilitado": settings.BUYBOX_SNAPSHOT_ENABLED,
+        "intervalo_minutos": settings.BUYBOX_SNAPSHOT_INTERVAL_MINUTES,
+        **_metricas
+    }
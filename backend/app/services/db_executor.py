@@ -0,0 +1,59 @@
+"""
+Acesso não bloqueante ao Supabase
+O supabase-py é síncrono: cada .execute() é um round trip HTTP que travaria o
+event loop. As consultas rodam em um pool de threads limitado (DB_MAX_WORKERS).
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+import asyncio
+import functools
+
+from app.config.settings import settings
+
+
+T = TypeVar("T")
+
+_db_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_db_executor() -> ThreadPoolExecutor:
+    """Retorna o pool de threads singleton das consultas ao banco"""
+    global _db_executor
+
+    if _db_executor is None:
+        _db_executor = ThreadPoolExecutor(
+            max_workers=settings.DB_MAX_WORKERS,
+            thread_name_prefix="supabase"
+        )
+
+    return _db_executor
+
+
+def shutdown_db_executor() -> None:
+    """Encerra o pool (chamado no shutdown da aplicação)"""
+    global _db_executor
+
+    if _db_executor is not None:
+        _db_executor.shutdown(wait=True)
+
+    _db_executor = None
+
+
+async def run_in_db_thread(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Executa uma função síncrona qualquer no pool do banco"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_db_executor(), functools.partial(func, *args, **kwargs))
+
+
+async def run_query(query: Any) -> Any:
+    """
+    Executa um query builder do supabase-py sem bloquear o event loop
+
+    Uso:
+        result = await run_query(
+            self.db.table("produtos")
+            .select("*")
+            .eq("user_id", self.user_id)
+        )
+    """
+    return await run_in_db_thread(query.execute)
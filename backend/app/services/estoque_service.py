@@ -2,16 +2,32 @@
 Service - Estoque
 Gestão de estoque com movimentações e validações
 """
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 from decimal import Decimal
 from supabase import Client
+from postgrest.exceptions import APIError
+from app.services.db_executor import run_query
 from app.models.schemas import (
     EstoqueResponse,
     TipoMovimentacao
 )
 
 
+# Status de pedido do ML -> estado de estoque aplicado (ver sql/estoque_pedidos_ml.sql)
+# Aguardando pagamento reserva; pago baixa; cancelado libera a reserva
+ESTADO_ESTOQUE_POR_STATUS_PEDIDO = {
+    "confirmed": "reservado",
+    "payment_required": "reservado",
+    "payment_in_process": "reservado",
+    "partially_paid": "reservado",
+    "paid": "baixado",
+    "partially_refunded": "baixado",
+    "cancelled": "liberado",
+    "invalid": "liberado"
+}
+
+
 class EstoqueService:
     def __init__(self, supabase_client: Client, user_id: str):
         self.db = supabase_client
@@ -20,21 +36,23 @@ class EstoqueService:
     async def buscar_estoque(self, produto_id: int) -> Optional[EstoqueResponse]:
         """Busca estoque de um produto"""
         # Valida ownership do produto
-        produto = self.db.table("produtos")\
-            .select("id")\
-            .eq("id", produto_id)\
-            .eq("user_id", self.user_id)\
-            .maybe_single()\
-            .execute()
+        produto = await run_query(
+            self.db.table("produtos")
+            .select("id")
+            .eq("id", produto_id)
+            .eq("user_id", self.user_id)
+            .maybe_single()
+        )
         
         if not produto.data:
             return None
         
-        result = self.db.table("estoque")\
-            .select("*")\
-            .eq("produto_id", produto_id)\
-            .maybe_single()\
-            .execute()
+        result = await run_query(
+            self.db.table("estoque")
+            .select("*")
+            .eq("produto_id", produto_id)
+            .maybe_single()
+        )
         
         if result.data:
             return EstoqueResponse(**result.data)
@@ -58,104 +76,110 @@ class EstoqueService:
         - AJUSTE: Corrige divergências
         - RESERVA: Bloqueia quantidade (pedido pendente)
         - LIBERACAO: Libera reserva cancelada
-        """
-        # Valida ownership
-        produto = self.db.table("produtos")\
-            .select("id")\
-            .eq("id", produto_id)\
-            .eq("user_id", self.user_id)\
-            .maybe_single()\
-            .execute()
-        
-        if not produto.data:
-            raise ValueError("Produto não encontrado")
-        
-        # Busca estoque atual
-        estoque_atual = await self.buscar_estoque(produto_id)
-        
-        if not estoque_atual:
-            # Cria registro de estoque se não existir
-            self.db.table("estoque").insert({
-                "produto_id": produto_id,
-                "variacao_id": variacao_id,
-                "estoque_atual": 0,
-                "estoque_disponivel": 0,
-                "estoque_minimo": 0,
-                "estoque_reservado": 0
-            }).execute()
-            estoque_atual = await self.buscar_estoque(produto_id)
-        
-        # Valida movimentação
-        if tipo == TipoMovimentacao.SAIDA:
-            if estoque_atual.estoque_disponivel < quantidade:
-                raise ValueError(f"Estoque insuficiente. Disponível: {estoque_atual.estoque_disponivel}")
-        
-        elif tipo == TipoMovimentacao.RESERVA:
-            if estoque_atual.estoque_disponivel < quantidade:
-                raise ValueError(f"Estoque insuficiente para reserva. Disponível: {estoque_atual.estoque_disponivel}")
-        
-        # Registra movimentação
-        movimentacao_data = {
-            "produto_id": produto_id,
-            "variacao_id": variacao_id,
-            "tipo": tipo.value,
-            "quantidade": quantidade,
-            "motivo": motivo,
-            "custo_unitario": str(custo_unitario) if custo_unitario else None,
-            "documento": documento,
-            "user_id": self.user_id
-        }
         
-        self.db.table("movimentacoes_estoque").insert(movimentacao_data).execute()
-        
-        # Atualiza estoque
-        novo_estoque = self._calcular_novo_estoque(
-            estoque_atual, tipo, quantidade
-        )
-        
-        result = self.db.table("estoque")\
-            .update(novo_estoque)\
-            .eq("produto_id", produto_id)\
-            .execute()
+        Validação, registro e atualização do saldo rodam em uma transação no banco
+        (rpc movimentar_estoque, ver sql/estoque_movimentacoes.sql): um round trip
+        e sem corrida entre movimentações simultâneas do mesmo produto
+        """
+        try:
+            result = await run_query(self.db.rpc("movimentar_estoque", {
+                "p_user_id": self.user_id,
+                "p_produto_id": produto_id,
+                "p_variacao_id": variacao_id,
+                "p_tipo": tipo.value,
+                "p_quantidade": quantidade,
+                "p_motivo": motivo,
+                "p_custo_unitario": str(custo_unitario) if custo_unitario else None,
+                "p_documento": documento
+            }))
+        except APIError as e:
+            # RAISE EXCEPTION da função (produto inexistente, saldo insuficiente...)
+            if e.code == "P0001":
+                raise ValueError(e.message)
+            raise
         
         return EstoqueResponse(**result.data[0])
-    
-    def _calcular_novo_estoque(
-        self, 
-        estoque: EstoqueResponse, 
-        tipo: TipoMovimentacao, 
-        quantidade: int
-    ) -> dict:
-        """Calcula novos valores de estoque baseado no tipo de movimentação"""
-        novo = {
-            "estoque_atual": estoque.estoque_atual,
-            "estoque_disponivel": estoque.estoque_disponivel,
-            "estoque_reservado": getattr(estoque, 'estoque_reservado', 0)
-        }
-        
-        if tipo == TipoMovimentacao.ENTRADA:
-            novo["estoque_atual"] += quantidade
-            novo["estoque_disponivel"] += quantidade
-        
-        elif tipo == TipoMovimentacao.SAIDA:
-            novo["estoque_atual"] -= quantidade
-            novo["estoque_disponivel"] -= quantidade
-        
-        elif tipo == TipoMovimentacao.AJUSTE:
-            diferenca = quantidade - estoque.estoque_atual
-            novo["estoque_atual"] = quantidade
-            novo["estoque_disponivel"] += diferenca
-        
-        elif tipo == TipoMovimentacao.RESERVA:
-            novo["estoque_disponivel"] -= quantidade
-            novo["estoque_reservado"] += quantidade
-        
-        elif tipo == TipoMovimentacao.LIBERACAO:
-            novo["estoque_disponivel"] += quantidade
-            novo["estoque_reservado"] -= quantidade
-        
-        return novo
-    
+
+    async def movimentar_estoque_lote(
+        self,
+        movimentacoes: List[Dict[str, Any]],
+        atomico: bool = False
+    ) -> List[dict]:
+        """
+        Registra várias movimentações em uma chamada (rpc movimentar_estoque_lote)
+
+        Ownership de todos os produtos é validado em uma consulta e o lote roda em
+        uma transação, com savepoint por linha. Retorna um resultado por linha
+        ({indice, produto_id, sucesso, erro, estoque}) na ordem recebida.
+        Com atomico=True, qualquer falha desfaz o lote inteiro.
+        """
+        if not movimentacoes:
+            return []
+
+        linhas = []
+        for mov in movimentacoes:
+            tipo = mov.get("tipo")
+            custo = mov.get("custo_unitario")
+            linhas.append({
+                **mov,
+                "tipo": tipo.value if isinstance(tipo, TipoMovimentacao) else tipo,
+                "custo_unitario": str(custo) if custo else None
+            })
+
+        result = await run_query(self.db.rpc("movimentar_estoque_lote", {
+            "p_user_id": self.user_id,
+            "p_movimentacoes": linhas,
+            "p_atomico": atomico
+        }))
+
+        resultados = result.data or []
+        for linha in resultados:
+            if linha.get("estoque"):
+                linha["estoque"] = EstoqueResponse(**linha["estoque"])
+
+        return resultados
+
+    async def aplicar_pedido_ml(self, order_data: Dict[str, Any]) -> List[dict]:
+        """
+        Aplica um pedido do Mercado Livre ao estoque (RESERVA, SAIDA ou LIBERACAO)
+
+        Tudo acontece no banco em uma transação (rpc aplicar_pedido_ml_estoque):
+        deltas relativos, sem read-modify-write, e idempotente por pedido/produto,
+        então notificações repetidas ou retries não baixam o estoque duas vezes.
+
+        Retorna as movimentações aplicadas (vazio se nada mudou)
+        """
+        estado = ESTADO_ESTOQUE_POR_STATUS_PEDIDO.get(order_data.get("status"))
+        if not estado or not order_data.get("id"):
+            return []
+
+        itens = []
+        for order_item in order_data.get("order_items") or []:
+            item = order_item.get("item") or {}
+            if item.get("id") and order_item.get("quantity"):
+                itens.append({
+                    "ml_item_id": item["id"],
+                    "seller_sku": item.get("seller_sku"),
+                    "quantidade": order_item["quantity"]
+                })
+
+        if not itens:
+            return []
+
+        result = await run_query(self.db.rpc("aplicar_pedido_ml_estoque", {
+            "p_user_id": self.user_id,
+            "p_order_id": str(order_data["id"]),
+            "p_estado": estado,
+            "p_itens": itens
+        }))
+
+        movimentacoes = result.data or []
+        for mov in movimentacoes:
+            if mov.get("estoque_insuficiente"):
+                print(f"[ERROR] Estoque negativo no produto {mov['produto_id']} após pedido {order_data['id']}")
+
+        return movimentacoes
+
     async def listar_movimentacoes(
         self,
         produto_id: int,
@@ -164,29 +188,31 @@ class EstoqueService:
     ) -> List[dict]:
         """Lista histórico de movimentações de um produto"""
         # Valida ownership
-        produto = self.db.table("produtos")\
-            .select("id")\
-            .eq("id", produto_id)\
-            .eq("user_id", self.user_id)\
-            .maybe_single()\
-            .execute()
+        produto = await run_query(
+            self.db.table("produtos")
+            .select("id")
+            .eq("id", produto_id)
+            .eq("user_id", self.user_id)
+            .maybe_single()
+        )
         
         if not produto.data:
             return []
         
-        result = self.db.table("movimentacoes_estoque")\
-            .select("*")\
-            .eq("produto_id", produto_id)\
-            .order("created_at", desc=True)\
-            .range(skip, skip + limit - 1)\
-            .execute()
+        result = await run_query(
+            self.db.table("movimentacoes_estoque")
+            .select("*")
+            .eq("produto_id", produto_id)
+            .order("created_at", desc=True)
+            .range(skip, skip + limit - 1)
+        )
         
         return result.data
     
     async def produtos_abaixo_minimo(self) -> List[dict]:
         """Lista produtos com estoque abaixo do mínimo"""
-        result = self.db.rpc("produtos_abaixo_minimo", {
+        result = await run_query(self.db.rpc("produtos_abaixo_minimo", {
             "p_user_id": self.user_id
-        }).execute()
+        }))
         
         return result.data if result.data else []
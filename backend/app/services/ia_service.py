@@ -4,10 +4,11 @@ Análise inteligente de BuyBox e otimização de preços via IA (OpenAI)
 """
 from typing import List, Dict, Any
 from decimal import Decimal
-from datetime import datetime, timedelta
 from openai import OpenAI
 from supabase import Client
 from app.config.settings import settings
+from app.services.db_executor import run_query
+from app.services.buybox_snapshot_service import BuyBoxSnapshotService, contar_mudancas
 from app.models.schemas import (
     BuyBoxAnalysisResponse,
     PriceOptimizationResponse
@@ -34,12 +35,13 @@ class IAService:
         - Gera recomendações inteligentes
         """
         # Busca anúncio
-        anuncio = self.db.table("anuncios_ml")\
-            .select("*, produtos(*)")\
-            .eq("id", anuncio_id)\
-            .eq("user_id", self.user_id)\
-            .single()\
-            .execute()
+        anuncio = await run_query(
+            self.db.table("anuncios_ml")
+            .select("*, produtos(*)")
+            .eq("id", anuncio_id)
+            .eq("user_id", self.user_id)
+            .single()
+        )
         
         if not anuncio.data:
             raise ValueError("Anúncio não encontrado")
@@ -48,12 +50,13 @@ class IAService:
         nosso_preco = Decimal(str(anuncio_data["price"]))
         
         # Busca concorrentes
-        concorrentes = self.db.table("concorrentes")\
-            .select("*")\
-            .eq("anuncio_id", anuncio_id)\
-            .order("created_at", desc=True)\
-            .limit(10)\
-            .execute()
+        concorrentes = await run_query(
+            self.db.table("concorrentes")
+            .select("*")
+            .eq("anuncio_id", anuncio_id)
+            .order("created_at", desc=True)
+            .limit(10)
+        )
         
         # Encontra campeão do BuyBox
         preco_campeao = nosso_preco
@@ -61,15 +64,12 @@ class IAService:
             precos = [Decimal(str(c["preco"])) for c in concorrentes.data]
             preco_campeao = min(precos) if precos else nosso_preco
         
-        # Busca histórico se solicitado
+        # Busca histórico se solicitado (capturas agendadas em buybox_snapshots)
         historico = []
-        if incluir_historico:
-            historico = self.db.table("historico_buybox")\
-                .select("*")\
-                .eq("anuncio_id", anuncio_id)\
-                .gte("created_at", (datetime.utcnow() - timedelta(days=7)).isoformat())\
-                .order("created_at", desc=True)\
-                .execute()
+        if incluir_historico and anuncio_data.get("ml_id"):
+            historico = await BuyBoxSnapshotService(self.db, self.user_id).historico(
+                anuncio_data["ml_id"], dias=7
+            )
         
         # Monta contexto para IA
         contexto = self._montar_contexto_buybox(
@@ -77,7 +77,7 @@ class IAService:
             nosso_preco,
             preco_campeao,
             concorrentes.data,
-            historico.data if incluir_historico else []
+            historico
         )
         
         # Consulta GPT-4
@@ -91,13 +91,13 @@ class IAService:
         acoes = self._extrair_acoes(recomendacao)
         
         # Salva log
-        self.db.table("logs_ia").insert({
+        await run_query(self.db.table("logs_ia").insert({
             "user_id": self.user_id,
             "tipo": "buybox_analysis",
             "input": contexto,
             "output": recomendacao,
             "tokens_usados": 0  # TODO: capturar do response
-        }).execute()
+        }))
         
         return BuyBoxAnalysisResponse(
             anuncio_id=anuncio_id,
@@ -132,7 +132,9 @@ CONCORRENTES ({len(concorrentes)}):
             ctx += f"\n{i}. R$ {c['preco']} - Reputação: {c.get('reputacao', 'N/A')}"
         
         if historico:
-            ctx += f"\n\nHISTÓRICO (7 dias): {len(historico)} mudanças"
+            ctx += f"\n\nHISTÓRICO (7 dias): {len(historico)} capturas, {contar_mudancas(historico)} mudanças"
+            ultima = historico[0]
+            ctx += f"\nÚltima captura: status {ultima.get('status')}, price_to_win R$ {ultima.get('price_to_win')}"
         
         return ctx
     
@@ -191,12 +193,13 @@ Foque em: competitividade, margem, volume de vendas e reputação."""
         - Histórico de vendas
         """
         # Busca anúncio com produto
-        anuncio = self.db.table("anuncios_ml")\
-            .select("*, produtos(*)")\
-            .eq("id", anuncio_id)\
-            .eq("user_id", self.user_id)\
-            .single()\
-            .execute()
+        anuncio = await run_query(
+            self.db.table("anuncios_ml")
+            .select("*, produtos(*)")
+            .eq("id", anuncio_id)
+            .eq("user_id", self.user_id)
+            .single()
+        )
         
         if not anuncio.data:
             raise ValueError("Anúncio não encontrado")
@@ -210,10 +213,11 @@ Foque em: competitividade, margem, volume de vendas e reputação."""
         preco_minimo = custo * (1 + margem_minima / 100)
         
         # Busca concorrentes
-        concorrentes = self.db.table("concorrentes")\
-            .select("preco")\
-            .eq("anuncio_id", anuncio_id)\
-            .execute()
+        concorrentes = await run_query(
+            self.db.table("concorrentes")
+            .select("preco")
+            .eq("anuncio_id", anuncio_id)
+        )
         
         precos_concorrencia = [Decimal(str(c["preco"])) for c in concorrentes.data]
         preco_medio_concorrencia = sum(precos_concorrencia) / len(precos_concorrencia) if precos_concorrencia else preco_atual
@@ -0,0 +1,36 @@
+"""
+Cache curto de dados de BuyBox (price_to_win, produto do catálogo, competidores)
+O dashboard consulta dezenas de itens a cada poucos segundos: dentro do TTL
+(ML_BUYBOX_CACHE_TTL) a resposta vem da memória e polls simultâneos do mesmo
+item compartilham uma única chamada ao ML
+"""
+from typing import Any, Dict, Optional
+
+from app.config.settings import settings
+from app.utils.cache import AsyncTTLCache
+
+
+_buybox_cache: Optional[AsyncTTLCache] = None
+
+
+def get_buybox_cache() -> AsyncTTLCache:
+    """Retorna o cache de BuyBox singleton"""
+    global _buybox_cache
+
+    if _buybox_cache is None:
+        _buybox_cache = AsyncTTLCache(
+            maxsize=settings.ML_BUYBOX_CACHE_SIZE,
+            ttl=settings.ML_BUYBOX_CACHE_TTL
+        )
+
+    return _buybox_cache
+
+
+def metadados_cache(*idades: float) -> Dict[str, Any]:
+    """Frescor da resposta para a UI: idade do dado mais antigo usado e o TTL"""
+    idade = max(idades) if idades else 0.0
+    return {
+        "idade_segundos": round(idade, 1),
+        "ttl_segundos": settings.ML_BUYBOX_CACHE_TTL,
+        "do_cache": idade > 0
+    }
@@ -0,0 +1,78 @@
+"""
+Cliente HTTP compartilhado - Mercado Livre
+Um único httpx.AsyncClient por processo (pool de conexões + keep-alive + HTTP/2)
+"""
+from typing import Optional
+import httpx
+
+from app.config.settings import settings
+from app.services.ml_rate_limit import MLRateLimitTransport
+
+
+_ml_http_client: Optional[httpx.AsyncClient] = None
+
+
+def _http2_disponivel() -> bool:
+    """HTTP/2 no httpx depende do pacote opcional 'h2'"""
+    if not settings.ML_HTTP2_ENABLED:
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def create_ml_http_client() -> httpx.AsyncClient:
+    """
+    Cria um novo cliente com pool de conexões para api.mercadolibre.com
+    Toda requisição passa pelo rate limit e retry de MLRateLimitTransport
+    """
+    transporte = httpx.AsyncHTTPTransport(
+        http2=_http2_disponivel(),
+        limits=httpx.Limits(
+            max_connections=settings.ML_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.ML_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=60.0
+        )
+    )
+
+    return httpx.AsyncClient(
+        base_url=settings.ML_API_URL,
+        transport=MLRateLimitTransport(transporte),
+        timeout=httpx.Timeout(settings.ML_HTTP_TIMEOUT, connect=10.0),
+        headers={"Accept": "application/json"}
+    )
+
+
+async def init_ml_http_client() -> httpx.AsyncClient:
+    """Inicializa o cliente compartilhado (chamado no lifespan da aplicação)"""
+    global _ml_http_client
+
+    if _ml_http_client is None or _ml_http_client.is_closed:
+        _ml_http_client = create_ml_http_client()
+
+    return _ml_http_client
+
+
+async def close_ml_http_client() -> None:
+    """Fecha o cliente compartilhado (chamado no shutdown)"""
+    global _ml_http_client
+
+    if _ml_http_client is not None and not _ml_http_client.is_closed:
+        await _ml_http_client.aclose()
+
+    _ml_http_client = None
+
+
+def get_ml_http_client() -> httpx.AsyncClient:
+    """
+    Retorna cliente HTTP singleton para a API do ML
+    Cria sob demanda se o lifespan não rodou (scripts, serverless)
+    """
+    global _ml_http_client
+
+    if _ml_http_client is None or _ml_http_client.is_closed:
+        _ml_http_client = create_ml_http_client()
+
+    return _ml_http_client
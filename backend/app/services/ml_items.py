@@ -0,0 +1,170 @@
+"""
+Service - Busca de anúncios em lote (multiget)
+GET /items?ids=A,B,C com até 20 IDs por chamada e projeção de atributos
+GET /users/{id}/items/search?search_type=scan para enumerar todos os anúncios
+"""
+from typing import AsyncIterator, Dict, List, Any, Optional, Sequence, Tuple
+import asyncio
+import httpx
+
+from app.config.settings import settings
+
+
+ML_MULTIGET_MAX_IDS = 20
+
+# Limite máximo de IDs por página no modo scan
+ML_SCAN_PAGE_SIZE = 100
+
+# Campos persistidos em anuncios_ml (ver MercadoLivreService._mapear_anuncio)
+ATRIBUTOS_ANUNCIO = [
+    "id",
+    "title",
+    "price",
+    "available_quantity",
+    "sold_quantity",
+    "status",
+    "permalink",
+    "category_id",
+    "listing_type_id",
+    "condition",
+    "buying_mode",
+    "pictures"
+]
+
+ATRIBUTOS_CATALOGO = [
+    "id",
+    "title",
+    "price",
+    "catalog_product_id",
+    "thumbnail",
+    "permalink",
+    "attributes"
+]
+
+ATRIBUTOS_ESTOQUE = ["id", "available_quantity"]
+
+
+def dividir_em_lotes(ids: Sequence[str], tamanho: int = ML_MULTIGET_MAX_IDS) -> List[List[str]]:
+    """Divide a lista de IDs em lotes do tamanho aceito pelo multiget"""
+    ids = list(ids)
+    return [ids[i:i + tamanho] for i in range(0, len(ids), tamanho)]
+
+
+async def buscar_lote_itens(
+    http: httpx.AsyncClient,
+    token: str,
+    ids: Sequence[str],
+    atributos: Optional[Sequence[str]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Busca um lote (máx. 20) de anúncios em uma única chamada
+    Retorna {ml_id: body} apenas para itens com code 200
+    """
+    if not ids:
+        return {}
+
+    if len(ids) > ML_MULTIGET_MAX_IDS:
+        raise ValueError(f"Multiget aceita no máximo {ML_MULTIGET_MAX_IDS} IDs por chamada")
+
+    params = {"ids": ",".join(ids)}
+    if atributos:
+        params["attributes"] = ",".join(atributos)
+
+    response = await http.get(
+        f"{settings.ML_API_URL}/items",
+        headers={"Authorization": f"Bearer {token}"},
+        params=params
+    )
+
+    if response.status_code == 401:
+        raise ValueError("Token ML expirado. Reconecte-se ao Mercado Livre.")
+
+    if response.status_code != 200:
+        raise ValueError(f"Erro no multiget de anúncios: Status {response.status_code}")
+
+    itens = {}
+    for resultado in response.json():
+        body = resultado.get("body") or {}
+        if resultado.get("code") == 200 and body.get("id"):
+            itens[body["id"]] = body
+        else:
+            print(f"Item não retornado no multiget: {body.get('id') or resultado}")
+
+    return itens
+
+
+async def buscar_itens_multiget(
+    http: httpx.AsyncClient,
+    token: str,
+    ids: Sequence[str],
+    atributos: Optional[Sequence[str]] = None,
+    concorrencia: Optional[int] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Busca qualquer quantidade de anúncios em lotes de 20, com lotes em paralelo
+    Lotes com falha são ignorados (exceto token expirado, que é propagado)
+    """
+    semaforo = asyncio.Semaphore(concorrencia or settings.ML_SYNC_CONCURRENCY)
+
+    async def _buscar(lote: List[str]) -> Dict[str, Dict[str, Any]]:
+        async with semaforo:
+            try:
+                return await buscar_lote_itens(http, token, lote, atributos)
+            except ValueError as e:
+                if "Token ML expirado" in str(e):
+                    raise
+                print(f"Erro no lote multiget ({len(lote)} itens): {e}")
+                return {}
+            except httpx.HTTPError as e:
+                print(f"Erro no lote multiget ({len(lote)} itens): {e}")
+                return {}
+
+    resultados = await asyncio.gather(*[_buscar(lote) for lote in dividir_em_lotes(ids)])
+
+    itens: Dict[str, Dict[str, Any]] = {}
+    for parcial in resultados:
+        itens.update(parcial)
+    return itens
+
+
+async def iterar_ids_anuncios(
+    http: httpx.AsyncClient,
+    token: str,
+    ml_user_id: Any,
+    tamanho_pagina: int = ML_SCAN_PAGE_SIZE
+) -> AsyncIterator[Tuple[List[str], int]]:
+    """
+    Percorre TODOS os anúncios do vendedor via search_type=scan + scroll_id
+    Gera (ids_da_pagina, total) página a página, sem acumular a lista completa
+    (o paginador por offset do ML para em 1000 resultados)
+    """
+    params: Dict[str, Any] = {"search_type": "scan", "limit": tamanho_pagina}
+
+    while True:
+        try:
+            response = await http.get(
+                f"{settings.ML_API_URL}/users/{ml_user_id}/items/search",
+                headers={"Authorization": f"Bearer {token}"},
+                params=params
+            )
+        except httpx.TimeoutException:
+            raise ValueError("Timeout ao buscar anúncios do Mercado Livre. Tente novamente.")
+
+        if response.status_code == 401:
+            raise ValueError("Token ML expirado. Reconecte-se ao Mercado Livre.")
+
+        if response.status_code != 200:
+            raise ValueError(f"Erro ao buscar anúncios do ML: Status {response.status_code}")
+
+        data = response.json()
+        ids = data.get("results") or []
+        if not ids:
+            return
+
+        yield ids, data.get("paging", {}).get("total", 0)
+
+        scroll_id = data.get("scroll_id")
+        if not scroll_id:
+            return
+
+        params = {"search_type": "scan", "scroll_id": scroll_id, "limit": tamanho_pagina}
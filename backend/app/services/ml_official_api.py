@@ -4,17 +4,34 @@ Usando endpoints reais: price_to_win, products e items
 Dados verdadeiros de competição BuyBox
 """
 
-import requests
+import asyncio
+import inspect
+import httpx
 import json
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 import os
 from fastapi import HTTPException
 
+from app.services.ml_http_client import get_ml_http_client, create_ml_http_client
+from app.services.ml_reference_cache import get_ml_reference_cache
+from app.services.ml_buybox_cache import get_buybox_cache
+
+
+def _resposta_valida(data: Optional[Dict[str, Any]]) -> bool:
+    return data is not None
+
+
 class MLOfficialAPI:
-    """Integração oficial com APIs do Mercado Livre"""
+    """Integração oficial com APIs do Mercado Livre (async, cliente HTTP compartilhado)"""
     
-    def __init__(self):
+    # Timeouts por chamada (segundos)
+    READ_TIMEOUT = 10.0
+    WRITE_TIMEOUT = 30.0
+    
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None):
+        self._http = http_client
+        
         # Configurações da API oficial
         self.base_url = "https://api.mercadolibre.com"
         self.access_token = os.getenv('ML_ACCESS_TOKEN')  # Token de acesso real
@@ -30,16 +47,34 @@ class MLOfficialAPI:
         if self.access_token:
             self.headers['Authorization'] = f'Bearer {self.access_token}'
     
-    def get_item_price_to_win(self, item_id: str) -> Dict[str, Any]:
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """Cliente injetado ou o cliente compartilhado da aplicação"""
+        return self._http or get_ml_http_client()
+    
+    async def get_item_price_to_win(self, item_id: str, usar_fallback: bool = True) -> Optional[Dict[str, Any]]:
         """
         Endpoint oficial: /items/{item_id}/price_to_win
         Retorna análise REAL de competição BuyBox
-        """
+        (cache curto por item: polls simultâneos compartilham a chamada)
+        Com usar_fallback=False, retorna None quando o ML falha (sem dados de exemplo)
+        """
+        data, idade = await get_buybox_cache().obter(
+            ('official_price_to_win', item_id),
+            lambda: self._buscar_price_to_win(item_id),
+            cachear=_resposta_valida
+        )
+        if data is None:
+            return self._get_fallback_price_to_win(item_id) if usar_fallback else None
+        return {**data, 'cache_age_seconds': round(idade, 1)}
+    
+    async def _buscar_price_to_win(self, item_id: str) -> Optional[Dict[str, Any]]:
+        """price_to_win processado; None em erro (o chamador usa o fallback, que não é cacheado)"""
         try:
             url = f"{self.base_url}/items/{item_id}/price_to_win"
             params = {'version': 'v2'}
             
-            response = requests.get(url, headers=self.headers, params=params)
+            response = await self.http.get(url, headers=self.headers, params=params, timeout=self.READ_TIMEOUT)
             
             if response.status_code == 200:
                 data = response.json()
@@ -48,54 +83,77 @@ class MLOfficialAPI:
             
             elif response.status_code == 401:
                 print(f"❌ Token inválido ou expirado")
-                return self._get_fallback_price_to_win(item_id)
             
             elif response.status_code == 404:
                 print(f"❌ Item {item_id} não encontrado")
-                return self._get_fallback_price_to_win(item_id)
             
             else:
                 print(f"❌ Erro na API ML: {response.status_code}")
-                return self._get_fallback_price_to_win(item_id)
                 
         except Exception as e:
             print(f"❌ Erro na requisição: {e}")
-            return self._get_fallback_price_to_win(item_id)
+        return None
     
-    def get_product_competitors(self, product_id: str, filters: Optional[Dict] = None) -> Dict[str, Any]:
+    async def get_product_competitors(
+        self,
+        product_id: str,
+        filters: Optional[Dict] = None,
+        usar_fallback: bool = True
+    ) -> Optional[Dict[str, Any]]:
         """
         Endpoint oficial: /products/{product_id}/items
-        Retorna lista REAL de competidores
+        Retorna lista REAL de competidores (cache curto por produto + filtros)
+        Com usar_fallback=False, retorna None quando o ML falha (sem dados de exemplo)
         """
+        params = dict(filters or {})
+        params['limit'] = 50  # Máximo de competidores
+        
+        data, idade = await get_buybox_cache().obter(
+            ('official_competitors', product_id, tuple(sorted(params.items()))),
+            lambda: self._buscar_competidores(product_id, params),
+            cachear=_resposta_valida
+        )
+        if data is None:
+            return self._get_fallback_competitors(product_id) if usar_fallback else None
+        return {**data, 'cache_age_seconds': round(idade, 1)}
+    
+    async def _buscar_competidores(self, product_id: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         try:
             url = f"{self.base_url}/products/{product_id}/items"
-            params = filters or {}
-            params['limit'] = 50  # Máximo de competidores
             
-            response = requests.get(url, headers=self.headers, params=params)
+            response = await self.http.get(url, headers=self.headers, params=params, timeout=self.READ_TIMEOUT)
             
             if response.status_code == 200:
                 data = response.json()
                 print(f"✅ Competidores obtidos para produto {product_id}")
                 return self._process_competitors_data(data)
             
-            else:
-                print(f"❌ Erro ao buscar competidores: {response.status_code}")
-                return self._get_fallback_competitors(product_id)
+            print(f"❌ Erro ao buscar competidores: {response.status_code}")
                 
         except Exception as e:
             print(f"❌ Erro na requisição de competidores: {e}")
-            return self._get_fallback_competitors(product_id)
+        return None
     
-    def get_product_buybox_winner(self, product_id: str) -> Dict[str, Any]:
+    async def get_product_buybox_winner(self, product_id: str, usar_fallback: bool = True) -> Optional[Dict[str, Any]]:
         """
         Endpoint oficial: /products/{product_id}
-        Retorna o ganhador atual do BuyBox
-        """
+        Retorna o ganhador atual do BuyBox (cache curto por produto)
+        Com usar_fallback=False, retorna None quando o ML falha (sem dados de exemplo)
+        """
+        data, idade = await get_buybox_cache().obter(
+            ('official_winner', product_id),
+            lambda: self._buscar_buybox_winner(product_id),
+            cachear=_resposta_valida
+        )
+        if data is None:
+            return self._get_fallback_winner(product_id) if usar_fallback else None
+        return {**data, 'cache_age_seconds': round(idade, 1)}
+    
+    async def _buscar_buybox_winner(self, product_id: str) -> Optional[Dict[str, Any]]:
         try:
             url = f"{self.base_url}/products/{product_id}"
             
-            response = requests.get(url, headers=self.headers)
+            response = await self.http.get(url, headers=self.headers, timeout=self.READ_TIMEOUT)
             
             if response.status_code == 200:
                 data = response.json()
@@ -111,13 +169,11 @@ class MLOfficialAPI:
                     'permalink': data.get('permalink', '')
                 }
             
-            else:
-                print(f"❌ Erro ao buscar winner: {response.status_code}")
-                return self._get_fallback_winner(product_id)
+            print(f"❌ Erro ao buscar winner: {response.status_code}")
                 
         except Exception as e:
             print(f"❌ Erro na requisição de winner: {e}")
-            return self._get_fallback_winner(product_id)
+        return None
     
     def _process_price_to_win_data(self, data: Dict) -> Dict[str, Any]:
         """Processar dados da API price_to_win"""
@@ -481,45 +537,38 @@ class MLOfficialAPI:
     
     # ==================== LISTING TYPES METHODS ====================
     
-    def get_listing_types(self, site_id: str) -> List[Dict[str, Any]]:
+    async def get_listing_types(self, site_id: str) -> List[Dict[str, Any]]:
         """
         GET /sites/{site_id}/listing_types
         Obter todos os tipos de publicação por site
         """
         try:
             url = f"{self.base_url}/sites/{site_id}/listing_types"
-            response = requests.get(url, headers=self.headers)
-            
-            if response.status_code == 200:
-                return response.json()
-            else:
-                print(f"❌ Erro ao buscar listing types: {response.status_code}")
-                return self._get_fallback_listing_types(site_id)
-                
+            # Dado de referência: cache com ETag e stale-while-revalidate (ml_reference_cache)
+            return await get_ml_reference_cache().obter(
+                self.http, url, self.headers, timeout=self.READ_TIMEOUT
+            )
+
         except Exception as e:
             print(f"❌ Erro na requisição: {e}")
             return self._get_fallback_listing_types(site_id)
     
-    def get_listing_type_details(self, site_id: str, listing_type_id: str) -> Dict[str, Any]:
+    async def get_listing_type_details(self, site_id: str, listing_type_id: str) -> Dict[str, Any]:
         """
         GET /sites/{site_id}/listing_types/{listing_type_id}
         Obter especificações detalhadas de um tipo de publicação
         """
         try:
             url = f"{self.base_url}/sites/{site_id}/listing_types/{listing_type_id}"
-            response = requests.get(url, headers=self.headers)
-            
-            if response.status_code == 200:
-                return response.json()
-            else:
-                print(f"❌ Erro ao buscar detalhes: {response.status_code}")
-                return {}
-                
+            return await get_ml_reference_cache().obter(
+                self.http, url, self.headers, timeout=self.READ_TIMEOUT
+            )
+
         except Exception as e:
             print(f"❌ Erro na requisição: {e}")
             return {}
     
-    def get_user_available_listing_types(self, user_id: str, category_id: Optional[str] = None) -> Dict[str, Any]:
+    async def get_user_available_listing_types(self, user_id: str, category_id: Optional[str] = None) -> Dict[str, Any]:
         """
         GET /users/{user_id}/available_listing_types?category_id={category_id}
         Verificar tipos disponíveis para usuário em uma categoria
@@ -530,7 +579,7 @@ class MLOfficialAPI:
             if category_id:
                 params['category_id'] = category_id
             
-            response = requests.get(url, headers=self.headers, params=params)
+            response = await self.http.get(url, headers=self.headers, params=params, timeout=self.READ_TIMEOUT)
             
             if response.status_code == 200:
                 return response.json()
@@ -542,52 +591,44 @@ class MLOfficialAPI:
             print(f"❌ Erro na requisição: {e}")
             return {"category_id": category_id, "available": []}
     
-    def get_listing_exposures(self, site_id: str) -> List[Dict[str, Any]]:
+    async def get_listing_exposures(self, site_id: str) -> List[Dict[str, Any]]:
         """
         GET /sites/{site_id}/listing_exposures
         Obter níveis de exposição de publicações
         """
         try:
             url = f"{self.base_url}/sites/{site_id}/listing_exposures"
-            response = requests.get(url, headers=self.headers)
-            
-            if response.status_code == 200:
-                return response.json()
-            else:
-                print(f"❌ Erro ao buscar exposições: {response.status_code}")
-                return self._get_fallback_exposures()
-                
+            return await get_ml_reference_cache().obter(
+                self.http, url, self.headers, timeout=self.READ_TIMEOUT
+            )
+
         except Exception as e:
             print(f"❌ Erro na requisição: {e}")
             return self._get_fallback_exposures()
     
-    def get_listing_exposure_by_id(self, site_id: str, exposure_id: str) -> Dict[str, Any]:
+    async def get_listing_exposure_by_id(self, site_id: str, exposure_id: str) -> Dict[str, Any]:
         """
         GET /sites/{site_id}/listing_exposures/{exposure_id}
         Obter detalhes de um nível de exposição específico
         """
         try:
             url = f"{self.base_url}/sites/{site_id}/listing_exposures/{exposure_id}"
-            response = requests.get(url, headers=self.headers)
-            
-            if response.status_code == 200:
-                return response.json()
-            else:
-                print(f"❌ Erro ao buscar exposição: {response.status_code}")
-                return {}
-                
+            return await get_ml_reference_cache().obter(
+                self.http, url, self.headers, timeout=self.READ_TIMEOUT
+            )
+
         except Exception as e:
             print(f"❌ Erro na requisição: {e}")
             return {}
     
-    def get_item_available_listing_types(self, item_id: str) -> List[Dict[str, Any]]:
+    async def get_item_available_listing_types(self, item_id: str) -> List[Dict[str, Any]]:
         """
         GET /items/{item_id}/available_listing_types
         Verificar tipos disponíveis para um item específico
         """
         try:
             url = f"{self.base_url}/items/{item_id}/available_listing_types"
-            response = requests.get(url, headers=self.headers)
+            response = await self.http.get(url, headers=self.headers, timeout=self.READ_TIMEOUT)
             
             if response.status_code == 200:
                 return response.json()
@@ -599,14 +640,14 @@ class MLOfficialAPI:
             print(f"❌ Erro na requisição: {e}")
             return []
     
-    def get_item_available_upgrades(self, item_id: str) -> List[Dict[str, Any]]:
+    async def get_item_available_upgrades(self, item_id: str) -> List[Dict[str, Any]]:
         """
         GET /items/{item_id}/available_upgrades
         Verificar upgrades disponíveis para um item
         """
         try:
             url = f"{self.base_url}/items/{item_id}/available_upgrades"
-            response = requests.get(url, headers=self.headers)
+            response = await self.http.get(url, headers=self.headers, timeout=self.READ_TIMEOUT)
             
             if response.status_code == 200:
                 return response.json()
@@ -618,14 +659,14 @@ class MLOfficialAPI:
             print(f"❌ Erro na requisição: {e}")
             return []
     
-    def get_item_available_downgrades(self, item_id: str) -> List[Dict[str, Any]]:
+    async def get_item_available_downgrades(self, item_id: str) -> List[Dict[str, Any]]:
         """
         GET /items/{item_id}/available_downgrades
         Verificar downgrades disponíveis para um item
         """
         try:
             url = f"{self.base_url}/items/{item_id}/available_downgrades"
-            response = requests.get(url, headers=self.headers)
+            response = await self.http.get(url, headers=self.headers, timeout=self.READ_TIMEOUT)
             
             if response.status_code == 200:
                 return response.json()
@@ -637,7 +678,7 @@ class MLOfficialAPI:
             print(f"❌ Erro na requisição: {e}")
             return []
     
-    def update_item_listing_type(self, item_id: str, listing_type_id: str) -> Dict[str, Any]:
+    async def update_item_listing_type(self, item_id: str, listing_type_id: str) -> Dict[str, Any]:
         """
         POST /items/{item_id}/listing_type
         Atualizar tipo de publicação de um item
@@ -646,7 +687,7 @@ class MLOfficialAPI:
             url = f"{self.base_url}/items/{item_id}/listing_type"
             data = {"id": listing_type_id}
             
-            response = requests.post(url, headers=self.headers, json=data)
+            response = await self.http.post(url, headers=self.headers, json=data, timeout=self.WRITE_TIMEOUT)
             
             if response.status_code == 200:
                 print(f"✅ Listing type atualizado: {item_id} -> {listing_type_id}")
@@ -727,7 +768,7 @@ class MLOfficialAPI:
     # MÉTODOS DE CATÁLOGO (CATALOG)
     # ========================================
     
-    def search_catalog_items_by_seller(self, user_id: str, catalog_listing: bool = True, status: str = None) -> Dict[str, Any]:
+    async def search_catalog_items_by_seller(self, user_id: str, catalog_listing: bool = True, status: str = None) -> Dict[str, Any]:
         """
         Filtrar itens por vendedor - publicações de catálogo vs tradicionais
         GET /users/{user_id}/items/search?catalog_listing=true|false
@@ -739,7 +780,7 @@ class MLOfficialAPI:
             if status:
                 params['status'] = status
             
-            response = requests.get(url, headers=self.headers, params=params)
+            response = await self.http.get(url, headers=self.headers, params=params, timeout=self.READ_TIMEOUT)
             
             if response.status_code == 200:
                 data = response.json()
@@ -757,7 +798,7 @@ class MLOfficialAPI:
             print(f"❌ Erro ao buscar itens do vendedor: {e}")
             return self._get_fallback_seller_items(user_id, catalog_listing)
     
-    def check_catalog_eligibility(self, item_id: str) -> Dict[str, Any]:
+    async def check_catalog_eligibility(self, item_id: str) -> Dict[str, Any]:
         """
         Verificar elegibilidade de item para catálogo
         GET /items/{item_id}/catalog_listing_eligibility
@@ -765,7 +806,7 @@ class MLOfficialAPI:
         try:
             url = f"{self.base_url}/items/{item_id}/catalog_listing_eligibility"
             
-            response = requests.get(url, headers=self.headers)
+            response = await self.http.get(url, headers=self.headers, timeout=self.READ_TIMEOUT)
             
             if response.status_code == 200:
                 data = response.json()
@@ -785,7 +826,7 @@ class MLOfficialAPI:
             print(f"❌ Erro ao verificar elegibilidade: {e}")
             return {'item_id': item_id, 'error': str(e)}
     
-    def check_multiple_catalog_eligibility(self, item_ids: List[str]) -> List[Dict[str, Any]]:
+    async def check_multiple_catalog_eligibility(self, item_ids: List[str]) -> List[Dict[str, Any]]:
         """
         Verificar elegibilidade de múltiplos itens
         GET /multiget/catalog_listing_eligibility?ids=ID1,ID2,ID3
@@ -794,7 +835,7 @@ class MLOfficialAPI:
             url = f"{self.base_url}/multiget/catalog_listing_eligibility"
             params = {'ids': ','.join(item_ids)}
             
-            response = requests.get(url, headers=self.headers, params=params)
+            response = await self.http.get(url, headers=self.headers, params=params, timeout=self.READ_TIMEOUT)
             
             if response.status_code == 200:
                 return response.json()
@@ -805,7 +846,7 @@ class MLOfficialAPI:
             print(f"❌ Erro ao verificar múltiplos itens: {e}")
             return []
     
-    def search_catalog_products(
+    async def search_catalog_products(
         self, 
         site_id: str,
         status: str = 'active',
@@ -838,7 +879,7 @@ class MLOfficialAPI:
             if listing_strategy:
                 params['listing_strategy'] = listing_strategy
             
-            response = requests.get(url, headers=self.headers, params=params)
+            response = await self.http.get(url, headers=self.headers, params=params, timeout=self.READ_TIMEOUT)
             
             if response.status_code == 200:
                 data = response.json()
@@ -855,7 +896,7 @@ class MLOfficialAPI:
             print(f"❌ Erro ao buscar produtos: {e}")
             return {'total': 0, 'results': [], 'error': str(e)}
     
-    def get_catalog_product_details(self, product_id: str) -> Dict[str, Any]:
+    async def get_catalog_product_details(self, product_id: str) -> Dict[str, Any]:
         """
         Detalhe de produto de catálogo
         GET /products/{product_id}
@@ -863,7 +904,7 @@ class MLOfficialAPI:
         try:
             url = f"{self.base_url}/products/{product_id}"
             
-            response = requests.get(url, headers=self.headers)
+            response = await self.http.get(url, headers=self.headers, timeout=self.READ_TIMEOUT)
             
             if response.status_code == 200:
                 data = response.json()
@@ -889,7 +930,7 @@ class MLOfficialAPI:
             print(f"❌ Erro ao buscar detalhes do produto: {e}")
             return {'error': str(e)}
     
-    def create_catalog_listing(self, item_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def create_catalog_listing(self, item_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Criar publicação diretamente no catálogo
         POST /items
@@ -900,7 +941,7 @@ class MLOfficialAPI:
             # Garantir que catalog_listing=true
             item_data['catalog_listing'] = True
             
-            response = requests.post(url, headers=self.headers, json=item_data)
+            response = await self.http.post(url, headers=self.headers, json=item_data, timeout=self.WRITE_TIMEOUT)
             
             if response.status_code == 201:
                 return response.json()
@@ -916,7 +957,7 @@ class MLOfficialAPI:
             print(f"❌ Erro ao criar publicação de catálogo: {e}")
             return {'error': str(e)}
     
-    def create_catalog_optin(self, item_id: str, catalog_product_id: str, variation_id: str = None) -> Dict[str, Any]:
+    async def create_catalog_optin(self, item_id: str, catalog_product_id: str, variation_id: str = None) -> Dict[str, Any]:
         """
         Fazer optin de item tradicional para catálogo
         POST /items/catalog_listings
@@ -932,7 +973,7 @@ class MLOfficialAPI:
             if variation_id:
                 payload['variation_id'] = variation_id
             
-            response = requests.post(url, headers=self.headers, json=payload)
+            response = await self.http.post(url, headers=self.headers, json=payload, timeout=self.WRITE_TIMEOUT)
             
             if response.status_code in [200, 201]:
                 return response.json()
@@ -948,7 +989,7 @@ class MLOfficialAPI:
             print(f"❌ Erro ao fazer optin: {e}")
             return {'error': str(e)}
     
-    def get_catalog_forewarning_date(self, item_id: str) -> Dict[str, Any]:
+    async def get_catalog_forewarning_date(self, item_id: str) -> Dict[str, Any]:
         """
         Consultar data limite para associar item ao catálogo
         GET /items/{item_id}/catalog_forewarning/date
@@ -956,7 +997,7 @@ class MLOfficialAPI:
         try:
             url = f"{self.base_url}/items/{item_id}/catalog_forewarning/date"
             
-            response = requests.get(url, headers=self.headers)
+            response = await self.http.get(url, headers=self.headers, timeout=self.READ_TIMEOUT)
             
             if response.status_code == 200:
                 return response.json()
@@ -967,7 +1008,7 @@ class MLOfficialAPI:
             print(f"❌ Erro ao buscar data de forewarning: {e}")
             return {'error': str(e)}
     
-    def get_catalog_sync_status(self, item_id: str) -> Dict[str, Any]:
+    async def get_catalog_sync_status(self, item_id: str) -> Dict[str, Any]:
         """
         Verificar sincronização entre item tradicional e catálogo
         GET /public/buybox/sync/{item_id}
@@ -977,7 +1018,7 @@ class MLOfficialAPI:
             headers_with_public = self.headers.copy()
             headers_with_public['x-public'] = 'True'
             
-            response = requests.get(url, headers=headers_with_public)
+            response = await self.http.get(url, headers=headers_with_public, timeout=self.READ_TIMEOUT)
             
             if response.status_code == 200:
                 return response.json()
@@ -988,7 +1029,7 @@ class MLOfficialAPI:
             print(f"❌ Erro ao verificar sincronização: {e}")
             return {'error': str(e)}
     
-    def fix_catalog_sync(self, item_id: str) -> Dict[str, Any]:
+    async def fix_catalog_sync(self, item_id: str) -> Dict[str, Any]:
         """
         Corrigir sincronização de item
         POST /public/buybox/sync
@@ -1000,7 +1041,7 @@ class MLOfficialAPI:
             
             payload = {'id': item_id}
             
-            response = requests.post(url, headers=headers_with_public, json=payload)
+            response = await self.http.post(url, headers=headers_with_public, json=payload, timeout=self.WRITE_TIMEOUT)
             
             if response.status_code == 200:
                 return {'success': True, 'message': 'Sincronização corrigida'}
@@ -1015,7 +1056,7 @@ class MLOfficialAPI:
     # MÉTODOS DE BRAND CENTRAL
     # ========================================
     
-    def get_user_catalog_quota(self, user_id: str) -> Dict[str, Any]:
+    async def get_user_catalog_quota(self, user_id: str) -> Dict[str, Any]:
         """
         Verificar quota de sugestões disponíveis
         GET /catalog_suggestions/users/{user_id}/quota
@@ -1023,7 +1064,7 @@ class MLOfficialAPI:
         try:
             url = f"{self.base_url}/catalog_suggestions/users/{user_id}/quota"
             
-            response = requests.get(url, headers=self.headers)
+            response = await self.http.get(url, headers=self.headers, timeout=self.READ_TIMEOUT)
             
             if response.status_code == 200:
                 return response.json()
@@ -1034,7 +1075,7 @@ class MLOfficialAPI:
             print(f"❌ Erro ao buscar quota: {e}")
             return {'error': str(e)}
     
-    def get_available_domains_for_suggestions(self, site_id: str) -> Dict[str, Any]:
+    async def get_available_domains_for_suggestions(self, site_id: str) -> Dict[str, Any]:
         """
         Listar domínios disponíveis para sugestões
         GET /catalog_suggestions/domains/{site_id}/available/full
@@ -1042,18 +1083,17 @@ class MLOfficialAPI:
         try:
             url = f"{self.base_url}/catalog_suggestions/domains/{site_id}/available/full"
             
-            response = requests.get(url, headers=self.headers)
-            
-            if response.status_code == 200:
-                return response.json()
-            else:
-                return {'domains': [], 'error': 'Domínios não disponíveis'}
-                
+            return await get_ml_reference_cache().obter(
+                self.http, url, self.headers, timeout=self.READ_TIMEOUT
+            )
+
+        except httpx.HTTPStatusError:
+            return {'domains': [], 'error': 'Domínios não disponíveis'}
         except Exception as e:
             print(f"❌ Erro ao buscar domínios: {e}")
             return {'error': str(e)}
     
-    def get_domain_technical_specs(self, domain_id: str, spec_type: str = 'full') -> Dict[str, Any]:
+    async def get_domain_technical_specs(self, domain_id: str, spec_type: str = 'full') -> Dict[str, Any]:
         """
         Obter ficha técnica de um domínio
         GET /domains/{domain_id}/technical_specs?channel_id=catalog_suggestions
@@ -1069,18 +1109,17 @@ class MLOfficialAPI:
             
             params = {'channel_id': 'catalog_suggestions'}
             
-            response = requests.get(url, headers=self.headers, params=params)
-            
-            if response.status_code == 200:
-                return response.json()
-            else:
-                return {'error': 'Ficha técnica não disponível'}
-                
+            return await get_ml_reference_cache().obter(
+                self.http, url, self.headers, params=params, timeout=self.READ_TIMEOUT
+            )
+
+        except httpx.HTTPStatusError:
+            return {'error': 'Ficha técnica não disponível'}
         except Exception as e:
             print(f"❌ Erro ao buscar ficha técnica: {e}")
             return {'error': str(e)}
     
-    def validate_catalog_suggestion(self, suggestion_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def validate_catalog_suggestion(self, suggestion_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Validar sugestão antes de criar
         POST /catalog_suggestions/validate
@@ -1088,7 +1127,7 @@ class MLOfficialAPI:
         try:
             url = f"{self.base_url}/catalog_suggestions/validate"
             
-            response = requests.post(url, headers=self.headers, json=suggestion_data)
+            response = await self.http.post(url, headers=self.headers, json=suggestion_data, timeout=self.WRITE_TIMEOUT)
             
             if response.status_code == 200:
                 return {'valid': True, 'message': 'Sugestão válida'}
@@ -1104,7 +1143,7 @@ class MLOfficialAPI:
             print(f"❌ Erro ao validar sugestão: {e}")
             return {'error': str(e)}
     
-    def create_catalog_suggestion(self, suggestion_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def create_catalog_suggestion(self, suggestion_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Criar sugestão de produto para o catálogo
         POST /catalog_suggestions
@@ -1112,7 +1151,7 @@ class MLOfficialAPI:
         try:
             url = f"{self.base_url}/catalog_suggestions"
             
-            response = requests.post(url, headers=self.headers, json=suggestion_data)
+            response = await self.http.post(url, headers=self.headers, json=suggestion_data, timeout=self.WRITE_TIMEOUT)
             
             if response.status_code in [200, 201]:
                 return response.json()
@@ -1128,7 +1167,7 @@ class MLOfficialAPI:
             print(f"❌ Erro ao criar sugestão: {e}")
             return {'error': str(e)}
     
-    def get_catalog_suggestion(self, suggestion_id: str) -> Dict[str, Any]:
+    async def get_catalog_suggestion(self, suggestion_id: str) -> Dict[str, Any]:
         """
         Obter detalhes de uma sugestão
         GET /catalog_suggestions/{suggestion_id}
@@ -1136,7 +1175,7 @@ class MLOfficialAPI:
         try:
             url = f"{self.base_url}/catalog_suggestions/{suggestion_id}"
             
-            response = requests.get(url, headers=self.headers)
+            response = await self.http.get(url, headers=self.headers, timeout=self.READ_TIMEOUT)
             
             if response.status_code == 200:
                 return response.json()
@@ -1147,7 +1186,7 @@ class MLOfficialAPI:
             print(f"❌ Erro ao buscar sugestão: {e}")
             return {'error': str(e)}
     
-    def update_catalog_suggestion(self, suggestion_id: str, suggestion_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def update_catalog_suggestion(self, suggestion_id: str, suggestion_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Modificar uma sugestão existente
         PUT /catalog_suggestions/{suggestion_id}
@@ -1155,7 +1194,7 @@ class MLOfficialAPI:
         try:
             url = f"{self.base_url}/catalog_suggestions/{suggestion_id}"
             
-            response = requests.put(url, headers=self.headers, json=suggestion_data)
+            response = await self.http.put(url, headers=self.headers, json=suggestion_data, timeout=self.WRITE_TIMEOUT)
             
             if response.status_code == 200:
                 return response.json()
@@ -1170,7 +1209,7 @@ class MLOfficialAPI:
             print(f"❌ Erro ao atualizar sugestão: {e}")
             return {'error': str(e)}
     
-    def list_user_suggestions(
+    async def list_user_suggestions(
         self,
         user_id: str,
         limit: int = 50,
@@ -1198,7 +1237,7 @@ class MLOfficialAPI:
             if title:
                 params['title'] = title
             
-            response = requests.get(url, headers=self.headers, params=params)
+            response = await self.http.get(url, headers=self.headers, params=params, timeout=self.READ_TIMEOUT)
             
             if response.status_code == 200:
                 return response.json()
@@ -1209,7 +1248,7 @@ class MLOfficialAPI:
             print(f"❌ Erro ao listar sugestões: {e}")
             return {'error': str(e)}
     
-    def get_suggestion_validations(self, suggestion_id: str) -> Dict[str, Any]:
+    async def get_suggestion_validations(self, suggestion_id: str) -> Dict[str, Any]:
         """
         Obter resultado das validações de uma sugestão
         GET /catalog_suggestions/{suggestion_id}/validations
@@ -1217,7 +1256,7 @@ class MLOfficialAPI:
         try:
             url = f"{self.base_url}/catalog_suggestions/{suggestion_id}/validations"
             
-            response = requests.get(url, headers=self.headers)
+            response = await self.http.get(url, headers=self.headers, timeout=self.READ_TIMEOUT)
             
             if response.status_code == 200:
                 return response.json()
@@ -1228,7 +1267,7 @@ class MLOfficialAPI:
             print(f"❌ Erro ao buscar validações: {e}")
             return {'error': str(e)}
     
-    def create_suggestion_description(self, suggestion_id: str, description: str) -> Dict[str, Any]:
+    async def create_suggestion_description(self, suggestion_id: str, description: str) -> Dict[str, Any]:
         """
         Criar descrição para sugestão
         POST /catalog_suggestions/{suggestion_id}/description
@@ -1237,7 +1276,7 @@ class MLOfficialAPI:
             url = f"{self.base_url}/catalog_suggestions/{suggestion_id}/description"
             payload = {'plain_text': description}
             
-            response = requests.post(url, headers=self.headers, json=payload)
+            response = await self.http.post(url, headers=self.headers, json=payload, timeout=self.WRITE_TIMEOUT)
             
             if response.status_code == 200:
                 return {'success': True, 'message': 'Descrição criada'}
@@ -1248,7 +1287,7 @@ class MLOfficialAPI:
             print(f"❌ Erro ao criar descrição: {e}")
             return {'error': str(e)}
     
-    def update_suggestion_description(self, suggestion_id: str, description: str) -> Dict[str, Any]:
+    async def update_suggestion_description(self, suggestion_id: str, description: str) -> Dict[str, Any]:
         """
         Atualizar descrição de sugestão
         PUT /catalog_suggestions/{suggestion_id}/description
@@ -1257,7 +1296,7 @@ class MLOfficialAPI:
             url = f"{self.base_url}/catalog_suggestions/{suggestion_id}/description"
             payload = {'plain_text': description}
             
-            response = requests.put(url, headers=self.headers, json=payload)
+            response = await self.http.put(url, headers=self.headers, json=payload, timeout=self.WRITE_TIMEOUT)
             
             if response.status_code == 200:
                 return {'success': True, 'message': 'Descrição atualizada'}
@@ -1282,5 +1321,26 @@ class MLOfficialAPI:
             'paging': {'total': 0, 'offset': 0, 'limit': 50}
         }
 
+
+class MLOfficialAPISync:
+    """
+    Compatibilidade síncrona para scripts (fora do event loop)
+    Cada chamada executa o método async com um cliente HTTP próprio
+    """
+    
+    def __getattr__(self, name: str):
+        attr = getattr(MLOfficialAPI, name)
+        if not inspect.iscoroutinefunction(attr):
+            return getattr(MLOfficialAPI(), name)
+        
+        def _executar(*args, **kwargs):
+            async def _chamar():
+                async with create_ml_http_client() as client:
+                    api = MLOfficialAPI(http_client=client)
+                    return await getattr(api, name)(*args, **kwargs)
+            return asyncio.run(_chamar())
+        
+        return _executar
+
 # Instância global
 ml_official_api = MLOfficialAPI()
\ No newline at end of file
@@ -0,0 +1,179 @@
+"""
+Camada de requisições da API do Mercado Livre: rate limit + retry
+Transport do httpx instalado no cliente compartilhado (ml_http_client), então vale
+para MercadoLivreService, MLSyncService, MLOfficialAPI, webhooks e OAuth
+"""
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+import asyncio
+import random
+import time
+import httpx
+
+from app.config.settings import settings
+from app.utils.cache import TTLCache
+from app.utils.rate_limit import TokenBucket, get_ml_rate_limiter
+
+
+# Repetir estes métodos após 5xx/erro de rede não duplica efeitos no ML
+METODOS_IDEMPOTENTES = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+STATUS_REPETIVEIS = {500, 502, 503, 504}
+
+# Métricas do processo (ver get_ml_api_stats)
+_metricas = {
+    "requisicoes": 0,
+    "throttled_429": 0,
+    "erros_5xx": 0,
+    "erros_rede": 0,
+    "retries": 0,
+    "esgotadas": 0,
+    "esperas_rate_limit": 0,
+    "segundos_em_espera": 0.0
+}
+
+
+def calcular_backoff_ml(tentativa: int) -> float:
+    """Espera exponencial com jitter: base * 2^(tentativa-1), limitada a ML_RETRY_MAX_SECONDS"""
+    espera = settings.ML_RETRY_BASE_SECONDS * (2 ** max(tentativa - 1, 0))
+    espera = min(espera, settings.ML_RETRY_MAX_SECONDS)
+    return espera * random.uniform(0.5, 1.0)
+
+
+def ler_retry_after(response: httpx.Response) -> Optional[float]:
+    """Retry-After em segundos ou data HTTP; None se ausente/inválido"""
+    valor = response.headers.get("retry-after")
+    if not valor:
+        return None
+
+    try:
+        segundos = float(valor)
+    except ValueError:
+        try:
+            data = parsedate_to_datetime(valor)
+        except (TypeError, ValueError):
+            return None
+        segundos = (data - datetime.now(timezone.utc)).total_seconds()
+
+    return min(max(segundos, 0.0), settings.ML_RETRY_MAX_SECONDS)
+
+
+def chave_vendedor(request: httpx.Request) -> Optional[str]:
+    """
+    Identifica o vendedor pelo access token (APP_USR-...-<user_id>)
+    Chave estável entre renovações do token; requisições sem token usam só a cota da app
+    """
+    autorizacao = request.headers.get("authorization", "")
+    if not autorizacao.lower().startswith("bearer "):
+        return None
+
+    token = autorizacao[7:].strip()
+    sufixo = token.rsplit("-", 1)[-1]
+    return sufixo if sufixo.isdigit() else str(hash(token))
+
+
+class MLRateLimitTransport(httpx.AsyncBaseTransport):
+    """
+    Envolve o transport real:
+    - espera fichas do balde do vendedor e do balde da aplicação antes de enviar
+    - 429: pausa o balde (Retry-After ou backoff) e repete
+    - 5xx/erro de rede: repete com backoff só em métodos idempotentes
+    Após ML_RETRY_MAX_ATTEMPTS a última resposta é devolvida (raise_for_status decide)
+    """
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        limitador_app: Optional[TokenBucket] = None
+    ):
+        self._transport = transport
+        self._app = limitador_app or get_ml_rate_limiter()
+        self._vendedores = TTLCache(maxsize=10000, ttl=3600)
+
+    def _balde_vendedor(self, request: httpx.Request) -> Optional[TokenBucket]:
+        chave = chave_vendedor(request)
+        if chave is None:
+            return None
+
+        balde = self._vendedores.get(chave)
+        if balde is None:
+            balde = TokenBucket(
+                taxa=settings.ML_SELLER_RATE_LIMIT_PER_SECOND,
+                capacidade=settings.ML_SELLER_RATE_LIMIT_BURST
+            )
+            self._vendedores.set(chave, balde)
+        return balde
+
+    async def _aguardar_fichas(self, vendedor: Optional[TokenBucket]) -> None:
+        # Vendedor primeiro: não segura ficha da aplicação enquanto espera a própria cota
+        inicio = time.monotonic()
+        if vendedor is not None:
+            await vendedor.adquirir()
+        await self._app.adquirir()
+
+        espera = time.monotonic() - inicio
+        if espera > 0.001:
+            _metricas["esperas_rate_limit"] += 1
+            _metricas["segundos_em_espera"] += espera
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        vendedor = self._balde_vendedor(request)
+        idempotente = request.method in METODOS_IDEMPOTENTES
+        tentativa = 0
+
+        while True:
+            tentativa += 1
+            ultima = tentativa >= settings.ML_RETRY_MAX_ATTEMPTS
+            await self._aguardar_fichas(vendedor)
+            _metricas["requisicoes"] += 1
+
+            try:
+                response = await self._transport.handle_async_request(request)
+            except httpx.TransportError:
+                _metricas["erros_rede"] += 1
+                if ultima or not idempotente:
+                    raise
+                _metricas["retries"] += 1
+                await asyncio.sleep(calcular_backoff_ml(tentativa))
+                continue
+
+            if response.status_code == 429:
+                _metricas["throttled_429"] += 1
+            elif response.status_code in STATUS_REPETIVEIS:
+                _metricas["erros_5xx"] += 1
+            else:
+                return response
+
+            if response.status_code != 429 and not idempotente:
+                return response
+
+            if ultima:
+                _metricas["esgotadas"] += 1
+                print(f"[ERROR] ML {request.method} {request.url.path}: {response.status_code} após {tentativa} tentativas")
+                return response
+
+            espera = ler_retry_after(response)
+            if espera is None:
+                espera = calcular_backoff_ml(tentativa)
+
+            await response.aclose()
+            _metricas["retries"] += 1
+
+            if response.status_code == 429:
+                # Pausa o balde inteiro: as demais requisições do vendedor (ou da app) também esperam
+                (vendedor or self._app).pausar(espera)
+            else:
+                await asyncio.sleep(espera)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def get_ml_api_stats() -> Dict[str, Any]:
+    """Métricas de rate limit/throttling da API do ML (exibidas em /health)"""
+    return {
+        "limite_app_por_segundo": settings.ML_RATE_LIMIT_PER_SECOND,
+        "limite_vendedor_por_segundo": settings.ML_SELLER_RATE_LIMIT_PER_SECOND,
+        **_metricas,
+        "segundos_em_espera": round(_metricas["segundos_em_espera"], 3)
+    }
@@ -0,0 +1,186 @@
+"""
+Cache de dados de referência do Mercado Livre (listing types, exposures, domínios)
+Dados quase estáticos e iguais para todos os vendedores: TTL longo, revalidação
+com ETag/If-None-Match e stale-while-revalidate (resposta antiga na hora, atualiza
+em background). Aquecido no startup para o site configurado (ML_SITE_ID).
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, Optional, Set
+import asyncio
+import time
+import httpx
+
+from app.config.settings import settings
+from app.utils.cache import TTLCache
+
+
+@dataclass
+class EntradaReferencia:
+    dados: Any
+    etag: Optional[str]
+    obtido_em: float
+
+
+class CacheReferenciaML:
+    """
+    GETs de referência com cache por URL + params
+    - fresco (< ML_REFERENCE_CACHE_TTL): responde do cache
+    - vencido (até + ML_REFERENCE_CACHE_STALE): responde do cache e revalida em background
+    - ausente: busca no ML; chamadas simultâneas para a mesma chave compartilham a busca
+    Erros não são cacheados (o chamador usa o próprio fallback)
+    """
+
+    def __init__(self, ttl: Optional[float] = None, stale: Optional[float] = None):
+        self.ttl = settings.ML_REFERENCE_CACHE_TTL if ttl is None else ttl
+        self.stale = settings.ML_REFERENCE_CACHE_STALE if stale is None else stale
+        self._entradas = TTLCache(maxsize=5000, ttl=self.ttl + self.stale)
+        self._em_andamento: Dict[Hashable, asyncio.Task] = {}
+        self._revalidacoes: Set[asyncio.Task] = set()
+        self.metricas = {
+            "hits": 0,
+            "stale": 0,
+            "misses": 0,
+            "revalidados_304": 0,
+            "atualizados_200": 0,
+            "erros": 0
+        }
+
+    async def obter(
+        self,
+        http: httpx.AsyncClient,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        params: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None
+    ) -> Any:
+        """JSON da URL (do cache quando possível); levanta httpx.HTTPError se o ML falhar sem cache"""
+        chave = (url, tuple(sorted((params or {}).items())))
+        entrada: Optional[EntradaReferencia] = self._entradas.get(chave)
+
+        if entrada is not None:
+            if time.monotonic() - entrada.obtido_em < self.ttl:
+                self.metricas["hits"] += 1
+            else:
+                self.metricas["stale"] += 1
+                self._revalidar_em_background(chave, http, url, headers, params, timeout)
+            return entrada.dados
+
+        self.metricas["misses"] += 1
+        # shield: cancelar um chamador não cancela a busca compartilhada com os demais
+        return await asyncio.shield(self._buscar_unico(chave, http, url, headers, params, timeout))
+
+    def _buscar_unico(self, chave, http, url, headers, params, timeout) -> asyncio.Task:
+        tarefa = self._em_andamento.get(chave)
+        if tarefa is None:
+            tarefa = asyncio.create_task(self._buscar(chave, http, url, headers, params, timeout))
+            self._em_andamento[chave] = tarefa
+            tarefa.add_done_callback(lambda _: self._em_andamento.pop(chave, None))
+        return tarefa
+
+    def _revalidar_em_background(self, chave, http, url, headers, params, timeout) -> None:
+        if chave in self._em_andamento:
+            return
+
+        tarefa = self._buscar_unico(chave, http, url, headers, params, timeout)
+        self._revalidacoes.add(tarefa)
+
+        def _finalizar(t: asyncio.Task) -> None:
+            self._revalidacoes.discard(t)
+            if not t.cancelled() and t.exception() is not None:
+                print(f"[ERROR] Falha ao revalidar {url}: {t.exception()}")
+
+        tarefa.add_done_callback(_finalizar)
+
+    async def _buscar(self, chave, http, url, headers, params, timeout) -> Any:
+        entrada: Optional[EntradaReferencia] = self._entradas.get(chave)
+        cabecalhos = dict(headers or {})
+        if entrada is not None and entrada.etag:
+            cabecalhos["If-None-Match"] = entrada.etag
+
+        try:
+            response = await http.get(url, headers=cabecalhos, params=params, timeout=timeout)
+
+            if response.status_code == 304 and entrada is not None:
+                self.metricas["revalidados_304"] += 1
+                entrada = EntradaReferencia(entrada.dados, entrada.etag, time.monotonic())
+            else:
+                response.raise_for_status()
+                self.metricas["atualizados_200"] += 1
+                entrada = EntradaReferencia(response.json(), response.headers.get("etag"), time.monotonic())
+        except httpx.HTTPError:
+            self.metricas["erros"] += 1
+            raise
+
+        self._entradas.set(chave, entrada)
+        return entrada.dados
+
+    def limpar(self) -> None:
+        self._entradas.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ttl_segundos": self.ttl,
+            "stale_segundos": self.stale,
+            "entradas": len(self._entradas),
+            **self.metricas
+        }
+
+
+# Instância global
+_cache_referencia: Optional[CacheReferenciaML] = None
+_tarefa_aquecimento: Optional[asyncio.Task] = None
+
+
+def get_ml_reference_cache() -> CacheReferenciaML:
+    """Retorna o cache de referência singleton"""
+    global _cache_referencia
+
+    if _cache_referencia is None:
+        _cache_referencia = CacheReferenciaML()
+
+    return _cache_referencia
+
+
+async def aquecer_cache_referencia(site_id: Optional[str] = None) -> None:
+    """Carrega listing types (com detalhes), exposures e domínios do site"""
+    from app.services.ml_official_api import MLOfficialAPI
+
+    site_id = site_id or settings.ML_SITE_ID
+    api = MLOfficialAPI()
+
+    tipos, _, _ = await asyncio.gather(
+        api.get_listing_types(site_id),
+        api.get_listing_exposures(site_id),
+        api.get_available_domains_for_suggestions(site_id)
+    )
+    await asyncio.gather(*[
+        api.get_listing_type_details(site_id, tipo["id"])
+        for tipo in tipos or [] if isinstance(tipo, dict) and tipo.get("id")
+    ])
+    print(f"[DEBUG] Cache de referência ML aquecido para {site_id}: {get_ml_reference_cache().stats()['entradas']} entradas")
+
+
+def iniciar_aquecimento_cache_referencia() -> None:
+    """Dispara o aquecimento em background (não atrasa o startup)"""
+    global _tarefa_aquecimento
+
+    if not settings.ML_REFERENCE_CACHE_WARMUP:
+        return
+
+    async def _aquecer():
+        try:
+            await aquecer_cache_referencia()
+        except Exception as e:
+            print(f"[ERROR] Falha ao aquecer cache de referência ML: {e}")
+
+    _tarefa_aquecimento = asyncio.create_task(_aquecer())
+
+
+async def parar_aquecimento_cache_referencia() -> None:
+    global _tarefa_aquecimento
+
+    if _tarefa_aquecimento is not None and not _tarefa_aquecimento.done():
+        _tarefa_aquecimento.cancel()
+        await asyncio.gather(_tarefa_aquecimento, return_exceptions=True)
+
+    _tarefa_aquecimento = None
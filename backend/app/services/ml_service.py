@@ -2,53 +2,81 @@
 Service - Mercado Livre
 Integração com API do ML: anúncios, preços, tokens
 """
-from typing import List, Optional, Dict, Any
-from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Dict, Any, Callable
+from datetime import datetime
 from decimal import Decimal
+import asyncio
 import httpx
 from supabase import Client
+from app.config.settings import settings
+from app.services.ml_http_client import get_ml_http_client
+from app.services.db_executor import run_query
+from app.services.ml_token_manager import get_ml_token_manager
+from app.services.ml_buybox_cache import get_buybox_cache
+from app.services.ml_items import (
+    ATRIBUTOS_ANUNCIO,
+    ATRIBUTOS_CATALOGO,
+    buscar_itens_multiget,
+    buscar_lote_itens,
+    dividir_em_lotes,
+    iterar_ids_anuncios
+)
 from app.models.schemas import (
-    AnuncioMLCreate,
     AnuncioMLResponse,
     StatusAnuncio
 )
 
 
+ERRO_FORA_DO_CATALOGO = "Item não encontrado ou não está no catálogo"
+
+
+def _price_to_win_cacheavel(result: Dict[str, Any]) -> bool:
+    """Cacheia dados válidos e 404 (fora do catálogo); erros HTTP transitórios não"""
+    return bool(result.get("has_catalog")) or result.get("error") == ERRO_FORA_DO_CATALOGO
+
+
 class MercadoLivreService:
     ML_API_BASE = "https://api.mercadolibre.com"
+    DB_PAGE_SIZE = 1000
+    DB_DELETE_BATCH = 200
     
-    def __init__(self, supabase_client: Client, user_id: str):
+    def __init__(
+        self,
+        supabase_client: Client,
+        user_id: str,
+        http_client: Optional[httpx.AsyncClient] = None
+    ):
         self.db = supabase_client
         self.user_id = user_id
+        self.http = http_client or get_ml_http_client()
         self.access_token = None
     
     async def _carregar_token(self) -> Optional[str]:
-        """Carrega access token válido do banco"""
-        result = self.db.table("tokens_ml")\
-            .select("access_token, expires_at")\
-            .eq("user_id", self.user_id)\
-            .order("created_at", desc=True)\
-            .limit(1)\
-            .execute()
-        
-        if not result.data:
-            return None
-        
-        token_data = result.data[0]
-        expires_at = datetime.fromisoformat(token_data["expires_at"])
-        
-        # Token expirado? Comparar com datetime timezone-aware
-        now_utc = datetime.now(timezone.utc)
-        if expires_at <= now_utc:
-            return None
-        
-        self.access_token = token_data["access_token"]
+        """Carrega access token válido (cache em memória, renovado antes de expirar)"""
+        self.access_token = await get_ml_token_manager().get_access_token(self.user_id)
         return self.access_token
     
-    async def sincronizar_anuncios(self) -> List[AnuncioMLResponse]:
+    async def _carregar_ml_user_id(self) -> Any:
+        """Retorna o ml_user_id do usuário (do cache de tokens)"""
+        token = await get_ml_token_manager().get_token(self.user_id)
+        
+        if not token or not token.get("ml_user_id"):
+            raise ValueError("ML User ID não encontrado. Conecte-se ao Mercado Livre primeiro.")
+        
+        return token["ml_user_id"]
+    
+    async def sincronizar_anuncios(
+        self,
+        concorrencia: Optional[int] = None,
+        on_progress: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> List[AnuncioMLResponse]:
         """
         Sincroniza anúncios do ML com banco local
-        Busca todos os anúncios ativos do usuário
+        Percorre todos os anúncios do usuário (scan paginado), em fluxo contínuo
+        
+        - concorrencia: máximo de detalhes buscados em paralelo (padrão ML_SYNC_CONCURRENCY)
+        - on_progress: callback chamado a cada anúncio concluído
+          com {ml_id, sucesso, erro, concluidos, total}
         """
         print(f"[DEBUG] sincronizar_anuncios iniciado para user_id={self.user_id}")
         
@@ -60,98 +88,194 @@ class MercadoLivreService:
             
             print(f"[DEBUG] Token carregado com sucesso")
             
-            # Busca ml_user_id
-            ml_user = self.db.table("tokens_ml")\
-                .select("ml_user_id")\
-                .eq("user_id", self.user_id)\
-                .limit(1)\
-                .execute()
+            ml_user_id = await self._carregar_ml_user_id()
         except Exception as e:
             print(f"[ERROR] Exceção em sincronizar_anuncios: {type(e).__name__}: {str(e)}")
             import traceback
             print(f"[ERROR] Traceback: {traceback.format_exc()}")
             raise
         
-        if not ml_user.data:
-            raise ValueError("ML User ID não encontrado. Conecte-se ao Mercado Livre primeiro.")
-        
-        ml_user_id = ml_user.data[0]["ml_user_id"]
+        # Enumera TODOS os anúncios do ML (todos os status) via scan, página a página,
+        # alimentando uma fila limitada de lotes de 20 para o multiget de detalhes
+        n_consumidores = concorrencia or settings.ML_SYNC_CONCURRENCY
+        fila: asyncio.Queue = asyncio.Queue(maxsize=n_consumidores * 2)
+        ids_vistos = set()
+        progresso = {"anuncios": [], "pendentes": {}, "concluidos": 0, "total": 0}
+        enumeracao = {"completa": False, "erro": None}
         
-        # Busca anúncios do ML (TODOS os status, não apenas active)
-        try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(
-                    f"{self.ML_API_BASE}/users/{ml_user_id}/items/search",
-                    headers={"Authorization": f"Bearer {token}"}
-                    # Removido filtro status=active para buscar TODOS os anúncios
-                )
-                
-                if response.status_code == 401:
-                    raise ValueError("Token ML expirado. Reconecte-se ao Mercado Livre.")
-                
-                if response.status_code != 200:
-                    raise ValueError(f"Erro ao buscar anúncios do ML: Status {response.status_code}")
-                
-                items_ids = response.json()["results"]
-                print(f"[DEBUG] Encontrados {len(items_ids)} anúncios no ML para sincronizar")
-                
-        except httpx.TimeoutException:
-            raise ValueError("Timeout ao buscar anúncios do Mercado Livre. Tente novamente.")
-        
-        # Busca detalhes de cada anúncio
-        anuncios_atualizados = []
-        for ml_id in items_ids:
+        async def _produtor():
             try:
-                anuncio = await self._buscar_detalhes_anuncio(ml_id)
-                if anuncio:
-                    anuncios_atualizados.append(anuncio)
-            except Exception as e:
-                print(f"Erro ao buscar anúncio {ml_id}: {str(e)}")
-                continue
-                
-        # NOVO: Remove anúncios do banco que não existem mais no ML
-        if items_ids:
+                async for pagina, total in iterar_ids_anuncios(self.http, token, ml_user_id):
+                    progresso["total"] = max(total, len(ids_vistos) + len(pagina))
+                    ids_vistos.update(pagina)
+                    for lote in dividir_em_lotes(pagina):
+                        await fila.put(lote)
+                enumeracao["completa"] = True
+            except (ValueError, httpx.HTTPError) as e:
+                enumeracao["erro"] = e
+            finally:
+                for _ in range(n_consumidores):
+                    await fila.put(None)
+        
+        async def _consumidor():
+            while True:
+                lote = await fila.get()
+                if lote is None:
+                    return
+                
+                try:
+                    itens, erro_lote = await buscar_lote_itens(self.http, token, lote, ATRIBUTOS_ANUNCIO), None
+                except Exception as e:
+                    itens, erro_lote = {}, str(e)
+                
+                await self._processar_lote(lote, itens, erro_lote, progresso, on_progress)
+                print(f"[DEBUG] Progresso da sincronização: {progresso['concluidos']}/{progresso['total']}")
+        
+        await asyncio.gather(_produtor(), *[_consumidor() for _ in range(n_consumidores)])
+        await self._descarregar_pendentes(progresso, on_progress)
+        
+        if enumeracao["erro"] is not None:
+            if not ids_vistos:
+                raise enumeracao["erro"]
+            print(f"[ERROR] Enumeração de anúncios interrompida: {enumeracao['erro']}")
+        
+        print(f"[DEBUG] Encontrados {len(ids_vistos)} anúncios no ML para sincronizar")
+        
+        # Remove anúncios do banco que não existem mais no ML
+        # (só com a enumeração completa, senão apagaria anúncios não lidos)
+        if enumeracao["completa"] and ids_vistos:
             print(f"[DEBUG] Removendo anúncios obsoletos do banco...")
-            # Deleta anúncios que não estão na lista atual do ML
-            self.db.table("anuncios_ml")\
-                .delete()\
-                .eq("user_id", self.user_id)\
-                .not_.in_("ml_id", items_ids)\
-                .execute()
-            print(f"[DEBUG] Limpeza de anúncios obsoletos concluída")
+            removidos = await self._remover_anuncios_obsoletos(ids_vistos)
+            print(f"[DEBUG] Limpeza de anúncios obsoletos concluída: {removidos} removidos")
         
+        anuncios_atualizados = progresso["anuncios"]
         print(f"[DEBUG] Sincronização concluída: {len(anuncios_atualizados)} anúncios atualizados")
         return anuncios_atualizados
     
-    async def _buscar_detalhes_anuncio(self, ml_id: str) -> Optional[AnuncioMLResponse]:
-        """Busca detalhes de um anúncio e salva no banco"""
-        token = await self._carregar_token()
+    async def _processar_lote(
+        self,
+        lote: List[str],
+        itens: Dict[str, Dict[str, Any]],
+        erro_lote: Optional[str],
+        progresso: Dict[str, Any],
+        on_progress: Optional[Callable[[Dict[str, Any]], None]]
+    ) -> None:
+        """
+        Mapeia os itens de um lote do multiget para o buffer de upsert
+        Descarrega o buffer quando atinge ML_SYNC_UPSERT_BATCH linhas
+        """
+        pendentes = progresso["pendentes"]
         
+        for ml_id in lote:
+            erro = erro_lote
+            data = itens.get(ml_id)
+            
+            if data:
+                try:
+                    pendentes[ml_id] = self._mapear_anuncio(data)
+                    continue
+                except Exception as e:
+                    erro = str(e)
+            elif not erro:
+                erro = "Anúncio não retornado pelo ML"
+            
+            self._registrar_resultado(ml_id, None, erro, progresso, on_progress)
+        
+        if len(pendentes) >= settings.ML_SYNC_UPSERT_BATCH:
+            await self._descarregar_pendentes(progresso, on_progress)
+    
+    async def _descarregar_pendentes(
+        self,
+        progresso: Dict[str, Any],
+        on_progress: Optional[Callable[[Dict[str, Any]], None]]
+    ) -> None:
+        """Grava o buffer de anúncios com um único upsert e reporta cada anúncio"""
+        linhas = list(progresso["pendentes"].values())
+        progresso["pendentes"].clear()
+        if not linhas:
+            return
+        
+        erros: Dict[str, str] = {}
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(
-                    f"{self.ML_API_BASE}/items/{ml_id}",
-                    headers={"Authorization": f"Bearer {token}"}
-                )
-                
-                if response.status_code == 401:
-                    raise ValueError("Token ML expirado. Reconecte-se ao Mercado Livre.")
-                
-                if response.status_code != 200:
-                    print(f"Erro ao buscar item {ml_id}: Status {response.status_code}")
-                    return None
-                
-                data = response.json()
-        except httpx.TimeoutException:
-            print(f"Timeout ao buscar item {ml_id}")
-            return None
+            salvos = {a.ml_id: a for a in await self._salvar_anuncios(linhas)}
         except Exception as e:
-            print(f"Erro ao buscar item {ml_id}: {str(e)}")
-            return None
+            # Uma linha inválida derruba o lote inteiro: isola salvando uma a uma
+            print(f"[ERROR] Upsert em lote falhou ({len(linhas)} anúncios), salvando individualmente: {e}")
+            salvos = {}
+            for linha in linhas:
+                try:
+                    salvos[linha["ml_id"]] = await self._salvar_anuncio(linha)
+                except Exception as e_linha:
+                    erros[linha["ml_id"]] = str(e_linha)
+        
+        for linha in linhas:
+            ml_id = linha["ml_id"]
+            anuncio = salvos.get(ml_id)
+            erro = None if anuncio else erros.get(ml_id, "Anúncio não retornado pelo upsert")
+            self._registrar_resultado(ml_id, anuncio, erro, progresso, on_progress)
+    
+    def _registrar_resultado(
+        self,
+        ml_id: str,
+        anuncio: Optional[AnuncioMLResponse],
+        erro: Optional[str],
+        progresso: Dict[str, Any],
+        on_progress: Optional[Callable[[Dict[str, Any]], None]]
+    ) -> None:
+        """Contabiliza um anúncio concluído e dispara o callback de progresso"""
+        progresso["concluidos"] += 1
+        
+        if anuncio:
+            progresso["anuncios"].append(anuncio)
+        else:
+            print(f"Erro ao buscar anúncio {ml_id}: {erro}")
+        
+        if on_progress:
+            on_progress({
+                "ml_id": ml_id,
+                "sucesso": anuncio is not None,
+                "erro": erro,
+                "concluidos": progresso["concluidos"],
+                "total": progresso["total"]
+            })
+    
+    async def _remover_anuncios_obsoletos(self, ids_vistos: set) -> int:
+        """
+        Remove anúncios locais que não vieram na enumeração do ML
+        Pagina os ml_ids locais e deleta em lotes com IN (sem um NOT IN gigante na URL)
+        """
+        obsoletos = []
+        offset = 0
+        while True:
+            result = await run_query(
+                self.db.table("anuncios_ml")
+                .select("ml_id")
+                .eq("user_id", self.user_id)
+                .order("ml_id")
+                .range(offset, offset + self.DB_PAGE_SIZE - 1)
+            )
+            
+            linhas = result.data or []
+            obsoletos.extend(l["ml_id"] for l in linhas if l["ml_id"] not in ids_vistos)
+            
+            if len(linhas) < self.DB_PAGE_SIZE:
+                break
+            offset += self.DB_PAGE_SIZE
+        
+        for i in range(0, len(obsoletos), self.DB_DELETE_BATCH):
+            await run_query(
+                self.db.table("anuncios_ml")
+                .delete()
+                .eq("user_id", self.user_id)
+                .in_("ml_id", obsoletos[i:i + self.DB_DELETE_BATCH])
+            )
         
-        # Salva/atualiza no banco
-        anuncio_data = {
-            "ml_id": ml_id,
+        return len(obsoletos)
+    
+    def _mapear_anuncio(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Converte item do ML (projeção ATRIBUTOS_ANUNCIO) em linha de anuncios_ml"""
+        return {
+            "ml_id": data["id"],
             "user_id": self.user_id,
             "title": data["title"],
             "price": str(data["price"]),
@@ -167,14 +291,26 @@ class MercadoLivreService:
             "sync_status": "synced",
             "last_sync_at": "now()"
         }
-        
+    
+    async def _salvar_anuncio(self, anuncio_data: Dict[str, Any]) -> AnuncioMLResponse:
+        """Salva/atualiza anúncio no banco"""
         # Upsert (insert ou update)
-        result = self.db.table("anuncios_ml")\
-            .upsert(anuncio_data, on_conflict="ml_id")\
-            .execute()
+        result = await run_query(
+            self.db.table("anuncios_ml")
+            .upsert(anuncio_data, on_conflict="ml_id")
+        )
         
         return AnuncioMLResponse(**result.data[0])
     
+    async def _salvar_anuncios(self, linhas: List[Dict[str, Any]]) -> List[AnuncioMLResponse]:
+        """Salva/atualiza vários anúncios em um único upsert"""
+        result = await run_query(
+            self.db.table("anuncios_ml")
+            .upsert(linhas, on_conflict="ml_id")
+        )
+        
+        return [AnuncioMLResponse(**linha) for linha in result.data]
+    
     def _mapear_status(self, ml_status: str) -> str:
         """Mapeia status do ML para nosso enum"""
         mapping = {
@@ -191,21 +327,22 @@ class MercadoLivreService:
         if not token:
             return False
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.put(
-                f"{self.ML_API_BASE}/items/{ml_id}",
-                headers={"Authorization": f"Bearer {token}"},
-                json={"price": float(novo_preco)}
+        client = self.http
+        response = await client.put(
+            f"{self.ML_API_BASE}/items/{ml_id}",
+            headers={"Authorization": f"Bearer {token}"},
+            json={"price": float(novo_preco)}
+        )
+        
+        if response.status_code == 200:
+            # Atualiza no banco também
+            await run_query(
+                self.db.table("anuncios_ml")
+                .update({"price": str(novo_preco)})
+                .eq("ml_id", ml_id)
+                .eq("user_id", self.user_id)
             )
-            
-            if response.status_code == 200:
-                # Atualiza no banco também
-                self.db.table("anuncios_ml")\
-                    .update({"price": str(novo_preco)})\
-                    .eq("ml_id", ml_id)\
-                    .eq("user_id", self.user_id)\
-                    .execute()
-                return True
+            return True
         
         return False
     
@@ -215,20 +352,21 @@ class MercadoLivreService:
         if not token:
             return False
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.put(
-                f"{self.ML_API_BASE}/items/{ml_id}",
-                headers={"Authorization": f"Bearer {token}"},
-                json={"status": "paused"}
+        client = self.http
+        response = await client.put(
+            f"{self.ML_API_BASE}/items/{ml_id}",
+            headers={"Authorization": f"Bearer {token}"},
+            json={"status": "paused"}
+        )
+        
+        if response.status_code == 200:
+            await run_query(
+                self.db.table("anuncios_ml")
+                .update({"status": StatusAnuncio.PAUSED.value})
+                .eq("ml_id", ml_id)
+                .eq("user_id", self.user_id)
             )
-            
-            if response.status_code == 200:
-                self.db.table("anuncios_ml")\
-                    .update({"status": StatusAnuncio.PAUSED.value})\
-                    .eq("ml_id", ml_id)\
-                    .eq("user_id", self.user_id)\
-                    .execute()
-                return True
+            return True
         
         return False
     
@@ -238,31 +376,33 @@ class MercadoLivreService:
         if not token:
             return False
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.put(
-                f"{self.ML_API_BASE}/items/{ml_id}",
-                headers={"Authorization": f"Bearer {token}"},
-                json={"status": "active"}
+        client = self.http
+        response = await client.put(
+            f"{self.ML_API_BASE}/items/{ml_id}",
+            headers={"Authorization": f"Bearer {token}"},
+            json={"status": "active"}
+        )
+        
+        if response.status_code == 200:
+            await run_query(
+                self.db.table("anuncios_ml")
+                .update({"status": StatusAnuncio.ACTIVE.value})
+                .eq("ml_id", ml_id)
+                .eq("user_id", self.user_id)
             )
-            
-            if response.status_code == 200:
-                self.db.table("anuncios_ml")\
-                    .update({"status": StatusAnuncio.ACTIVE.value})\
-                    .eq("ml_id", ml_id)\
-                    .eq("user_id", self.user_id)\
-                    .execute()
-                return True
+            return True
         
         return False
     
     async def buscar_anuncio_local(self, ml_id: str) -> Optional[AnuncioMLResponse]:
         """Busca anúncio no banco local"""
-        result = self.db.table("anuncios_ml")\
-            .select("*")\
-            .eq("ml_id", ml_id)\
-            .eq("user_id", self.user_id)\
-            .maybe_single()\
-            .execute()
+        result = await run_query(
+            self.db.table("anuncios_ml")
+            .select("*")
+            .eq("ml_id", ml_id)
+            .eq("user_id", self.user_id)
+            .maybe_single()
+        )
         
         if result.data:
             return AnuncioMLResponse(**result.data)
@@ -272,12 +412,13 @@ class MercadoLivreService:
         """Lista anúncios salvos no banco local"""
         print(f"[DEBUG] listar_anuncios_locais para user_id={self.user_id}, limit={limit}")
         
-        result = self.db.table("anuncios_ml")\
-            .select("*")\
-            .eq("user_id", self.user_id)\
-            .order("updated_at", desc=True)\
-            .limit(limit)\
-            .execute()
+        result = await run_query(
+            self.db.table("anuncios_ml")
+            .select("*")
+            .eq("user_id", self.user_id)
+            .order("updated_at", desc=True)
+            .limit(limit)
+        )
         
         print(f"[DEBUG] Encontrados {len(result.data) if result.data else 0} anúncios")
         if result.data and len(result.data) > 0:
@@ -285,10 +426,11 @@ class MercadoLivreService:
         
         return result.data if result.data else []
     
-    async def buscar_catalog_items(self) -> List[Dict[str, Any]]:
+    async def buscar_catalog_items(self, ml_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
         """
         Busca itens do catálogo do ML que o usuário tem anúncios
         Retorna lista de itens para monitorar BuyBox
+        Sem ml_ids, considera os anúncios locais mais recentes (listar_anuncios_locais)
         """
         print(f"[DEBUG] buscar_catalog_items iniciado para user_id={self.user_id}")
         
@@ -300,48 +442,34 @@ class MercadoLivreService:
             
             print(f"[DEBUG] Token carregado, buscando anúncios locais")
             
-            # Busca anúncios locais que têm catalog_product_id
-            anuncios = await self.listar_anuncios_locais()
+            if ml_ids is None:
+                # Busca anúncios locais que têm catalog_product_id
+                anuncios = await self.listar_anuncios_locais()
+                ml_ids = [anuncio["ml_id"] for anuncio in anuncios if anuncio.get("ml_id")]
             
-            if not anuncios:
+            if not ml_ids:
                 return []  # Sem anúncios, retorna lista vazia
             
+            # Busca detalhes em lotes de 20 (multiget) apenas com os campos necessários
+            itens = await buscar_itens_multiget(self.http, token, ml_ids, ATRIBUTOS_CATALOGO)
+            
             items_catalog = []
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                for anuncio in anuncios:
-                    ml_id = anuncio.get("ml_id")
-                    if not ml_id:
-                        continue
-                    
-                    try:
-                        # Busca detalhes do item
-                        response = await client.get(
-                            f"{self.ML_API_BASE}/items/{ml_id}",
-                            headers={"Authorization": f"Bearer {token}"}
-                        )
-                        
-                        if response.status_code == 200:
-                            data = response.json()
-                            catalog_product_id = data.get("catalog_product_id")
-                            
-                            if catalog_product_id:
-                                items_catalog.append({
-                                    "ml_id": ml_id,
-                                    "title": data["title"],
-                                    "price": data["price"],
-                                    "catalog_product_id": catalog_product_id,
-                                    "thumbnail": data.get("thumbnail"),
-                                    "permalink": data["permalink"],
-                                    "attributes": data.get("attributes", [])
-                                })
-                        elif response.status_code == 401:
-                            raise ValueError("Token ML expirado. Reconecte-se ao Mercado Livre.")
-                    except httpx.TimeoutException:
-                        print(f"Timeout ao buscar item {ml_id}")
-                        continue
-                    except Exception as e:
-                        print(f"Erro ao buscar item {ml_id}: {str(e)}")
-                        continue
+            for ml_id in ml_ids:
+                data = itens.get(ml_id)
+                if not data:
+                    continue
+                
+                catalog_product_id = data.get("catalog_product_id")
+                if catalog_product_id:
+                    items_catalog.append({
+                        "ml_id": ml_id,
+                        "title": data["title"],
+                        "price": data["price"],
+                        "catalog_product_id": catalog_product_id,
+                        "thumbnail": data.get("thumbnail"),
+                        "permalink": data["permalink"],
+                        "attributes": data.get("attributes", [])
+                    })
             
             return items_catalog
         except Exception as e:
@@ -378,116 +506,127 @@ class MercadoLivreService:
         Endpoint: GET /products/{product_id}/items
         
         Retorna lista de todas as publicações que competem na mesma página de produto
+        
+        Dados públicos do produto: cache curto por catalog_product_id compartilhado
+        entre usuários (o token de quem chama só é validado)
         """
+        token = await self._carregar_token()
+        if not token:
+            raise ValueError("Token ML não encontrado ou expirado. Conecte-se ao Mercado Livre primeiro.")
+        
+        result, idade = await get_buybox_cache().obter(
+            ("competidores", catalog_product_id),
+            lambda: self._consultar_competidores_produto(catalog_product_id, token),
+            cachear=lambda r: "error" not in r
+        )
+        return {**result, "cache_age_seconds": round(idade, 1)}
+    
+    async def _consultar_competidores_produto(self, catalog_product_id: str, token: str) -> Dict[str, Any]:
         print(f"[DEBUG] buscar_competidores_produto iniciado para catalog_product_id={catalog_product_id}")
         
         try:
-            token = await self._carregar_token()
-            if not token:
-                raise ValueError("Token ML não encontrado ou expirado. Conecte-se ao Mercado Livre primeiro.")
+            client = self.http
+            # Busca informações do produto
+            product_response = await client.get(
+                f"{self.ML_API_BASE}/products/{catalog_product_id}",
+                headers={"Authorization": f"Bearer {token}"}
+            )
             
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                # Busca informações do produto
-                product_response = await client.get(
-                    f"{self.ML_API_BASE}/products/{catalog_product_id}",
-                    headers={"Authorization": f"Bearer {token}"}
-                )
-                
-                if product_response.status_code != 200:
-                    return {
-                        "catalog_product_id": catalog_product_id,
-                        "error": "Produto não encontrado",
-                        "competitors": []
-                    }
-                
-                product_data = product_response.json()
-                
-                # Busca todos os items que competem neste produto
-                items_response = await client.get(
-                    f"{self.ML_API_BASE}/products/{catalog_product_id}/items",
-                    headers={"Authorization": f"Bearer {token}"}
-                )
-                
-                if items_response.status_code != 200:
-                    return {
-                        "catalog_product_id": catalog_product_id,
-                        "product_name": product_data.get("name"),
-                        "error": "Não foi possível buscar competidores",
-                        "competitors": []
-                    }
-                
-                items_data = items_response.json()
-                competitors = []
-                
-                # Processa cada competidor
-                for item in items_data.get("results", []):
-                    competitor = {
-                        "item_id": item.get("item_id"),
-                        "seller_id": item.get("seller_id"),
-                        "price": item.get("price"),
-                        "currency_id": item.get("currency_id"),
-                        "available_quantity": item.get("available_quantity"),
-                        "condition": item.get("condition"),
-                        "listing_type_id": item.get("listing_type_id"),
-                        "warranty": item.get("warranty"),
-                        "official_store_id": item.get("official_store_id"),
-                        "original_price": item.get("original_price"),
-                        
-                        # Informações de envio
-                        "shipping": item.get("shipping", {}),
-                        "free_shipping": item.get("shipping", {}).get("free_shipping", False),
-                        "shipping_mode": item.get("shipping", {}).get("mode"),
-                        
-                        # Tags e tier
-                        "tags": item.get("tags", []),
-                        "tier": item.get("tier"),
-                        
-                        # Reputação do vendedor
-                        "seller_reputation": item.get("seller", {}).get("reputation_level_id") if item.get("seller") else None
-                    }
-                    
-                    competitors.append(competitor)
-                
-                # Ordena por preço (menor primeiro)
-                competitors.sort(key=lambda x: x.get("price", float('inf')))
-                
-                # Identifica o ganhador (Buy Box)
-                buy_box_winner = product_data.get("buy_box_winner", {})
-                winner_item_id = buy_box_winner.get("item_id")
-                
-                # Marca o ganhador e calcula posições
-                for i, competitor in enumerate(competitors):
-                    competitor["position"] = i + 1
-                    competitor["is_buy_box_winner"] = competitor["item_id"] == winner_item_id
-                    
-                    # Calcula diferença percentual com o primeiro colocado
-                    if competitors and competitors[0].get("price"):
-                        lowest_price = competitors[0]["price"]
-                        competitor_price = competitor.get("price")
-                        if competitor_price and lowest_price > 0:
-                            competitor["price_difference_percent"] = round(
-                                ((competitor_price - lowest_price) / lowest_price) * 100, 2
-                            )
-                        else:
-                            competitor["price_difference_percent"] = 0
-                    else:
-                        competitor["price_difference_percent"] = 0
-                
+            if product_response.status_code != 200:
+                return {
+                    "catalog_product_id": catalog_product_id,
+                    "error": "Produto não encontrado",
+                    "competitors": []
+                }
+            
+            product_data = product_response.json()
+            
+            # Busca todos os items que competem neste produto
+            items_response = await client.get(
+                f"{self.ML_API_BASE}/products/{catalog_product_id}/items",
+                headers={"Authorization": f"Bearer {token}"}
+            )
+            
+            if items_response.status_code != 200:
                 return {
                     "catalog_product_id": catalog_product_id,
                     "product_name": product_data.get("name"),
-                    "product_permalink": product_data.get("permalink"),
-                    "total_competitors": len(competitors),
-                    "buy_box_winner_item_id": winner_item_id,
-                    "price_range": {
-                        "min_price": competitors[0].get("price") if competitors else None,
-                        "max_price": competitors[-1].get("price") if competitors else None,
-                        "currency_id": competitors[0].get("currency_id") if competitors else None
-                    },
-                    "competitors": competitors,
-                    "updated_at": datetime.utcnow().isoformat()
+                    "error": "Não foi possível buscar competidores",
+                    "competitors": []
+                }
+            
+            items_data = items_response.json()
+            competitors = []
+            
+            # Processa cada competidor
+            for item in items_data.get("results", []):
+                competitor = {
+                    "item_id": item.get("item_id"),
+                    "seller_id": item.get("seller_id"),
+                    "price": item.get("price"),
+                    "currency_id": item.get("currency_id"),
+                    "available_quantity": item.get("available_quantity"),
+                    "condition": item.get("condition"),
+                    "listing_type_id": item.get("listing_type_id"),
+                    "warranty": item.get("warranty"),
+                    "official_store_id": item.get("official_store_id"),
+                    "original_price": item.get("original_price"),
+                    
+                    # Informações de envio
+                    "shipping": item.get("shipping", {}),
+                    "free_shipping": item.get("shipping", {}).get("free_shipping", False),
+                    "shipping_mode": item.get("shipping", {}).get("mode"),
+                    
+                    # Tags e tier
+                    "tags": item.get("tags", []),
+                    "tier": item.get("tier"),
+                    
+                    # Reputação do vendedor
+                    "seller_reputation": item.get("seller", {}).get("reputation_level_id") if item.get("seller") else None
                 }
                 
+                competitors.append(competitor)
+            
+            # Ordena por preço (menor primeiro)
+            competitors.sort(key=lambda x: x.get("price", float('inf')))
+            
+            # Identifica o ganhador (Buy Box)
+            buy_box_winner = product_data.get("buy_box_winner", {})
+            winner_item_id = buy_box_winner.get("item_id")
+            
+            # Marca o ganhador e calcula posições
+            for i, competitor in enumerate(competitors):
+                competitor["position"] = i + 1
+                competitor["is_buy_box_winner"] = competitor["item_id"] == winner_item_id
+                
+                # Calcula diferença percentual com o primeiro colocado
+                if competitors and competitors[0].get("price"):
+                    lowest_price = competitors[0]["price"]
+                    competitor_price = competitor.get("price")
+                    if competitor_price and lowest_price > 0:
+                        competitor["price_difference_percent"] = round(
+                            ((competitor_price - lowest_price) / lowest_price) * 100, 2
+                        )
+                    else:
+                        competitor["price_difference_percent"] = 0
+                else:
+                    competitor["price_difference_percent"] = 0
+            
+            return {
+                "catalog_product_id": catalog_product_id,
+                "product_name": product_data.get("name"),
+                "product_permalink": product_data.get("permalink"),
+                "total_competitors": len(competitors),
+                "buy_box_winner_item_id": winner_item_id,
+                "price_range": {
+                    "min_price": competitors[0].get("price") if competitors else None,
+                    "max_price": competitors[-1].get("price") if competitors else None,
+                    "currency_id": competitors[0].get("currency_id") if competitors else None
+                },
+                "competitors": competitors,
+                "updated_at": datetime.utcnow().isoformat()
+            }
+                
         except Exception as e:
             print(f"[ERROR] Exceção em buscar_competidores_produto: {type(e).__name__}: {str(e)}")
             import traceback
@@ -509,51 +648,41 @@ class MercadoLivreService:
             
             print(f"[DEBUG] Token carregado, buscando ml_user_id")
             
-            # Busca ml_user_id
-            ml_user = self.db.table("tokens_ml")\
-                .select("ml_user_id")\
-                .eq("user_id", self.user_id)\
-                .limit(1)\
-                .execute()
+            ml_user_id = await self._carregar_ml_user_id()
             
-            if not ml_user.data:
-                raise ValueError("ML User ID não encontrado. Conecte-se ao Mercado Livre primeiro.")
+            client = self.http
+            # Busca perguntas
+            params = {"status": status} if status != "all" else {}
             
-            ml_user_id = ml_user.data[0]["ml_user_id"]
+            response = await client.get(
+                f"{self.ML_API_BASE}/questions/search",
+                headers={"Authorization": f"Bearer {token}"},
+                params={**params, "seller_id": ml_user_id}
+            )
             
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                # Busca perguntas
-                params = {"status": status} if status != "all" else {}
-                
-                response = await client.get(
-                    f"{self.ML_API_BASE}/questions/search",
-                    headers={"Authorization": f"Bearer {token}"},
-                    params={**params, "seller_id": ml_user_id}
-                )
-                
-                if response.status_code == 401:
-                    raise ValueError("Token ML expirado. Reconecte-se ao Mercado Livre.")
-                
-                if response.status_code != 200:
-                    return []
-                
-                data = response.json()
-                questions = data.get("questions", [])
-                
-                # Formata dados
-                perguntas_formatadas = []
-                for q in questions:
-                    perguntas_formatadas.append({
-                        "id": q["id"],
-                        "text": q["text"],
-                        "status": q["status"],
-                        "date_created": q["date_created"],
-                        "item_id": q["item_id"],
-                        "answer": q.get("answer"),
-                        "from_user_id": q.get("from", {}).get("id")
-                    })
-                
-                return perguntas_formatadas
+            if response.status_code == 401:
+                raise ValueError("Token ML expirado. Reconecte-se ao Mercado Livre.")
+            
+            if response.status_code != 200:
+                return []
+            
+            data = response.json()
+            questions = data.get("questions", [])
+            
+            # Formata dados
+            perguntas_formatadas = []
+            for q in questions:
+                perguntas_formatadas.append({
+                    "id": q["id"],
+                    "text": q["text"],
+                    "status": q["status"],
+                    "date_created": q["date_created"],
+                    "item_id": q["item_id"],
+                    "answer": q.get("answer"),
+                    "from_user_id": q.get("from", {}).get("id")
+                })
+            
+            return perguntas_formatadas
         except Exception as e:
             print(f"[ERROR] Exceção em buscar_perguntas: {type(e).__name__}: {str(e)}")
             import traceback
@@ -566,17 +695,17 @@ class MercadoLivreService:
         if not token:
             return False
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                f"{self.ML_API_BASE}/answers",
-                headers={"Authorization": f"Bearer {token}"},
-                json={
-                    "question_id": question_id,
-                    "text": resposta
-                }
-            )
-            
-            return response.status_code == 200
+        client = self.http
+        response = await client.post(
+            f"{self.ML_API_BASE}/answers",
+            headers={"Authorization": f"Bearer {token}"},
+            json={
+                "question_id": question_id,
+                "text": resposta
+            }
+        )
+        
+        return response.status_code == 200
     
     async def buscar_vendas(self, limit: int = 50) -> List[Dict[str, Any]]:
         """
@@ -592,53 +721,43 @@ class MercadoLivreService:
             
             print(f"[DEBUG] Token carregado, buscando ml_user_id")
             
-            # Busca ml_user_id
-            ml_user = self.db.table("tokens_ml")\
-                .select("ml_user_id")\
-                .eq("user_id", self.user_id)\
-                .limit(1)\
-                .execute()
-            
-            if not ml_user.data:
-                raise ValueError("ML User ID não encontrado. Conecte-se ao Mercado Livre primeiro.")
-            
-            ml_user_id = ml_user.data[0]["ml_user_id"]
-            
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(
-                    f"{self.ML_API_BASE}/orders/search",
-                    headers={"Authorization": f"Bearer {token}"},
-                    params={
-                        "seller": ml_user_id,
-                        "limit": limit,
-                        "sort": "date_desc"
-                    }
-                )
-                
-                if response.status_code == 401:
-                    raise ValueError("Token ML expirado. Reconecte-se ao Mercado Livre.")
-                
-                if response.status_code != 200:
-                    return []
-                
-                data = response.json()
-                orders = data.get("results", [])
-                
-                # Formata vendas
-                vendas_formatadas = []
-                for order in orders:
-                    vendas_formatadas.append({
-                        "id": order["id"],
-                        "date_created": order["date_created"],
-                        "status": order["status"],
-                        "total_amount": order["total_amount"],
-                        "paid_amount": order.get("paid_amount", 0),
-                        "currency_id": order["currency_id"],
-                        "buyer_id": order.get("buyer", {}).get("id"),
-                        "items": order.get("order_items", [])
-                    })
-                
-                return vendas_formatadas
+            ml_user_id = await self._carregar_ml_user_id()
+            
+            client = self.http
+            response = await client.get(
+                f"{self.ML_API_BASE}/orders/search",
+                headers={"Authorization": f"Bearer {token}"},
+                params={
+                    "seller": ml_user_id,
+                    "limit": limit,
+                    "sort": "date_desc"
+                }
+            )
+            
+            if response.status_code == 401:
+                raise ValueError("Token ML expirado. Reconecte-se ao Mercado Livre.")
+            
+            if response.status_code != 200:
+                return []
+            
+            data = response.json()
+            orders = data.get("results", [])
+            
+            # Formata vendas
+            vendas_formatadas = []
+            for order in orders:
+                vendas_formatadas.append({
+                    "id": order["id"],
+                    "date_created": order["date_created"],
+                    "status": order["status"],
+                    "total_amount": order["total_amount"],
+                    "paid_amount": order.get("paid_amount", 0),
+                    "currency_id": order["currency_id"],
+                    "buyer_id": order.get("buyer", {}).get("id"),
+                    "items": order.get("order_items", [])
+                })
+            
+            return vendas_formatadas
         except Exception as e:
             print(f"[ERROR] Exceção em buscar_vendas: {type(e).__name__}: {str(e)}")
             import traceback
@@ -656,7 +775,18 @@ class MercadoLivreService:
         - Boosts disponíveis (fulfillment, free_shipping, etc)
         - Dados do vendedor ganhador
         - Motivos para não estar competindo
+        
+        Cache curto por (usuário, item): polls do dashboard dentro de
+        ML_BUYBOX_CACHE_TTL e chamadas simultâneas compartilham a consulta ao ML
         """
+        result, idade = await get_buybox_cache().obter(
+            ("price_to_win", self.user_id, item_id),
+            lambda: self._consultar_price_to_win(item_id),
+            cachear=_price_to_win_cacheavel
+        )
+        return {**result, "cache_age_seconds": round(idade, 1)}
+    
+    async def _consultar_price_to_win(self, item_id: str) -> Dict[str, Any]:
         print(f"[DEBUG] buscar_price_to_win iniciado para item_id={item_id}")
         
         try:
@@ -665,118 +795,118 @@ class MercadoLivreService:
                 print(f"[ERROR] Token não encontrado para user_id={self.user_id}")
                 raise ValueError("Token ML não encontrado ou expirado. Conecte-se ao Mercado Livre primeiro.")
             
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                # Busca dados de price_to_win
-                response = await client.get(
-                    f"{self.ML_API_BASE}/items/{item_id}/price_to_win",
-                    headers={"Authorization": f"Bearer {token}"},
-                    params={"version": "v2"}
-                )
-                
-                if response.status_code == 401:
-                    raise ValueError("Token ML expirado. Reconecte-se ao Mercado Livre.")
-                
-                if response.status_code == 404:
-                    return {
-                        "item_id": item_id,
-                        "error": "Item não encontrado ou não está no catálogo",
-                        "has_catalog": False
-                    }
-                
-                if response.status_code != 200:
-                    print(f"[ERROR] Erro HTTP {response.status_code} ao buscar price_to_win: {response.text}")
-                    return {
-                        "item_id": item_id,
-                        "error": f"Erro HTTP {response.status_code}",
-                        "has_catalog": False
-                    }
-                
-                data = response.json()
-                
-                # Formatar dados de acordo com a estrutura da documentação
-                result = {
-                    "item_id": data.get("item_id"),
-                    "current_price": data.get("current_price"),
-                    "currency_id": data.get("currency_id"),
-                    "price_to_win": data.get("price_to_win"),
-                    "status": data.get("status"),  # winning/competing/sharing_first_place/listed
-                    "consistent": data.get("consistent"),
-                    "visit_share": data.get("visit_share"),  # maximum/medium/minimum
-                    "competitors_sharing_first_place": data.get("competitors_sharing_first_place"),
-                    "catalog_product_id": data.get("catalog_product_id"),
-                    "has_catalog": True,
-                    
-                    # Análise de boosts
-                    "boosts": [],
-                    "boosts_analysis": {
-                        "boosted": [],
-                        "opportunities": [],
-                        "not_boosted": [],
-                        "not_apply": []
-                    },
-                    
-                    # Dados do ganhador atual
-                    "winner": data.get("winner"),
-                    
-                    # Motivos para não competir (quando aplicável)
-                    "reason": data.get("reason", []),
-                    
-                    # Cálculos adicionais
-                    "price_difference": None,
-                    "price_difference_percent": None,
-                    "is_winning": data.get("status") == "winning",
-                    "can_compete": data.get("status") not in ["listed"],
-                    
-                    "updated_at": datetime.utcnow().isoformat()
+            client = self.http
+            # Busca dados de price_to_win
+            response = await client.get(
+                f"{self.ML_API_BASE}/items/{item_id}/price_to_win",
+                headers={"Authorization": f"Bearer {token}"},
+                params={"version": "v2"}
+            )
+            
+            if response.status_code == 401:
+                raise ValueError("Token ML expirado. Reconecte-se ao Mercado Livre.")
+            
+            if response.status_code == 404:
+                return {
+                    "item_id": item_id,
+                    "error": ERRO_FORA_DO_CATALOGO,
+                    "has_catalog": False
+                }
+            
+            if response.status_code != 200:
+                print(f"[ERROR] Erro HTTP {response.status_code} ao buscar price_to_win: {response.text}")
+                return {
+                    "item_id": item_id,
+                    "error": f"Erro HTTP {response.status_code}",
+                    "has_catalog": False
+                }
+            
+            data = response.json()
+            
+            # Formatar dados de acordo com a estrutura da documentação
+            result = {
+                "item_id": data.get("item_id"),
+                "current_price": data.get("current_price"),
+                "currency_id": data.get("currency_id"),
+                "price_to_win": data.get("price_to_win"),
+                "status": data.get("status"),  # winning/competing/sharing_first_place/listed
+                "consistent": data.get("consistent"),
+                "visit_share": data.get("visit_share"),  # maximum/medium/minimum
+                "competitors_sharing_first_place": data.get("competitors_sharing_first_place"),
+                "catalog_product_id": data.get("catalog_product_id"),
+                "has_catalog": True,
+                
+                # Análise de boosts
+                "boosts": [],
+                "boosts_analysis": {
+                    "boosted": [],
+                    "opportunities": [],
+                    "not_boosted": [],
+                    "not_apply": []
+                },
+                
+                # Dados do ganhador atual
+                "winner": data.get("winner"),
+                
+                # Motivos para não competir (quando aplicável)
+                "reason": data.get("reason", []),
+                
+                # Cálculos adicionais
+                "price_difference": None,
+                "price_difference_percent": None,
+                "is_winning": data.get("status") == "winning",
+                "can_compete": data.get("status") not in ["listed"],
+                
+                "updated_at": datetime.utcnow().isoformat()
+            }
+            
+            # Processa boosts
+            boosts = data.get("boosts", [])
+            result["boosts"] = boosts
+            
+            for boost in boosts:
+                boost_id = boost.get("id")
+                boost_status = boost.get("status")
+                boost_desc = boost.get("description")
+                
+                boost_info = {
+                    "id": boost_id,
+                    "status": boost_status,
+                    "description": boost_desc
                 }
                 
-                # Processa boosts
-                boosts = data.get("boosts", [])
-                result["boosts"] = boosts
-                
-                for boost in boosts:
-                    boost_id = boost.get("id")
-                    boost_status = boost.get("status")
-                    boost_desc = boost.get("description")
-                    
-                    boost_info = {
-                        "id": boost_id,
-                        "status": boost_status,
-                        "description": boost_desc
-                    }
-                    
-                    # Categoriza boosts por status
-                    if boost_status == "boosted":
-                        result["boosts_analysis"]["boosted"].append(boost_info)
-                    elif boost_status == "opportunity":
-                        result["boosts_analysis"]["opportunities"].append(boost_info)
-                    elif boost_status == "not_boosted":
-                        result["boosts_analysis"]["not_boosted"].append(boost_info)
-                    elif boost_status == "not_apply":
-                        result["boosts_analysis"]["not_apply"].append(boost_info)
-                
-                # Calcula diferenças de preço
-                current_price = data.get("current_price")
-                price_to_win = data.get("price_to_win")
-                
-                if current_price and price_to_win and price_to_win > 0:
-                    result["price_difference"] = current_price - price_to_win
-                    result["price_difference_percent"] = round(
-                        ((current_price - price_to_win) / price_to_win) * 100, 2
+                # Categoriza boosts por status
+                if boost_status == "boosted":
+                    result["boosts_analysis"]["boosted"].append(boost_info)
+                elif boost_status == "opportunity":
+                    result["boosts_analysis"]["opportunities"].append(boost_info)
+                elif boost_status == "not_boosted":
+                    result["boosts_analysis"]["not_boosted"].append(boost_info)
+                elif boost_status == "not_apply":
+                    result["boosts_analysis"]["not_apply"].append(boost_info)
+            
+            # Calcula diferenças de preço
+            current_price = data.get("current_price")
+            price_to_win = data.get("price_to_win")
+            
+            if current_price and price_to_win and price_to_win > 0:
+                result["price_difference"] = current_price - price_to_win
+                result["price_difference_percent"] = round(
+                    ((current_price - price_to_win) / price_to_win) * 100, 2
+                )
+            
+            # Se tem ganhador, calcula diferença com ele
+            winner = data.get("winner")
+            if winner and current_price:
+                winner_price = winner.get("price")
+                if winner_price and winner_price > 0:
+                    result["winner_price_difference"] = current_price - winner_price
+                    result["winner_price_difference_percent"] = round(
+                        ((current_price - winner_price) / winner_price) * 100, 2
                     )
-                
-                # Se tem ganhador, calcula diferença com ele
-                winner = data.get("winner")
-                if winner and current_price:
-                    winner_price = winner.get("price")
-                    if winner_price and winner_price > 0:
-                        result["winner_price_difference"] = current_price - winner_price
-                        result["winner_price_difference_percent"] = round(
-                            ((current_price - winner_price) / winner_price) * 100, 2
-                        )
-                
-                print(f"[DEBUG] price_to_win processado com sucesso: status={result.get('status')}")
-                return result
+            
+            print(f"[DEBUG] price_to_win processado com sucesso: status={result.get('status')}")
+            return result
                 
         except Exception as e:
             print(f"[ERROR] Exceção em buscar_price_to_win: {type(e).__name__}: {str(e)}")
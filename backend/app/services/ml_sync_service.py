@@ -2,185 +2,344 @@
 Service - Sincronização com Mercado Livre
 Sincroniza estoque entre sistema local e ML
 """
+import asyncio
 import httpx
-from typing import Dict, List, Any
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from supabase import Client
 from app.config.settings import settings, get_supabase_client
+from app.services.ml_http_client import get_ml_http_client
+from app.services.db_executor import run_query
+from app.services.ml_token_manager import get_ml_token_manager
+from app.services.ml_items import ATRIBUTOS_ESTOQUE, buscar_itens_multiget
 
 
 class MLSyncService:
-    def __init__(self, supabase_client: Client, user_id: str):
+    DB_PAGE_SIZE = 1000
+    
+    def __init__(
+        self,
+        supabase_client: Client,
+        user_id: str,
+        http_client: Optional[httpx.AsyncClient] = None
+    ):
         self.db = supabase_client
         self.user_id = user_id
+        self.http = http_client or get_ml_http_client()
     
     async def get_ml_token(self) -> str:
-        """Busca token do ML do usuário"""
-        result = self.db.table("tokens_ml")\
-            .select("access_token")\
-            .eq("user_id", self.user_id)\
-            .maybe_single()\
-            .execute()
-        
-        if not result.data:
+        """Busca token do ML do usuário (cache em memória, renovado antes de expirar)"""
+        token = await get_ml_token_manager().get_access_token(self.user_id)
+        
+        if not token:
             raise ValueError("Token ML não encontrado. Faça login no Mercado Livre.")
         
-        return result.data["access_token"]
+        return token
     
     async def sincronizar_estoque_produto(
         self, 
         produto_id: int, 
-        nova_quantidade: int
+        nova_quantidade: int,
+        verificar_ml: bool = False
     ) -> Dict[str, Any]:
         """
         Sincroniza estoque de produto específico com ML
         Atualiza todos os anúncios vinculados a este produto
+        (só os que têm quantidade diferente; ver _enviar_quantidades)
         """
         # Busca anúncios vinculados ao produto
-        anuncios = self.db.table("anuncios_ml")\
-            .select("ml_id, available_quantity")\
-            .eq("produto_id", produto_id)\
-            .eq("user_id", self.user_id)\
-            .eq("status", "active")\
-            .execute()
+        anuncios = await run_query(
+            self.db.table("anuncios_ml")
+            .select("ml_id, produto_id, available_quantity")
+            .eq("produto_id", produto_id)
+            .eq("user_id", self.user_id)
+            .eq("status", "active")
+        )
         
         if not anuncios.data:
             return {"message": "Nenhum anúncio ativo encontrado para este produto"}
         
         token = await self.get_ml_token()
-        resultados = []
+        resultados = await self._enviar_quantidades(token, [
+            {**anuncio, "quantidade_nova": nova_quantidade}
+            for anuncio in anuncios.data
+        ], verificar_ml)
         
-        for anuncio in anuncios.data:
-            ml_id = anuncio["ml_id"]
-            
-            try:
-                # Atualiza quantidade no ML
-                async with httpx.AsyncClient() as client:
-                    response = await client.put(
-                        f"{settings.ML_API_URL}/items/{ml_id}",
-                        headers={"Authorization": f"Bearer {token}"},
-                        json={"available_quantity": nova_quantidade}
-                    )
-                    response.raise_for_status()
-                
-                # Atualiza no banco local
-                self.db.table("anuncios_ml")\
-                    .update({"available_quantity": nova_quantidade})\
-                    .eq("ml_id", ml_id)\
-                    .execute()
-                
-                resultados.append({
-                    "ml_id": ml_id,
-                    "sucesso": True,
-                    "quantidade_anterior": anuncio["available_quantity"],
-                    "quantidade_nova": nova_quantidade
-                })
-                
-            except Exception as e:
-                resultados.append({
-                    "ml_id": ml_id,
-                    "sucesso": False,
-                    "erro": str(e)
-                })
+        return self._resumir_produto(produto_id, resultados)
+    
+    async def sincronizar_todos_estoques(self, verificar_ml: bool = False) -> Dict[str, Any]:
+        """
+        Sincroniza estoque de todos os produtos com anúncios ativos
+        
+        Vínculos produto -> anúncios e saldo local vêm de uma consulta, o token é
+        buscado uma vez e os PUTs rodam em paralelo sob o rate limit da aplicação.
+        Anúncios que já têm a quantidade certa não são enviados.
+        """
+        vinculos = await self._carregar_vinculos()
+        
+        if not vinculos:
+            return {"message": "Nenhum anúncio ativo vinculado a produtos com estoque"}
+        
+        token = await self.get_ml_token()
+        resultados = await self._enviar_quantidades(token, [
+            {**vinculo, "quantidade_nova": vinculo["estoque_disponivel"]}
+            for vinculo in vinculos
+        ], verificar_ml)
+        
+        por_produto: Dict[int, List[Dict[str, Any]]] = {}
+        for resultado in resultados:
+            por_produto.setdefault(resultado["produto_id"], []).append(resultado)
         
         return {
-            "produto_id": produto_id,
-            "total_anuncios": len(anuncios.data),
-            "sincronizados": sum(1 for r in resultados if r["sucesso"]),
+            "total_produtos_processados": len(por_produto),
+            "total_anuncios": len(resultados),
+            "sincronizados": sum(1 for r in resultados if r["sucesso"] and not r.get("ignorado")),
+            "ignorados": sum(1 for r in resultados if r.get("ignorado")),
             "falhas": sum(1 for r in resultados if not r["sucesso"]),
-            "detalhes": resultados
+            "produtos": [
+                self._resumir_produto(produto_id, itens)
+                for produto_id, itens in por_produto.items()
+            ]
         }
     
-    async def sincronizar_todos_estoques(self) -> Dict[str, Any]:
-        """
-        Sincroniza estoque de todos os produtos com anúncios ativos
+    async def _carregar_vinculos(self) -> List[Dict[str, Any]]:
+        """Anúncios ativos vinculados a produtos, com o saldo local (rpc paginada)"""
+        return await self._paginar(
+            lambda: self.db.rpc("vinculos_estoque_ml", {"p_user_id": self.user_id})
+        )
+    
+    async def _enviar_quantidades(
+        self,
+        token: str,
+        envios: List[Dict[str, Any]],
+        verificar_ml: bool = False
+    ) -> List[Dict[str, Any]]:
         """
-        # Busca todos os produtos com anúncios
-        produtos = self.db.table("produtos")\
-            .select("id, estoque(estoque_disponivel)")\
-            .eq("user_id", self.user_id)\
-            .execute()
+        PUT available_quantity de vários anúncios em paralelo
+        Concorrência limitada por ML_SYNC_CONCURRENCY; vazão e retry de 429 ficam no
+        transport do cliente (ml_rate_limit). Os anúncios atualizados são gravados
+        localmente em um único UPDATE
         
-        if not produtos.data:
-            return {"message": "Nenhum produto encontrado"}
+        Só envia o que mudou: compara com anuncios_ml.available_quantity ou, com
+        verificar_ml=True, com a quantidade atual no ML (multiget, 1 chamada a cada 20)
+        """
+        envios, ignorados, corrigidos = await self._filtrar_alterados(token, envios, verificar_ml)
         
-        resultados = []
+        semaforo = asyncio.Semaphore(settings.ML_SYNC_CONCURRENCY)
         
-        for produto in produtos.data:
-            produto_id = produto["id"]
-            estoque_data = produto.get("estoque", [])
+        async def _enviar(envio: Dict[str, Any]) -> Dict[str, Any]:
+            resultado = {"ml_id": envio["ml_id"], "produto_id": envio.get("produto_id")}
+            async with semaforo:
+                try:
+                    response = await self.http.put(
+                        f"{settings.ML_API_URL}/items/{envio['ml_id']}",
+                        headers={"Authorization": f"Bearer {token}"},
+                        json={"available_quantity": envio["quantidade_nova"]}
+                    )
+                    response.raise_for_status()
+                except Exception as e:
+                    return {**resultado, "sucesso": False, "erro": str(e)}
             
-            if estoque_data and len(estoque_data) > 0:
-                estoque_disponivel = estoque_data[0].get("estoque_disponivel", 0)
-                
-                resultado = await self.sincronizar_estoque_produto(
-                    produto_id, 
-                    estoque_disponivel
-                )
-                resultados.append(resultado)
+            return {
+                **resultado,
+                "sucesso": True,
+                "quantidade_anterior": envio.get("available_quantity"),
+                "quantidade_nova": envio["quantidade_nova"]
+            }
+        
+        resultados = await asyncio.gather(*[_enviar(envio) for envio in envios])
+        
+        await self._salvar_quantidades(corrigidos + [
+            {"ml_id": r["ml_id"], "available_quantity": r["quantidade_nova"]}
+            for r in resultados if r["sucesso"]
+        ])
+        
+        return ignorados + list(resultados)
+    
+    async def _filtrar_alterados(
+        self,
+        token: str,
+        envios: List[Dict[str, Any]],
+        verificar_ml: bool
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Separa os envios necessários dos que já estão com a quantidade certa
+        Retorna (pendentes, ignorados, correções do cache local vindas do ML)
+        """
+        corrigidos: List[Dict[str, Any]] = []
+        
+        if verificar_ml and envios:
+            itens = await buscar_itens_multiget(
+                self.http, token, [e["ml_id"] for e in envios], ATRIBUTOS_ESTOQUE
+            )
+            atualizados = []
+            for envio in envios:
+                item = itens.get(envio["ml_id"])
+                if item is not None:
+                    quantidade_ml = item.get("available_quantity", 0)
+                    if quantidade_ml != envio.get("available_quantity"):
+                        corrigidos.append({"ml_id": envio["ml_id"], "available_quantity": quantidade_ml})
+                    envio = {**envio, "available_quantity": quantidade_ml}
+                atualizados.append(envio)
+            envios = atualizados
+        
+        pendentes = []
+        ignorados = []
+        for envio in envios:
+            if envio.get("available_quantity") == envio["quantidade_nova"]:
+                ignorados.append({
+                    "ml_id": envio["ml_id"],
+                    "produto_id": envio.get("produto_id"),
+                    "sucesso": True,
+                    "ignorado": True,
+                    "quantidade_nova": envio["quantidade_nova"]
+                })
+            else:
+                pendentes.append(envio)
         
+        # Correções de anúncios que serão enviados são sobrescritas pelo próprio envio
+        ids_pendentes = {e["ml_id"] for e in pendentes}
+        corrigidos = [c for c in corrigidos if c["ml_id"] not in ids_pendentes]
+        
+        return pendentes, ignorados, corrigidos
+    
+    async def _salvar_quantidades(self, itens: List[Dict[str, Any]]) -> None:
+        """Atualiza available_quantity local em lotes (rpc atualizar_quantidades_anuncios)"""
+        for i in range(0, len(itens), settings.ML_SYNC_UPSERT_BATCH):
+            lote = itens[i:i + settings.ML_SYNC_UPSERT_BATCH]
+            try:
+                await run_query(self.db.rpc("atualizar_quantidades_anuncios", {
+                    "p_user_id": self.user_id,
+                    "p_itens": lote
+                }))
+            except Exception as e:
+                # O ML já foi atualizado; a próxima sincronização de anúncios corrige o cache local
+                print(f"[ERROR] Falha ao gravar quantidades locais de {len(lote)} anúncios: {e}")
+    
+    def _resumir_produto(self, produto_id: int, resultados: List[Dict[str, Any]]) -> Dict[str, Any]:
         return {
-            "total_produtos_processados": len(resultados),
-            "produtos": resultados
+            "produto_id": produto_id,
+            "total_anuncios": len(resultados),
+            "sincronizados": sum(1 for r in resultados if r["sucesso"] and not r.get("ignorado")),
+            "ignorados": sum(1 for r in resultados if r.get("ignorado")),
+            "falhas": sum(1 for r in resultados if not r["sucesso"]),
+            "detalhes": [
+                {k: v for k, v in r.items() if k != "produto_id"}
+                for r in resultados
+            ]
         }
     
     async def buscar_estoque_ml(self, ml_id: str) -> int:
         """
         Busca quantidade disponível de um anúncio diretamente do ML
         """
-        token = await self.get_ml_token()
+        quantidades = await self.buscar_estoques_ml([ml_id])
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{settings.ML_API_URL}/items/{ml_id}",
-                headers={"Authorization": f"Bearer {token}"}
-            )
-            response.raise_for_status()
-            data = response.json()
+        if ml_id not in quantidades:
+            raise ValueError(f"Anúncio {ml_id} não encontrado no ML")
         
-        return data.get("available_quantity", 0)
+        return quantidades[ml_id]
+    
+    async def buscar_estoques_ml(self, ml_ids: List[str]) -> Dict[str, int]:
+        """
+        Busca quantidades disponíveis de vários anúncios via multiget (lotes de 20)
+        Retorna {ml_id: available_quantity} para os anúncios encontrados
+        """
+        token = await self.get_ml_token()
+        itens = await buscar_itens_multiget(self.http, token, ml_ids, ATRIBUTOS_ESTOQUE)
+        
+        return {
+            ml_id: item.get("available_quantity", 0)
+            for ml_id, item in itens.items()
+        }
     
     async def importar_estoque_ml(self) -> Dict[str, Any]:
         """
         Importa quantidades do ML para o sistema local
         Útil para sincronizar após vendas externas
+        
+        Quantidades via multiget (lotes de 20 em paralelo) e gravação local em um
+        único statement (rpc importar_estoques_ml). Se vários anúncios apontam para
+        o mesmo produto, vale a MENOR quantidade entre eles (a mais conservadora,
+        independente da ordem em que os anúncios chegam)
         """
-        anuncios = self.db.table("anuncios_ml")\
-            .select("ml_id, produto_id, available_quantity")\
-            .eq("user_id", self.user_id)\
-            .eq("status", "active")\
-            .execute()
+        anuncios = await self._paginar(lambda: (
+            self.db.table("anuncios_ml")
+            .select("ml_id, produto_id, available_quantity")
+            .eq("user_id", self.user_id)
+            .eq("status", "active")
+            .not_.is_("produto_id", "null")
+            .order("ml_id")
+        ))
         
-        if not anuncios.data:
+        if not anuncios:
             return {"message": "Nenhum anúncio ativo encontrado"}
         
-        resultados = []
+        quantidades_ml = await self.buscar_estoques_ml([a["ml_id"] for a in anuncios])
         
-        for anuncio in anuncios.data:
-            try:
-                quantidade_ml = await self.buscar_estoque_ml(anuncio["ml_id"])
-                
-                # Atualiza estoque local
-                self.db.table("estoque")\
-                    .update({"estoque_disponivel": quantidade_ml})\
-                    .eq("produto_id", anuncio["produto_id"])\
-                    .execute()
-                
+        por_produto: Dict[int, int] = {}
+        for anuncio in anuncios:
+            quantidade_ml = quantidades_ml.get(anuncio["ml_id"])
+            if quantidade_ml is not None:
+                produto_id = anuncio["produto_id"]
+                por_produto[produto_id] = min(quantidade_ml, por_produto.get(produto_id, quantidade_ml))
+        
+        gravados: Dict[int, int] = {}
+        if por_produto:
+            result = await run_query(self.db.rpc("importar_estoques_ml", {
+                "p_user_id": self.user_id,
+                "p_itens": [
+                    {"produto_id": produto_id, "estoque_disponivel": quantidade}
+                    for produto_id, quantidade in sorted(por_produto.items())
+                ]
+            }))
+            gravados = {linha["produto_id"]: linha["estoque_disponivel"] for linha in result.data or []}
+            
+            # Cache local dos anúncios acompanha o que veio do ML
+            await self._salvar_quantidades([
+                {"ml_id": ml_id, "available_quantity": quantidade}
+                for ml_id, quantidade in quantidades_ml.items()
+            ])
+        
+        resultados = []
+        for anuncio in anuncios:
+            ml_id = anuncio["ml_id"]
+            produto_id = anuncio["produto_id"]
+            
+            if ml_id not in quantidades_ml:
+                resultados.append({"ml_id": ml_id, "sucesso": False, "erro": "Anúncio não retornado pelo ML"})
+            elif produto_id not in gravados:
+                resultados.append({"ml_id": ml_id, "sucesso": False, "erro": "Produto não encontrado"})
+            else:
                 resultados.append({
-                    "ml_id": anuncio["ml_id"],
+                    "ml_id": ml_id,
+                    "produto_id": produto_id,
                     "sucesso": True,
-                    "quantidade_importada": quantidade_ml
-                })
-                
-            except Exception as e:
-                resultados.append({
-                    "ml_id": anuncio["ml_id"],
-                    "sucesso": False,
-                    "erro": str(e)
+                    "quantidade_importada": quantidades_ml[ml_id],
+                    "quantidade_aplicada": gravados[produto_id]
                 })
         
         return {
-            "total_anuncios": len(anuncios.data),
+            "total_anuncios": len(anuncios),
             "importados": sum(1 for r in resultados if r["sucesso"]),
             "falhas": sum(1 for r in resultados if not r["sucesso"]),
+            "produtos_atualizados": len(gravados),
             "detalhes": resultados
         }
+    
+    async def _paginar(self, montar_query: Callable[[], Any]) -> List[Dict[str, Any]]:
+        """Lê todas as páginas de uma consulta (PostgREST limita as linhas por resposta)"""
+        linhas: List[Dict[str, Any]] = []
+        offset = 0
+        while True:
+            result = await run_query(
+                montar_query().range(offset, offset + self.DB_PAGE_SIZE - 1)
+            )
+            
+            pagina = result.data or []
+            linhas.extend(pagina)
+            
+            if len(pagina) < self.DB_PAGE_SIZE:
+                break
+            offset += self.DB_PAGE_SIZE
+        
+        return linhas
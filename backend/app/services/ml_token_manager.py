@@ -0,0 +1,257 @@
+"""
+Service - Tokens do Mercado Livre
+Cache em memória dos tokens_ml (por user_id interno e por ml_user_id, com TTL curto)
+e renovação antecipada via refresh_token e single-flight por usuário
+"""
+from typing import Any, Awaitable, Callable, Dict, Optional
+from datetime import datetime, timedelta, timezone
+import asyncio
+import httpx
+
+from app.config.settings import settings, get_supabase_client
+from app.services.db_executor import run_query
+from app.services.ml_http_client import get_ml_http_client
+from app.utils.cache import TTLCache
+
+
+def _parse_expires_at(valor: Any) -> datetime:
+    """Converte expires_at do banco (ISO, com ou sem timezone) para datetime UTC"""
+    if isinstance(valor, datetime):
+        expires_at = valor
+    else:
+        expires_at = datetime.fromisoformat(str(valor).replace("Z", "+00:00"))
+
+    if expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+
+    return expires_at
+
+
+class MLTokenManager:
+    """
+    Mantém os tokens ML em memória para evitar um SELECT em tokens_ml a cada chamada
+
+    - Cada token fica em cache por ML_TOKEN_CACHE_TTL segundos e depois é relido do banco
+      (tokens renovados por outra instância não ficam presos no cache deste processo)
+    - Tokens que expiram em menos de ML_TOKEN_REFRESH_MARGIN segundos são renovados
+    - Carregamentos e renovações simultâneas do mesmo usuário viram uma única operação
+      (o refresh_token do ML é de uso único: dois refresh em paralelo invalidam um ao outro)
+    """
+
+    def __init__(
+        self,
+        supabase_client=None,
+        http_client: Optional[httpx.AsyncClient] = None,
+        margem_refresh: Optional[int] = None
+    ):
+        self._db = supabase_client
+        self._http = http_client
+        self.margem_refresh = timedelta(
+            seconds=margem_refresh if margem_refresh is not None else settings.ML_TOKEN_REFRESH_MARGIN
+        )
+        self._por_usuario = TTLCache(maxsize=settings.ML_TOKEN_CACHE_SIZE, ttl=settings.ML_TOKEN_CACHE_TTL)
+        self._ml_para_usuario = TTLCache(maxsize=settings.ML_TOKEN_CACHE_SIZE, ttl=settings.ML_TOKEN_CACHE_TTL)
+        self._em_andamento: Dict[str, asyncio.Future] = {}
+
+    @property
+    def db(self):
+        return self._db or get_supabase_client()
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        return self._http or get_ml_http_client()
+
+    # ============ CONSULTA ============
+
+    async def get_token(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Retorna o token válido do usuário interno
+        {user_id, ml_user_id, access_token, refresh_token, expires_at} ou None
+        """
+        user_id = str(user_id)
+        token = self._por_usuario.get(user_id)
+
+        if token is None:
+            token = await self._unico(f"carregar:{user_id}", lambda: self._carregar("user_id", user_id))
+            if token is None:
+                return None
+
+        return await self._garantir_validade(token)
+
+    async def get_token_por_ml_user(self, ml_user_id: Any) -> Optional[Dict[str, Any]]:
+        """Mesmo que get_token, a partir do ml_user_id (notificações/webhooks)"""
+        user_id = self._ml_para_usuario.get(str(ml_user_id))
+        if user_id is not None:
+            return await self.get_token(user_id)
+
+        token = await self._unico(
+            f"carregar_ml:{ml_user_id}",
+            lambda: self._carregar("ml_user_id", int(ml_user_id))
+        )
+        if token is None:
+            return None
+
+        return await self._garantir_validade(token)
+
+    async def get_access_token(self, user_id: str) -> Optional[str]:
+        """Atalho para o access_token válido do usuário (None se não houver)"""
+        token = await self.get_token(user_id)
+        return token["access_token"] if token else None
+
+    # ============ RENOVAÇÃO ============
+
+    async def renovar(self, user_id: str) -> Dict[str, Any]:
+        """
+        Renova o access_token com o refresh_token (single-flight por usuário)
+        Levanta ValueError se não houver token/refresh_token e httpx.HTTPError se o ML recusar
+        """
+        user_id = str(user_id)
+        return await self._unico(f"renovar:{user_id}", lambda: self._renovar(user_id))
+
+    async def _renovar(self, user_id: str) -> Dict[str, Any]:
+        # Mesma linha que _carregar lê (a mais recente do usuário)
+        result = await run_query(
+            self.db.table("tokens_ml")
+            .select("refresh_token, ml_user_id")
+            .eq("user_id", user_id)
+            .order("created_at", desc=True)
+            .limit(1)
+        )
+
+        if not result.data:
+            self.invalidar(user_id)
+            raise ValueError("Token não encontrado. Faça login novamente.")
+
+        linha = result.data[0]
+        refresh_token = linha.get("refresh_token")
+        if not refresh_token:
+            raise ValueError("Refresh token não disponível")
+
+        response = await self.http.post(
+            settings.ML_TOKEN_URL,
+            data={
+                "grant_type": "refresh_token",
+                "client_id": settings.ML_CLIENT_ID,
+                "client_secret": settings.ML_CLIENT_SECRET,
+                "refresh_token": refresh_token
+            },
+            headers={
+                "Accept": "application/json",
+                "Content-Type": "application/x-www-form-urlencoded"
+            }
+        )
+        response.raise_for_status()
+        token_response = response.json()
+
+        expires_in = token_response.get("expires_in", 21600)
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=expires_in)
+
+        await run_query(self.db.table("tokens_ml").update({
+            "access_token": token_response.get("access_token"),
+            "refresh_token": token_response.get("refresh_token"),
+            "expires_at": expires_at.isoformat()
+        }).eq("user_id", user_id))
+
+        print(f"[DEBUG] Token ML renovado para user_id={user_id}")
+
+        return self.armazenar({
+            "user_id": user_id,
+            "ml_user_id": linha.get("ml_user_id"),
+            "access_token": token_response.get("access_token"),
+            "refresh_token": token_response.get("refresh_token"),
+            "expires_at": expires_at
+        })
+
+    # ============ CACHE ============
+
+    def armazenar(self, linha: Dict[str, Any]) -> Dict[str, Any]:
+        """Guarda uma linha de tokens_ml no cache (após OAuth callback ou refresh)"""
+        token = {
+            "user_id": str(linha["user_id"]),
+            "ml_user_id": linha.get("ml_user_id"),
+            "access_token": linha.get("access_token"),
+            "refresh_token": linha.get("refresh_token"),
+            "expires_at": _parse_expires_at(linha["expires_at"])
+        }
+
+        self._por_usuario.set(token["user_id"], token)
+        if token["ml_user_id"] is not None:
+            self._ml_para_usuario.set(str(token["ml_user_id"]), token["user_id"])
+
+        return token
+
+    def invalidar(self, user_id: Optional[str] = None, ml_user_id: Any = None) -> None:
+        """Remove o usuário do cache (disconnect, novo login)"""
+        if user_id is None and ml_user_id is not None:
+            user_id = self._ml_para_usuario.get(str(ml_user_id))
+
+        if user_id is None:
+            return
+
+        token = self._por_usuario.get(str(user_id))
+        self._por_usuario.invalidate(str(user_id))
+        if token and token.get("ml_user_id") is not None:
+            self._ml_para_usuario.invalidate(str(token["ml_user_id"]))
+
+    def limpar(self) -> None:
+        """Esvazia o cache inteiro"""
+        self._por_usuario.clear()
+        self._ml_para_usuario.clear()
+
+    # ============ INTERNOS ============
+
+    async def _carregar(self, coluna: str, valor: Any) -> Optional[Dict[str, Any]]:
+        """Lê o token mais recente do banco e guarda no cache"""
+        result = await run_query(
+            self.db.table("tokens_ml")
+            .select("user_id, ml_user_id, access_token, refresh_token, expires_at")
+            .eq(coluna, valor)
+            .order("created_at", desc=True)
+            .limit(1)
+        )
+
+        if not result.data or not result.data[0].get("expires_at"):
+            return None
+
+        return self.armazenar(result.data[0])
+
+    async def _garantir_validade(self, token: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Renova antecipadamente se o token estiver perto de expirar"""
+        agora = datetime.now(timezone.utc)
+        if token["expires_at"] - self.margem_refresh > agora:
+            return token
+
+        try:
+            return await self.renovar(token["user_id"])
+        except (ValueError, httpx.HTTPError) as e:
+            print(f"[ERROR] Falha ao renovar token ML de user_id={token['user_id']}: {e}")
+            # Ainda dentro da margem: usa o token atual até expirar de fato
+            if token["expires_at"] > agora:
+                return token
+            return None
+
+    async def _unico(self, chave: str, fabrica: Callable[[], Awaitable[Any]]) -> Any:
+        """Single-flight: chamadas simultâneas com a mesma chave aguardam a mesma tarefa"""
+        tarefa = self._em_andamento.get(chave)
+        if tarefa is None or tarefa.done():
+            tarefa = asyncio.ensure_future(fabrica())
+            self._em_andamento[chave] = tarefa
+            tarefa.add_done_callback(
+                lambda t: self._em_andamento.pop(chave, None) if self._em_andamento.get(chave) is t else None
+            )
+
+        return await asyncio.shield(tarefa)
+
+
+# Instância global (um cache por processo)
+_ml_token_manager: Optional[MLTokenManager] = None
+
+
+def get_ml_token_manager() -> MLTokenManager:
+    """Retorna o gerenciador de tokens ML singleton"""
+    global _ml_token_manager
+
+    if _ml_token_manager is None:
+        _ml_token_manager = MLTokenManager()
+
+    return _ml_token_manager
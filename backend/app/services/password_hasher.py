@@ -0,0 +1,109 @@
+"""
+Service - Hash de senhas (bcrypt) fora do event loop
+bcrypt leva ~250ms de CPU por operação e libera o GIL: roda em um pool de threads
+dedicado, com fila limitada para que picos de login não travem o restante da API
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+import asyncio
+import threading
+import bcrypt
+
+from app.config.settings import settings
+
+
+class FilaSenhasCheiaError(Exception):
+    """Fila de hash de senhas atingiu PASSWORD_HASH_MAX_QUEUE"""
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+# Métricas do processo (em_execucao é alterada pelas threads do pool)
+_metricas_lock = threading.Lock()
+_metricas = {
+    "em_fila": 0,
+    "em_execucao": 0,
+    "concluidas": 0,
+    "rejeitadas": 0
+}
+
+
+def hash_password(password: str) -> str:
+    """Hash de senha usando bcrypt (síncrono)"""
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+
+
+def verify_password(password: str, hashed: str) -> bool:
+    """Verifica senha contra hash (síncrono)"""
+    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.PASSWORD_HASH_WORKERS,
+            thread_name_prefix="bcrypt"
+        )
+
+    return _executor
+
+
+def shutdown_password_hasher() -> None:
+    """Encerra o pool (chamado no shutdown da aplicação)"""
+    global _executor
+
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+
+    _executor = None
+
+
+def _executar_e_contar(func: Callable[..., Any], *args: Any) -> Any:
+    # Roda na thread do pool: a operação saiu da fila e está executando
+    with _metricas_lock:
+        _metricas["em_execucao"] += 1
+    try:
+        return func(*args)
+    finally:
+        with _metricas_lock:
+            _metricas["em_execucao"] -= 1
+
+
+async def _submeter(func: Callable[..., Any], *args: Any) -> Any:
+    """Envia a operação ao pool, recusando quando a fila está cheia"""
+    if _metricas["em_fila"] >= settings.PASSWORD_HASH_MAX_QUEUE:
+        _metricas["rejeitadas"] += 1
+        raise FilaSenhasCheiaError("Muitas autenticações simultâneas. Tente novamente em instantes.")
+
+    _metricas["em_fila"] += 1
+    try:
+        loop = asyncio.get_running_loop()
+        resultado = await loop.run_in_executor(_get_executor(), _executar_e_contar, func, *args)
+        _metricas["concluidas"] += 1
+        return resultado
+    finally:
+        _metricas["em_fila"] -= 1
+
+
+async def hash_password_async(password: str) -> str:
+    """Hash bcrypt no pool dedicado"""
+    return await _submeter(hash_password, password)
+
+
+async def verify_password_async(password: str, hashed: str) -> bool:
+    """Verificação bcrypt no pool dedicado"""
+    return await _submeter(verify_password, password, hashed)
+
+
+def get_password_hasher_stats() -> Dict[str, int]:
+    """
+    Métricas do pool de senhas (exibidas em /health)
+    em_fila inclui as operações em execução
+    """
+    return {
+        "workers": settings.PASSWORD_HASH_WORKERS,
+        "max_fila": settings.PASSWORD_HASH_MAX_QUEUE,
+        **_metricas
+    }
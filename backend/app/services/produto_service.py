@@ -5,6 +5,7 @@ CRUD completo para gestão de produtos
 from typing import List, Optional
 from datetime import datetime
 from supabase import Client
+from app.services.db_executor import run_query
 from app.models.schemas import (
     ProdutoCreate, 
     ProdutoUpdate, 
@@ -18,7 +19,7 @@ class ProdutoService:
         self.db = supabase_client
         self.user_id = user_id
     
-    def criar_produto(self, produto: ProdutoCreate) -> ProdutoResponse:
+    async def criar_produto(self, produto: ProdutoCreate) -> ProdutoResponse:
         """Cria novo produto no banco"""
         data = {
             "user_id": self.user_id,
@@ -33,23 +34,24 @@ class ProdutoService:
             "status": StatusProduto.ACTIVE.value
         }
         
-        result = self.db.table("produtos").insert(data).execute()
+        result = await run_query(self.db.table("produtos").insert(data))
         return ProdutoResponse(**result.data[0])
     
-    def buscar_produto(self, produto_id: int) -> Optional[ProdutoResponse]:
+    async def buscar_produto(self, produto_id: int) -> Optional[ProdutoResponse]:
         """Busca produto por ID"""
-        result = self.db.table("produtos")\
-            .select("*")\
-            .eq("id", produto_id)\
-            .eq("user_id", self.user_id)\
-            .maybe_single()\
-            .execute()
+        result = await run_query(
+            self.db.table("produtos")
+            .select("*")
+            .eq("id", produto_id)
+            .eq("user_id", self.user_id)
+            .maybe_single()
+        )
         
         if result.data:
             return ProdutoResponse(**result.data)
         return None
     
-    def listar_produtos(
+    async def listar_produtos(
         self, 
         skip: int = 0, 
         limit: int = 100,
@@ -65,17 +67,17 @@ class ProdutoService:
         if status:
             query = query.eq("status", status.value)
         
-        result = query.execute()
+        result = await run_query(query)
         return [ProdutoResponse(**item) for item in result.data]
     
-    def atualizar_produto(
+    async def atualizar_produto(
         self, 
         produto_id: int, 
         produto: ProdutoUpdate
     ) -> Optional[ProdutoResponse]:
         """Atualiza dados do produto"""
         # Busca produto primeiro para validar ownership
-        existing = self.buscar_produto(produto_id)
+        existing = await self.buscar_produto(produto_id)
         if not existing:
             return None
         
@@ -98,32 +100,35 @@ class ProdutoService:
         if produto.status is not None:
             update_data["status"] = produto.status.value
         
-        result = self.db.table("produtos")\
-            .update(update_data)\
-            .eq("id", produto_id)\
-            .eq("user_id", self.user_id)\
-            .execute()
+        result = await run_query(
+            self.db.table("produtos")
+            .update(update_data)
+            .eq("id", produto_id)
+            .eq("user_id", self.user_id)
+        )
         
         return ProdutoResponse(**result.data[0])
     
-    def deletar_produto(self, produto_id: int) -> bool:
+    async def deletar_produto(self, produto_id: int) -> bool:
         """Soft delete - marca produto como descontinuado"""
-        result = self.db.table("produtos")\
-            .update({"status": StatusProduto.DISCONTINUED.value})\
-            .eq("id", produto_id)\
-            .eq("user_id", self.user_id)\
-            .execute()
+        result = await run_query(
+            self.db.table("produtos")
+            .update({"status": StatusProduto.DISCONTINUED.value})
+            .eq("id", produto_id)
+            .eq("user_id", self.user_id)
+        )
         
         return len(result.data) > 0
     
-    def buscar_por_sku(self, sku: str) -> Optional[ProdutoResponse]:
+    async def buscar_por_sku(self, sku: str) -> Optional[ProdutoResponse]:
         """Busca produto por SKU interno"""
-        result = self.db.table("produtos")\
-            .select("*")\
-            .eq("sku_interno", sku)\
-            .eq("user_id", self.user_id)\
-            .maybe_single()\
-            .execute()
+        result = await run_query(
+            self.db.table("produtos")
+            .select("*")
+            .eq("sku_interno", sku)
+            .eq("user_id", self.user_id)
+            .maybe_single()
+        )
         
         if result.data:
             return ProdutoResponse(**result.data)
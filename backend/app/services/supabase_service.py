@@ -6,6 +6,7 @@ from typing import Optional, Dict, Any, List
 from datetime import datetime, timedelta
 
 from app.config.settings import settings
+from app.services.db_executor import run_query
 
 
 class SupabaseService:
@@ -45,14 +46,14 @@ class SupabaseService:
         }
         
         # Upsert (insert ou update)
-        response = self.client.table("tokens_ml").upsert(data).execute()
+        response = await run_query(self.client.table("tokens_ml").upsert(data))
         return response.data
     
     async def get_ml_token(self, user_id: int) -> Optional[Dict[str, Any]]:
         """
         Busca token do Mercado Livre por user_id
         """
-        response = self.client.table("tokens_ml").select("*").eq("user_id", user_id).execute()
+        response = await run_query(self.client.table("tokens_ml").select("*").eq("user_id", user_id))
         return response.data[0] if response.data else None
     
     async def update_ml_token(self, access_token: str, refresh_token: str, expires_in: int):
@@ -68,7 +69,7 @@ class SupabaseService:
             "updated_at": datetime.utcnow().isoformat()
         }
         
-        response = self.client.table("tokens_ml").update(data).eq("access_token", access_token).execute()
+        response = await run_query(self.client.table("tokens_ml").update(data).eq("access_token", access_token))
         return response.data
     
     # ========== PRODUTOS ==========
@@ -77,21 +78,21 @@ class SupabaseService:
         """
         Salva ou atualiza produto
         """
-        response = self.client.table("produtos").upsert(product_data).execute()
+        response = await run_query(self.client.table("produtos").upsert(product_data))
         return response.data
     
     async def get_products(self, user_id: int, limit: int = 100) -> List[Dict[str, Any]]:
         """
         Lista produtos de um usuário
         """
-        response = self.client.table("produtos").select("*").eq("user_id", user_id).limit(limit).execute()
+        response = await run_query(self.client.table("produtos").select("*").eq("user_id", user_id).limit(limit))
         return response.data
     
     async def get_product_by_ml_id(self, ml_id: str) -> Optional[Dict[str, Any]]:
         """
         Busca produto pelo ID do Mercado Livre
         """
-        response = self.client.table("produtos").select("*").eq("ml_id", ml_id).execute()
+        response = await run_query(self.client.table("produtos").select("*").eq("ml_id", ml_id))
         return response.data[0] if response.data else None
     
     # ========== ANÚNCIOS ==========
@@ -100,14 +101,14 @@ class SupabaseService:
         """
         Salva anúncio
         """
-        response = self.client.table("anuncios").insert(anuncio_data).execute()
+        response = await run_query(self.client.table("anuncios").insert(anuncio_data))
         return response.data
     
     async def get_anuncios(self, user_id: int, limit: int = 100) -> List[Dict[str, Any]]:
         """
         Lista anúncios de um usuário
         """
-        response = self.client.table("anuncios").select("*").eq("user_id", user_id).limit(limit).execute()
+        response = await run_query(self.client.table("anuncios").select("*").eq("user_id", user_id).limit(limit))
         return response.data
     
     # ========== CATÁLOGO ==========
@@ -116,14 +117,14 @@ class SupabaseService:
         """
         Salva item do catálogo
         """
-        response = self.client.table("catalogo").upsert(catalog_data).execute()
+        response = await run_query(self.client.table("catalogo").upsert(catalog_data))
         return response.data
     
     async def search_catalog(self, search_term: str, limit: int = 50) -> List[Dict[str, Any]]:
         """
         Busca itens no catálogo
         """
-        response = self.client.table("catalogo").select("*").ilike("title", f"%{search_term}%").limit(limit).execute()
+        response = await run_query(self.client.table("catalogo").select("*").ilike("title", f"%{search_term}%").limit(limit))
         return response.data
     
     # ========== PREÇOS CONCORRENTES ==========
@@ -132,7 +133,7 @@ class SupabaseService:
         """
         Salva preço de concorrente
         """
-        response = self.client.table("precos_concorrentes").insert(price_data).execute()
+        response = await run_query(self.client.table("precos_concorrentes").insert(price_data))
         return response.data
     
     async def get_competitor_prices(self, product_id: str, limit: int = 10) -> List[Dict[str, Any]]:
@@ -140,12 +141,11 @@ class SupabaseService:
         Lista preços de concorrentes para um produto
         """
         response = (
-            self.client.table("precos_concorrentes")
+            await run_query(self.client.table("precos_concorrentes")
             .select("*")
             .eq("product_id", product_id)
             .order("created_at", desc=True)
-            .limit(limit)
-            .execute()
+            .limit(limit))
         )
         return response.data
     
@@ -155,7 +155,7 @@ class SupabaseService:
         """
         Salva log de monitoramento
         """
-        response = self.client.table("logs_monitoramento").insert(log_data).execute()
+        response = await run_query(self.client.table("logs_monitoramento").insert(log_data))
         return response.data
     
     async def get_logs(self, user_id: int, log_type: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
@@ -167,5 +167,5 @@ class SupabaseService:
         if log_type:
             query = query.eq("log_type", log_type)
         
-        response = query.order("created_at", desc=True).limit(limit).execute()
+        response = await run_query(query.order("created_at", desc=True).limit(limit))
         return response.data
@@ -0,0 +1,321 @@
+"""
+Service - Fila persistente de webhooks do Mercado Livre
+Intake grava em ml_webhook_queue; um pool de workers drena a fila com retry e backoff
+(ver sql/ml_webhook_queue.sql)
+"""
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from datetime import datetime, timedelta, timezone
+import asyncio
+import random
+
+from app.config.settings import settings, get_supabase_client
+from app.services.db_executor import run_query
+
+
+ProcessadorWebhook = Callable[[Dict[str, Any]], Awaitable[None]]
+
+# Recebe jobs do mesmo topic e ml_user_id; retorna {job_id: exceção} dos que falharam
+ProcessadorLote = Callable[[List[Dict[str, Any]]], Awaitable[Dict[Any, Exception]]]
+
+
+# Contadores do intake neste processo (ver get_webhook_stats)
+_estatisticas = {
+    "recebidas": 0,
+    "enfileiradas": 0,
+    "deduplicadas": 0
+}
+
+
+async def enfileirar_notificacao(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Grava a notificação na fila (única operação feita no request do webhook)
+    Repetições de (topic, resource) ainda pendentes são fundidas no mesmo job
+    Retorna {job_id, deduplicada}
+    """
+    _estatisticas["recebidas"] += 1
+
+    supabase = get_supabase_client()
+    result = await run_query(supabase.rpc("enqueue_ml_webhook", {
+        "p_topic": data.get("topic") or "",
+        "p_resource": data.get("resource") or "",
+        "p_ml_user_id": str(data["user_id"]) if data.get("user_id") is not None else None,
+        "p_payload": data,
+        "p_debounce": settings.WEBHOOK_DEBOUNCE_SECONDS,
+        "p_max_wait": settings.WEBHOOK_DEBOUNCE_MAX_SECONDS
+    }))
+
+    job = result.data[0] if result.data else {}
+    if job.get("deduplicada"):
+        _estatisticas["deduplicadas"] += 1
+    else:
+        _estatisticas["enfileiradas"] += 1
+        if _pool is not None:
+            _pool.acordar()
+
+    return job
+
+
+def calcular_backoff(tentativa: int) -> float:
+    """Espera exponencial com jitter: base * 2^(tentativa-1), limitada a WEBHOOK_RETRY_MAX_SECONDS"""
+    espera = settings.WEBHOOK_RETRY_BASE_SECONDS * (2 ** max(tentativa - 1, 0))
+    espera = min(espera, settings.WEBHOOK_RETRY_MAX_SECONDS)
+    return espera * random.uniform(0.5, 1.0)
+
+
+class WebhookWorkerPool:
+    """
+    Um despachante reserva jobs (claim_ml_webhook_jobs) conforme há workers livres
+    e N workers processam em paralelo. Sucesso remove o job; falha reagenda com
+    backoff até WEBHOOK_MAX_ATTEMPTS, depois marca como failed.
+
+    Topics com processador em lote (ex.: items) são agrupados por ml_user_id em
+    lotes de até WEBHOOK_BATCH_SIZE jobs, cada lote ocupando um worker.
+    """
+
+    def __init__(
+        self,
+        processador: ProcessadorWebhook,
+        workers: Optional[int] = None,
+        supabase_client=None,
+        processadores_lote: Optional[Dict[str, ProcessadorLote]] = None
+    ):
+        self.processador = processador
+        self.processadores_lote = processadores_lote or {}
+        self.n_workers = workers or settings.WEBHOOK_WORKERS
+        self._db = supabase_client
+        self._fila: Optional[asyncio.Queue] = None
+        self._em_andamento = 0
+        self._acordar: Optional[asyncio.Event] = None
+        self._tarefas: List[asyncio.Task] = []
+        self.metricas = {
+            "processados": 0,
+            "falhas": 0,
+            "reagendados": 0,
+            "descartados": 0,
+            "deduplicados": 0
+        }
+
+    @property
+    def db(self):
+        return self._db or get_supabase_client()
+
+    # ============ CICLO DE VIDA ============
+
+    def iniciar(self) -> None:
+        if self._tarefas:
+            return
+
+        self._fila = asyncio.Queue()
+        self._acordar = asyncio.Event()
+        self._tarefas = [asyncio.create_task(self._despachante())]
+        self._tarefas += [asyncio.create_task(self._worker()) for _ in range(self.n_workers)]
+        print(f"[DEBUG] Webhook workers iniciados: {self.n_workers}")
+
+    async def parar(self) -> None:
+        for tarefa in self._tarefas:
+            tarefa.cancel()
+        await asyncio.gather(*self._tarefas, return_exceptions=True)
+        self._tarefas = []
+
+    def acordar(self) -> None:
+        """Sinaliza job novo para o despachante não esperar o próximo poll"""
+        if self._acordar is not None:
+            self._acordar.set()
+
+    # ============ CONSUMO ============
+
+    async def _despachante(self) -> None:
+        while True:
+            try:
+                # Só reserva o que os workers conseguem pegar agora (o lock tem timeout):
+                # jobs avulsos até o nº de workers livres; só os topics com processador
+                # em lote reservam mais (um worker livre consome um lote inteiro)
+                livres = self.n_workers - self._em_andamento
+                if livres <= 0:
+                    await self._aguardar()
+                    continue
+
+                topics_lote = list(self.processadores_lote) or None
+                avulsos = await self._reservar(livres, excluir_topics=topics_lote)
+                ha_mais = len(avulsos) >= min(livres, settings.WEBHOOK_CLAIM_BATCH)
+
+                lotes: List[Dict[str, Any]] = []
+                restantes = livres - len(avulsos)
+                if topics_lote and restantes > 0:
+                    limite = restantes * settings.WEBHOOK_BATCH_SIZE
+                    lotes = await self._reservar(limite, topics=topics_lote)
+                    ha_mais = ha_mais or len(lotes) >= min(limite, settings.WEBHOOK_CLAIM_BATCH)
+
+                unidades = self._agrupar(avulsos + lotes)
+                self._em_andamento += len(unidades)
+                for unidade in unidades:
+                    self._fila.put_nowait(unidade)
+
+                if not ha_mais:
+                    await self._aguardar()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[ERROR] Falha ao reservar webhooks da fila: {e}")
+                await self._aguardar()
+
+    async def _aguardar(self) -> None:
+        self._acordar.clear()
+        try:
+            await asyncio.wait_for(self._acordar.wait(), timeout=settings.WEBHOOK_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _reservar(
+        self,
+        limite: int,
+        topics: Optional[List[str]] = None,
+        excluir_topics: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        result = await run_query(self.db.rpc("claim_ml_webhook_jobs", {
+            "p_limit": min(limite, settings.WEBHOOK_CLAIM_BATCH),
+            "p_lock_timeout": settings.WEBHOOK_LOCK_TIMEOUT,
+            "p_topics": topics,
+            "p_excluir_topics": excluir_topics
+        }))
+        return result.data or []
+
+    def _agrupar(self, jobs: List[Dict[str, Any]]) -> List[Any]:
+        """Separa jobs avulsos e lotes (mesmo topic + ml_user_id) para os workers"""
+        unidades: List[Any] = []
+        grupos: Dict[tuple, List[Dict[str, Any]]] = {}
+
+        for job in jobs:
+            if job.get("topic") in self.processadores_lote:
+                grupos.setdefault((job["topic"], job.get("ml_user_id")), []).append(job)
+            else:
+                unidades.append(job)
+
+        tamanho = settings.WEBHOOK_BATCH_SIZE
+        for grupo in grupos.values():
+            unidades += [grupo[i:i + tamanho] for i in range(0, len(grupo), tamanho)]
+
+        return unidades
+
+    async def _worker(self) -> None:
+        while True:
+            unidade = await self._fila.get()
+            try:
+                if isinstance(unidade, list):
+                    await self._processar_lote(unidade)
+                else:
+                    await self._processar_job(unidade)
+            finally:
+                # Libera espaço para o despachante reservar mais
+                self._em_andamento -= 1
+                self._fila.task_done()
+                self.acordar()
+
+    async def _processar_job(self, job: Dict[str, Any]) -> None:
+        try:
+            await self.processador(job.get("payload") or {})
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await self._registrar_falha(job, e)
+        else:
+            await self._registrar_sucesso([job])
+
+    async def _processar_lote(self, jobs: List[Dict[str, Any]]) -> None:
+        processador = self.processadores_lote[jobs[0]["topic"]]
+        try:
+            falhas = await processador(jobs) or {}
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            falhas = {job["id"]: e for job in jobs}
+
+        for job in jobs:
+            if job["id"] in falhas:
+                await self._registrar_falha(job, falhas[job["id"]])
+
+        await self._registrar_sucesso([job for job in jobs if job["id"] not in falhas])
+
+    async def _registrar_sucesso(self, jobs: List[Dict[str, Any]]) -> None:
+        if not jobs:
+            return
+
+        self.metricas["processados"] += len(jobs)
+        ids = [job["id"] for job in jobs]
+        try:
+            await run_query(self.db.table("ml_webhook_queue").delete().in_("id", ids))
+        except Exception as e:
+            # O job volta após WEBHOOK_LOCK_TIMEOUT: processadores precisam ser idempotentes
+            print(f"[ERROR] Falha ao remover webhooks {ids} da fila: {e}")
+
+    async def _registrar_falha(self, job: Dict[str, Any], erro: Exception) -> None:
+        self.metricas["falhas"] += 1
+        tentativas = job.get("attempts") or 1
+        print(f"[ERROR] Webhook {job['id']} ({job.get('topic')}) falhou na tentativa {tentativas}: {erro}")
+
+        if tentativas >= settings.WEBHOOK_MAX_ATTEMPTS:
+            self.metricas["descartados"] += 1
+            atualizacao = {"status": "failed", "locked_at": None, "last_error": str(erro)[:1000]}
+        else:
+            self.metricas["reagendados"] += 1
+            disponivel = datetime.now(timezone.utc) + timedelta(seconds=calcular_backoff(tentativas))
+            atualizacao = {
+                "status": "pending",
+                "locked_at": None,
+                "available_at": disponivel.isoformat(),
+                "last_error": str(erro)[:1000]
+            }
+
+        try:
+            await run_query(self.db.table("ml_webhook_queue").update(atualizacao).eq("id", job["id"]))
+        except Exception as e:
+            if "23505" in str(e) or "duplicate key" in str(e):
+                # Já chegou notificação nova para o mesmo resource: ela substitui o retry
+                self.metricas["deduplicados"] += 1
+                await run_query(self.db.table("ml_webhook_queue").delete().eq("id", job["id"]))
+            else:
+                print(f"[ERROR] Falha ao reagendar webhook {job['id']}: {e}")
+
+
+# Instância global (iniciada no lifespan da aplicação)
+_pool: Optional[WebhookWorkerPool] = None
+
+
+def iniciar_webhook_workers(
+    processador: ProcessadorWebhook,
+    processadores_lote: Optional[Dict[str, ProcessadorLote]] = None
+) -> Optional[WebhookWorkerPool]:
+    """Cria e inicia o pool de workers (no-op se WEBHOOK_WORKERS=0)"""
+    global _pool
+
+    if settings.WEBHOOK_WORKERS <= 0:
+        return None
+
+    if _pool is None:
+        _pool = WebhookWorkerPool(processador, processadores_lote=processadores_lote)
+        _pool.iniciar()
+
+    return _pool
+
+
+async def parar_webhook_workers() -> None:
+    """Para o pool (jobs em andamento voltam à fila após WEBHOOK_LOCK_TIMEOUT)"""
+    global _pool
+
+    if _pool is not None:
+        await _pool.parar()
+
+    _pool = None
+
+
+def get_webhook_pool() -> Optional[WebhookWorkerPool]:
+    return _pool
+
+
+def get_webhook_stats() -> Dict[str, Any]:
+    """Contadores de intake (recebidas/deduplicadas) e dos workers (processados/falhas)"""
+    return {
+        "intake": dict(_estatisticas),
+        "workers": dict(_pool.metricas) if _pool is not None else None,
+        "debounce_segundos": settings.WEBHOOK_DEBOUNCE_SECONDS
+    }
@@ -0,0 +1,127 @@
+"""
+Cache em memória com expiração (TTL) e limite de tamanho (LRU)
+"""
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+import asyncio
+import time
+
+
+_AUSENTE = object()
+
+
+class TTLCache:
+    """
+    Dicionário com expiração por item e descarte do menos usado quando cheio
+    Um por processo: não compartilha estado entre workers
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._dados: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, chave: Hashable, default: Any = None) -> Any:
+        """Retorna o valor se existir e não tiver expirado"""
+        item = self._dados.get(chave)
+        if item is None:
+            return default
+
+        valor, expira_em = item
+        if expira_em <= time.monotonic():
+            self._dados.pop(chave, None)
+            return default
+
+        self._dados.move_to_end(chave)
+        return valor
+
+    def set(self, chave: Hashable, valor: Any, ttl: Optional[float] = None) -> None:
+        """Guarda o valor; descarta o menos usado se passar de maxsize"""
+        self._dados[chave] = (valor, time.monotonic() + (self.ttl if ttl is None else ttl))
+        self._dados.move_to_end(chave)
+
+        while len(self._dados) > self.maxsize:
+            self._dados.popitem(last=False)
+
+    def invalidate(self, chave: Hashable) -> None:
+        """Remove uma chave (se existir)"""
+        self._dados.pop(chave, None)
+
+    def clear(self) -> None:
+        self._dados.clear()
+
+    def __contains__(self, chave: Hashable) -> bool:
+        return self.get(chave, _AUSENTE) is not _AUSENTE
+
+    def __len__(self) -> int:
+        return len(self._dados)
+
+
+class AsyncTTLCache:
+    """
+    TTLCache para valores carregados por uma corrotina
+    Chamadas simultâneas para a mesma chave sem valor em cache compartilham um
+    único carregamento (single-flight); devolve também a idade do valor
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.ttl = ttl
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._em_andamento: Dict[Hashable, asyncio.Task] = {}
+        self.metricas = {
+            "hits": 0,
+            "misses": 0,
+            "coalescidas": 0
+        }
+
+    async def obter(
+        self,
+        chave: Hashable,
+        carregar: Callable[[], Awaitable[Any]],
+        cachear: Optional[Callable[[Any], bool]] = None
+    ) -> Tuple[Any, float]:
+        """
+        Retorna (valor, idade em segundos)
+        cachear decide se o valor carregado é guardado (ex.: não guardar fallbacks de erro)
+        """
+        item = self._cache.get(chave)
+        if item is not None:
+            self.metricas["hits"] += 1
+            valor, obtido_em = item
+            return valor, time.monotonic() - obtido_em
+
+        tarefa = self._em_andamento.get(chave)
+        if tarefa is None:
+            self.metricas["misses"] += 1
+            tarefa = asyncio.ensure_future(self._carregar(chave, carregar, cachear))
+            self._em_andamento[chave] = tarefa
+            tarefa.add_done_callback(lambda t: self._finalizar(chave, t))
+        else:
+            self.metricas["coalescidas"] += 1
+
+        # shield: cancelar um chamador não cancela o carregamento dos demais
+        return await asyncio.shield(tarefa), 0.0
+
+    async def _carregar(self, chave, carregar, cachear) -> Any:
+        valor = await carregar()
+        if cachear is None or cachear(valor):
+            self._cache.set(chave, (valor, time.monotonic()))
+        return valor
+
+    def _finalizar(self, chave: Hashable, tarefa: asyncio.Task) -> None:
+        if self._em_andamento.get(chave) is tarefa:
+            self._em_andamento.pop(chave, None)
+
+    def invalidate(self, chave: Hashable) -> None:
+        self._cache.invalidate(chave)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ttl_segundos": self.ttl,
+            "entradas": len(self._cache),
+            "em_andamento": len(self._em_andamento),
+            **self.metricas
+        }
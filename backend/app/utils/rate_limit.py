@@ -0,0 +1,69 @@
+"""
+Rate limiting assíncrono (token bucket)
+Limita chamadas à API do ML à cota da aplicação, liberando rajadas curtas até a capacidade
+"""
+from typing import Optional
+import asyncio
+import time
+
+from app.config.settings import settings
+
+
+class TokenBucket:
+    """
+    Balde com `capacidade` fichas, repostas a `taxa` fichas por segundo
+    Cada requisição consome uma ficha; sem fichas, espera a reposição (ordem de chegada)
+    Um por processo: com N instâncias, a cota efetiva é N x taxa
+    """
+
+    def __init__(self, taxa: float, capacidade: Optional[float] = None):
+        self.taxa = taxa
+        self.capacidade = capacidade or taxa
+        self._fichas = self.capacidade
+        self._atualizado_em = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _repor(self) -> None:
+        agora = time.monotonic()
+        self._fichas = min(self.capacidade, self._fichas + (agora - self._atualizado_em) * self.taxa)
+        self._atualizado_em = agora
+
+    async def adquirir(self, fichas: float = 1.0) -> None:
+        """Espera até haver fichas suficientes e as consome"""
+        async with self._lock:
+            while True:
+                self._repor()
+                if self._fichas >= fichas:
+                    self._fichas -= fichas
+                    return
+                await asyncio.sleep((fichas - self._fichas) / self.taxa)
+
+    def pausar(self, segundos: float) -> None:
+        """
+        Esvazia o balde para a próxima ficha sair só daqui a `segundos`
+        (ex.: após 429 com Retry-After): todos que usam o balde esperam
+        """
+        self._repor()
+        self._fichas = min(self._fichas, 1.0 - segundos * self.taxa)
+
+    @property
+    def disponiveis(self) -> float:
+        self._repor()
+        return self._fichas
+
+
+# Instância global: cota da aplicação na API do ML
+_ml_rate_limiter: Optional[TokenBucket] = None
+
+
+def get_ml_rate_limiter() -> TokenBucket:
+    """Token bucket singleton para as chamadas à API do ML"""
+    global _ml_rate_limiter
+
+    if _ml_rate_limiter is None:
+        _ml_rate_limiter = TokenBucket(
+            taxa=settings.ML_RATE_LIMIT_PER_SECOND,
+            capacidade=settings.ML_RATE_LIMIT_BURST
+        )
+
+    return _ml_rate_limiter
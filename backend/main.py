@@ -2,6 +2,7 @@
 Aplicação principal FastAPI - Intelligestor Backend
 Sistema de gestão para integração com Mercado Livre
 """
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
@@ -9,6 +10,22 @@ from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
 from app.config.settings import settings
+from app.services.ml_http_client import init_ml_http_client, close_ml_http_client
+from app.services.db_executor import get_db_executor, shutdown_db_executor
+from app.services.password_hasher import get_password_hasher_stats, shutdown_password_hasher
+from app.services.ml_rate_limit import get_ml_api_stats
+from app.services.ml_buybox_cache import get_buybox_cache
+from app.services.buybox_snapshot_service import (
+    get_buybox_snapshot_stats,
+    iniciar_snapshots_buybox,
+    parar_snapshots_buybox
+)
+from app.services.ml_reference_cache import (
+    get_ml_reference_cache,
+    iniciar_aquecimento_cache_referencia,
+    parar_aquecimento_cache_referencia
+)
+from app.services.webhook_queue import iniciar_webhook_workers, parar_webhook_workers
 from app.routers import (
     ia_buybox, 
     ia_products, 
@@ -25,13 +42,34 @@ from app.routers import (
     integrations
 )
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Recursos compartilhados: criados no startup e liberados no shutdown"""
+    await init_ml_http_client()
+    get_db_executor()
+    iniciar_webhook_workers(
+        webhooks_ml.process_notification,
+        {"items": webhooks_ml.process_item_notifications_batch}
+    )
+    iniciar_aquecimento_cache_referencia()
+    iniciar_snapshots_buybox()
+    yield
+    await parar_snapshots_buybox()
+    await parar_aquecimento_cache_referencia()
+    await parar_webhook_workers()
+    await close_ml_http_client()
+    shutdown_db_executor()
+    shutdown_password_hasher()
+
+
 # Criar aplicação FastAPI
 app = FastAPI(
     title="Intelligestor Backend",
     description="Sistema de gestão para integração com Mercado Livre",
     version="1.0.1",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # Configurar CORS - Permitir todas as origens Vercel
@@ -138,7 +176,12 @@ async def health_check():
             "configured": bool(settings.SUPABASE_URL),
             "host": masked_host,
             "has_service_role": bool(settings.SUPABASE_SERVICE_ROLE_KEY)
-        }
+        },
+        "password_hasher": get_password_hasher_stats(),
+        "ml_api": get_ml_api_stats(),
+        "ml_reference_cache": get_ml_reference_cache().stats(),
+        "ml_buybox_cache": get_buybox_cache().stats(),
+        "buybox_snapshots": get_buybox_snapshot_stats()
     }
 
 
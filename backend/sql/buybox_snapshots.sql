@@ -0,0 +1,98 @@
+-- ============================================================================
+-- HISTÓRICO DE BUYBOX (SÉRIE TEMPORAL DE price_to_win E CONCORRÊNCIA)
+-- Intelligestor Backend - app/services/buybox_snapshot_service.py
+-- ============================================================================
+--
+-- buybox_snapshots: uma linha compacta por item do catálogo a cada captura
+-- (status, preço, price_to_win, vencedor, menor preço e nº de concorrentes).
+-- Tabela só de INSERT, em ordem de tempo:
+--   - BRIN em capturado_em: índice de poucos KB para varreduras por período e
+--     para a limpeza por retenção, mesmo com milhões de linhas
+--   - B-tree (user_id, ml_item_id, capturado_em DESC): histórico de um item nos
+--     últimos 7/30 dias lê só as linhas daquele item
+--
+-- registrar_buybox_snapshots(): grava um lote inteiro em um INSERT (um round trip).
+-- limpar_buybox_snapshots(): apaga o que passou da retenção.
+--
+-- INSTRUÇÕES: cole no SQL Editor do Supabase e execute (idempotente)
+-- ============================================================================
+
+-- ============================================================================
+-- PARTE 1: TABELA E ÍNDICES
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS public.buybox_snapshots (
+    id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    user_id UUID NOT NULL,
+    ml_item_id TEXT NOT NULL,
+    catalog_product_id TEXT,
+    capturado_em TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    status TEXT,                                  -- winning | competing | sharing_first_place | listed
+    preco NUMERIC(12, 2),
+    price_to_win NUMERIC(12, 2),
+    visit_share TEXT,
+    vencedor_item_id TEXT,
+    preco_vencedor NUMERIC(12, 2),
+    menor_preco_concorrente NUMERIC(12, 2),
+    total_concorrentes INTEGER
+);
+
+CREATE INDEX IF NOT EXISTS brin_buybox_snapshots_capturado_em
+    ON public.buybox_snapshots USING BRIN (capturado_em)
+    WITH (pages_per_range = 32);
+
+CREATE INDEX IF NOT EXISTS idx_buybox_snapshots_item_tempo
+    ON public.buybox_snapshots(user_id, ml_item_id, capturado_em DESC);
+
+-- ============================================================================
+-- PARTE 2: FUNÇÕES
+-- ============================================================================
+
+-- p_snapshots: [{"ml_item_id": "MLB123", "catalog_product_id": "MLB999", "status": "competing",
+--                "preco": 32.9, "price_to_win": 29.4, "visit_share": "minimum",
+--                "vencedor_item_id": "MLB456", "preco_vencedor": 29.9,
+--                "menor_preco_concorrente": 29.9, "total_concorrentes": 8}, ...]
+CREATE OR REPLACE FUNCTION public.registrar_buybox_snapshots(
+    p_user_id UUID,
+    p_snapshots JSONB
+)
+RETURNS INTEGER AS $$
+DECLARE
+    v_inseridos INTEGER;
+BEGIN
+    INSERT INTO public.buybox_snapshots (
+        user_id, ml_item_id, catalog_product_id, status, preco, price_to_win, visit_share,
+        vencedor_item_id, preco_vencedor, menor_preco_concorrente, total_concorrentes
+    )
+    SELECT p_user_id, s.ml_item_id, s.catalog_product_id, s.status, s.preco, s.price_to_win, s.visit_share,
+           s.vencedor_item_id, s.preco_vencedor, s.menor_preco_concorrente, s.total_concorrentes
+    FROM jsonb_to_recordset(p_snapshots) AS s(
+        ml_item_id TEXT, catalog_product_id TEXT, status TEXT, preco NUMERIC, price_to_win NUMERIC,
+        visit_share TEXT, vencedor_item_id TEXT, preco_vencedor NUMERIC,
+        menor_preco_concorrente NUMERIC, total_concorrentes INTEGER
+    )
+    WHERE s.ml_item_id IS NOT NULL;
+
+    GET DIAGNOSTICS v_inseridos = ROW_COUNT;
+    RETURN v_inseridos;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.limpar_buybox_snapshots(
+    p_dias INTEGER
+)
+RETURNS INTEGER AS $$
+DECLARE
+    v_apagados INTEGER;
+BEGIN
+    DELETE FROM public.buybox_snapshots
+    WHERE capturado_em < NOW() - make_interval(days => p_dias);
+
+    GET DIAGNOSTICS v_apagados = ROW_COUNT;
+    RETURN v_apagados;
+END;
+$$ LANGUAGE plpgsql;
+
+GRANT SELECT, INSERT ON public.buybox_snapshots TO anon, authenticated, service_role;
+GRANT EXECUTE ON FUNCTION public.registrar_buybox_snapshots(UUID, JSONB) TO anon, authenticated, service_role;
+GRANT EXECUTE ON FUNCTION public.limpar_buybox_snapshots(INTEGER) TO service_role;
@@ -0,0 +1,222 @@
+-- ============================================================================
+-- MOVIMENTAÇÃO DE ESTOQUE ATÔMICA
+-- Intelligestor Backend - POST /estoque/movimentacao e /estoque/movimentacao/lote
+-- ============================================================================
+--
+-- movimentar_estoque() valida o produto, registra a movimentação e aplica o
+-- delta em UMA transação e UM round trip. O saldo é calculado pelo próprio
+-- UPDATE (estoque = estoque +/- n) e as validações de saldo estão no WHERE,
+-- então movimentações concorrentes não perdem atualizações nem passam do saldo.
+--
+-- movimentar_estoque_lote() faz o mesmo para uma lista (ex.: nota fiscal de
+-- fornecedor com centenas de linhas) em uma única chamada.
+--
+-- Depende de sql/estoque_pedidos_ml.sql (coluna estoque_reservado e índice
+-- único uq_estoque_produto).
+--
+-- INSTRUÇÕES: cole no SQL Editor do Supabase e execute (idempotente)
+-- ============================================================================
+
+-- ============================================================================
+-- PARTE 1: MOVIMENTAÇÃO INDIVIDUAL
+-- ============================================================================
+
+-- Núcleo sem checagem de ownership (feita por quem chama).
+-- Erros de validação usam RAISE EXCEPTION (SQLSTATE P0001): o backend devolve 400
+CREATE OR REPLACE FUNCTION public.aplicar_movimentacao_estoque(
+    p_user_id UUID,
+    p_produto_id BIGINT,
+    p_variacao_id BIGINT,
+    p_tipo TEXT,
+    p_quantidade INTEGER,
+    p_motivo TEXT,
+    p_custo_unitario NUMERIC DEFAULT NULL,
+    p_documento TEXT DEFAULT NULL
+)
+RETURNS public.estoque AS $$
+DECLARE
+    v_estoque public.estoque%ROWTYPE;
+BEGIN
+    IF p_tipo IS NULL OR p_tipo NOT IN ('entrada', 'saida', 'ajuste', 'reserva', 'liberacao') THEN
+        RAISE EXCEPTION 'Tipo de movimentação inválido: %', p_tipo;
+    END IF;
+
+    IF p_quantidade IS NULL OR p_quantidade < 0 OR (p_quantidade = 0 AND p_tipo <> 'ajuste') THEN
+        RAISE EXCEPTION 'Quantidade inválida: %', p_quantidade;
+    END IF;
+
+    -- Cria registro de estoque se não existir
+    INSERT INTO public.estoque (produto_id, variacao_id, estoque_atual, estoque_disponivel, estoque_minimo, estoque_reservado)
+    VALUES (p_produto_id, p_variacao_id, 0, 0, 0, 0)
+    ON CONFLICT (produto_id) DO NOTHING;
+
+    -- Delta relativo; SAIDA/RESERVA só passam com saldo disponível suficiente
+    UPDATE public.estoque e
+    SET estoque_atual = CASE p_tipo
+            WHEN 'entrada' THEN e.estoque_atual + p_quantidade
+            WHEN 'saida' THEN e.estoque_atual - p_quantidade
+            WHEN 'ajuste' THEN p_quantidade
+            ELSE e.estoque_atual
+        END,
+        estoque_disponivel = CASE p_tipo
+            WHEN 'entrada' THEN e.estoque_disponivel + p_quantidade
+            WHEN 'saida' THEN e.estoque_disponivel - p_quantidade
+            WHEN 'ajuste' THEN e.estoque_disponivel + (p_quantidade - e.estoque_atual)
+            WHEN 'reserva' THEN e.estoque_disponivel - p_quantidade
+            WHEN 'liberacao' THEN e.estoque_disponivel + p_quantidade
+        END,
+        estoque_reservado = CASE p_tipo
+            WHEN 'reserva' THEN e.estoque_reservado + p_quantidade
+            WHEN 'liberacao' THEN e.estoque_reservado - p_quantidade
+            ELSE e.estoque_reservado
+        END
+    WHERE e.produto_id = p_produto_id
+      AND (p_tipo NOT IN ('saida', 'reserva') OR e.estoque_disponivel >= p_quantidade)
+    RETURNING e.* INTO v_estoque;
+
+    IF NOT FOUND THEN
+        SELECT * INTO v_estoque FROM public.estoque WHERE produto_id = p_produto_id;
+        IF p_tipo = 'reserva' THEN
+            RAISE EXCEPTION 'Estoque insuficiente para reserva. Disponível: %', v_estoque.estoque_disponivel;
+        END IF;
+        RAISE EXCEPTION 'Estoque insuficiente. Disponível: %', v_estoque.estoque_disponivel;
+    END IF;
+
+    INSERT INTO public.movimentacoes_estoque (
+        produto_id, variacao_id, tipo, quantidade, motivo, custo_unitario, documento, user_id
+    )
+    VALUES (
+        p_produto_id, p_variacao_id, p_tipo, p_quantidade, p_motivo, p_custo_unitario, p_documento, p_user_id
+    );
+
+    RETURN v_estoque;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.movimentar_estoque(
+    p_user_id UUID,
+    p_produto_id BIGINT,
+    p_variacao_id BIGINT,
+    p_tipo TEXT,
+    p_quantidade INTEGER,
+    p_motivo TEXT,
+    p_custo_unitario NUMERIC DEFAULT NULL,
+    p_documento TEXT DEFAULT NULL
+)
+RETURNS SETOF public.estoque AS $$
+BEGIN
+    -- Ownership
+    PERFORM 1 FROM public.produtos WHERE id = p_produto_id AND user_id = p_user_id;
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'Produto não encontrado';
+    END IF;
+
+    RETURN NEXT public.aplicar_movimentacao_estoque(
+        p_user_id, p_produto_id, p_variacao_id, p_tipo, p_quantidade,
+        p_motivo, p_custo_unitario, p_documento
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================================================
+-- PARTE 2: MOVIMENTAÇÃO EM LOTE
+-- ============================================================================
+
+-- p_movimentacoes: [{"produto_id": 1, "variacao_id": null, "tipo": "entrada",
+--                    "quantidade": 10, "motivo": "...", "custo_unitario": 5.5,
+--                    "documento": "NF 123"}, ...]
+--
+-- Ownership de todos os produtos é validado em uma consulta. Cada linha roda em
+-- um savepoint: uma linha inválida não derruba as demais e o resultado volta
+-- por linha (indice = posição na lista). Com p_atomico = true, qualquer falha
+-- desfaz o lote inteiro (as linhas válidas voltam com erro "revertida").
+--
+-- Linhas são aplicadas em ordem de produto_id (e de posição dentro do mesmo
+-- produto): lotes concorrentes travam as linhas de estoque na mesma ordem.
+CREATE OR REPLACE FUNCTION public.movimentar_estoque_lote(
+    p_user_id UUID,
+    p_movimentacoes JSONB,
+    p_atomico BOOLEAN DEFAULT FALSE
+)
+RETURNS TABLE (
+    indice INTEGER,
+    produto_id BIGINT,
+    sucesso BOOLEAN,
+    erro TEXT,
+    estoque JSONB
+) AS $$
+DECLARE
+    v_proprios BIGINT[];
+    v_linha RECORD;
+    v_estoque public.estoque%ROWTYPE;
+    v_resultados JSONB := '[]'::jsonb;
+    v_falhas INTEGER := 0;
+BEGIN
+    SELECT COALESCE(array_agg(p.id), '{}') INTO v_proprios
+    FROM public.produtos p
+    WHERE p.user_id = p_user_id
+      AND p.id IN (
+          SELECT (m->>'produto_id')::BIGINT FROM jsonb_array_elements(p_movimentacoes) m
+      );
+
+    BEGIN
+        FOR v_linha IN
+            SELECT (m.ordinality - 1)::INTEGER AS indice, r.*
+            FROM jsonb_array_elements(p_movimentacoes) WITH ORDINALITY AS m(valor, ordinality),
+                 jsonb_to_record(m.valor) AS r(
+                     produto_id BIGINT, variacao_id BIGINT, tipo TEXT, quantidade INTEGER,
+                     motivo TEXT, custo_unitario NUMERIC, documento TEXT
+                 )
+            ORDER BY r.produto_id, m.ordinality
+        LOOP
+            BEGIN
+                IF v_linha.produto_id IS NULL OR NOT (v_linha.produto_id = ANY(v_proprios)) THEN
+                    RAISE EXCEPTION 'Produto não encontrado';
+                END IF;
+
+                v_estoque := public.aplicar_movimentacao_estoque(
+                    p_user_id, v_linha.produto_id, v_linha.variacao_id, v_linha.tipo,
+                    v_linha.quantidade, v_linha.motivo, v_linha.custo_unitario, v_linha.documento
+                );
+
+                v_resultados := v_resultados || jsonb_build_object(
+                    'indice', v_linha.indice, 'produto_id', v_linha.produto_id,
+                    'sucesso', TRUE, 'erro', NULL, 'estoque', to_jsonb(v_estoque)
+                );
+            EXCEPTION WHEN OTHERS THEN
+                v_falhas := v_falhas + 1;
+                v_resultados := v_resultados || jsonb_build_object(
+                    'indice', v_linha.indice, 'produto_id', v_linha.produto_id,
+                    'sucesso', FALSE, 'erro', SQLERRM, 'estoque', NULL
+                );
+            END;
+        END LOOP;
+
+        IF p_atomico AND v_falhas > 0 THEN
+            RAISE EXCEPTION 'lote revertido' USING ERRCODE = 'EST01';
+        END IF;
+    EXCEPTION WHEN SQLSTATE 'EST01' THEN
+        -- Desfaz o lote; v_resultados (variável) sobrevive ao rollback do bloco
+        SELECT COALESCE(jsonb_agg(
+            CASE WHEN (r->>'sucesso')::BOOLEAN
+                THEN r || jsonb_build_object('sucesso', FALSE, 'erro', 'revertida', 'estoque', NULL)
+                ELSE r
+            END
+        ), '[]'::jsonb) INTO v_resultados
+        FROM jsonb_array_elements(v_resultados) r;
+    END;
+
+    RETURN QUERY
+    SELECT (r->>'indice')::INTEGER, (r->>'produto_id')::BIGINT, (r->>'sucesso')::BOOLEAN,
+           r->>'erro', r->'estoque'
+    FROM jsonb_array_elements(v_resultados) r
+    ORDER BY (r->>'indice')::INTEGER;
+END;
+$$ LANGUAGE plpgsql;
+
+GRANT EXECUTE ON FUNCTION public.aplicar_movimentacao_estoque(UUID, BIGINT, BIGINT, TEXT, INTEGER, TEXT, NUMERIC, TEXT)
+    TO anon, authenticated, service_role;
+GRANT EXECUTE ON FUNCTION public.movimentar_estoque(UUID, BIGINT, BIGINT, TEXT, INTEGER, TEXT, NUMERIC, TEXT)
+    TO anon, authenticated, service_role;
+GRANT EXECUTE ON FUNCTION public.movimentar_estoque_lote(UUID, JSONB, BOOLEAN)
+    TO anon, authenticated, service_role;
@@ -0,0 +1,217 @@
+-- ============================================================================
+-- BAIXA DE ESTOQUE POR PEDIDOS DO MERCADO LIVRE
+-- Intelligestor Backend - webhooks de orders -> EstoqueService
+-- ============================================================================
+--
+-- Cada notificação de pedido chama aplicar_pedido_ml_estoque(), que move o
+-- estoque em UMA transação, com UPDATE relativo (estoque = estoque - n) e sem
+-- leitura prévia: pedidos simultâneos do mesmo produto não perdem atualizações.
+--
+-- Idempotência: ml_pedidos_estoque guarda o estado de cada (pedido, produto).
+-- O ML reenvia notificações e o worker refaz jobs; a transição só é aplicada
+-- uma vez (reservado -> baixado / liberado), então retries não baixam em dobro.
+--
+-- INSTRUÇÕES: cole no SQL Editor do Supabase e execute (idempotente)
+-- ============================================================================
+
+-- ============================================================================
+-- PARTE 1: TABELAS
+-- ============================================================================
+
+-- Um registro de estoque por produto (mesma premissa de EstoqueService.buscar_estoque)
+ALTER TABLE public.estoque
+    ADD COLUMN IF NOT EXISTS estoque_reservado INTEGER NOT NULL DEFAULT 0;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_estoque_produto
+    ON public.estoque(produto_id);
+
+-- Chave de idempotência: estado do pedido já aplicado ao estoque
+CREATE TABLE IF NOT EXISTS public.ml_pedidos_estoque (
+    user_id UUID NOT NULL,
+    order_id TEXT NOT NULL,
+    produto_id BIGINT NOT NULL,
+    ml_item_id TEXT,
+    quantidade INTEGER NOT NULL,
+    estado TEXT NOT NULL,                        -- reservado | baixado | liberado ('novo' só dentro da transação)
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (user_id, order_id, produto_id)
+);
+
+ALTER TABLE public.ml_pedidos_estoque DISABLE ROW LEVEL SECURITY;
+
+DROP TRIGGER IF EXISTS update_ml_pedidos_estoque_updated_at ON public.ml_pedidos_estoque;
+CREATE TRIGGER update_ml_pedidos_estoque_updated_at
+    BEFORE UPDATE ON public.ml_pedidos_estoque
+    FOR EACH ROW
+    EXECUTE FUNCTION public.update_updated_at_column();
+
+-- ============================================================================
+-- PARTE 2: DELTA ATÔMICO
+-- ============================================================================
+
+-- Aplica deltas relativos ao estoque do produto (cria o registro zerado se faltar).
+-- O lock de linha dura só até o fim da transação chamadora.
+CREATE OR REPLACE FUNCTION public.aplicar_delta_estoque(
+    p_produto_id BIGINT,
+    p_delta_atual INTEGER,
+    p_delta_disponivel INTEGER,
+    p_delta_reservado INTEGER
+)
+RETURNS SETOF public.estoque AS $$
+BEGIN
+    INSERT INTO public.estoque (produto_id, estoque_atual, estoque_disponivel, estoque_minimo, estoque_reservado)
+    VALUES (p_produto_id, 0, 0, 0, 0)
+    ON CONFLICT (produto_id) DO NOTHING;
+
+    RETURN QUERY
+    UPDATE public.estoque e
+    SET estoque_atual = e.estoque_atual + p_delta_atual,
+        estoque_disponivel = e.estoque_disponivel + p_delta_disponivel,
+        estoque_reservado = e.estoque_reservado + p_delta_reservado
+    WHERE e.produto_id = p_produto_id
+    RETURNING e.*;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================================================
+-- PARTE 3: PEDIDO -> MOVIMENTAÇÕES
+-- ============================================================================
+
+-- p_estado: reservado (pedido aguardando pagamento), baixado (pago) ou liberado (cancelado)
+-- p_itens: [{"ml_item_id": "MLB123", "seller_sku": "SKU-1", "quantidade": 2}, ...]
+--
+-- Transições aplicadas (as demais são ignoradas):
+--   (nenhum)  -> reservado : disponível -= q, reservado += q    (RESERVA)
+--   (nenhum)  -> baixado   : atual -= q, disponível -= q        (SAIDA)
+--   reservado -> baixado   : atual -= q, reservado -= q         (SAIDA da reserva)
+--   reservado -> liberado  : disponível += q, reservado -= q    (LIBERACAO)
+--   (nenhum)  -> liberado  : só registra (um "paid" atrasado não baixa)
+--
+-- Pedido já vendido no ML é fato consumado: a baixa é aplicada mesmo sem saldo
+-- e a linha volta com estoque_insuficiente = true para alerta.
+CREATE OR REPLACE FUNCTION public.aplicar_pedido_ml_estoque(
+    p_user_id UUID,
+    p_order_id TEXT,
+    p_estado TEXT,
+    p_itens JSONB
+)
+RETURNS TABLE (
+    produto_id BIGINT,
+    ml_item_id TEXT,
+    quantidade INTEGER,
+    estado_anterior TEXT,
+    estado TEXT,
+    tipo_movimentacao TEXT,
+    estoque_disponivel INTEGER,
+    estoque_insuficiente BOOLEAN
+) AS $$
+DECLARE
+    v_item RECORD;
+    v_produto_id BIGINT;
+    v_anterior TEXT;
+    v_tipo TEXT;
+    v_estoque public.estoque%ROWTYPE;
+BEGIN
+    IF p_estado NOT IN ('reservado', 'baixado', 'liberado') THEN
+        RAISE EXCEPTION 'Estado de pedido inválido: %', p_estado;
+    END IF;
+
+    -- Itens repetidos no pedido (mesmo anúncio) somam a quantidade
+    FOR v_item IN
+        SELECT i.ml_item_id, MAX(i.seller_sku) AS seller_sku, SUM(i.quantidade)::INTEGER AS quantidade
+        FROM jsonb_to_recordset(p_itens) AS i(ml_item_id TEXT, seller_sku TEXT, quantidade INTEGER)
+        GROUP BY i.ml_item_id
+        ORDER BY i.ml_item_id                    -- ordem fixa evita deadlock entre pedidos
+    LOOP
+        -- Produto vinculado ao anúncio; senão, pelo SKU do vendedor
+        SELECT a.produto_id INTO v_produto_id
+        FROM public.anuncios_ml a
+        WHERE a.ml_id = v_item.ml_item_id
+          AND a.user_id = p_user_id
+          AND a.produto_id IS NOT NULL
+        LIMIT 1;
+
+        IF v_produto_id IS NULL AND v_item.seller_sku IS NOT NULL THEN
+            SELECT p.id INTO v_produto_id
+            FROM public.produtos p
+            WHERE p.sku_interno = v_item.seller_sku
+              AND p.user_id = p_user_id
+            LIMIT 1;
+        END IF;
+
+        IF v_produto_id IS NULL THEN
+            CONTINUE;
+        END IF;
+
+        -- Garante a linha de idempotência e a trava até o fim da transação
+        INSERT INTO public.ml_pedidos_estoque AS pe (user_id, order_id, produto_id, ml_item_id, quantidade, estado)
+        VALUES (p_user_id, p_order_id, v_produto_id, v_item.ml_item_id, v_item.quantidade, 'novo')
+        ON CONFLICT ON CONSTRAINT ml_pedidos_estoque_pkey DO NOTHING;
+
+        SELECT pe.estado INTO v_anterior
+        FROM public.ml_pedidos_estoque pe
+        WHERE pe.user_id = p_user_id AND pe.order_id = p_order_id AND pe.produto_id = v_produto_id
+        FOR UPDATE;
+
+        v_tipo := CASE
+            WHEN v_anterior = 'novo' AND p_estado = 'reservado' THEN 'reserva'
+            WHEN v_anterior IN ('novo', 'reservado') AND p_estado = 'baixado' THEN 'saida'
+            WHEN v_anterior = 'reservado' AND p_estado = 'liberado' THEN 'liberacao'
+            WHEN v_anterior = 'novo' AND p_estado = 'liberado' THEN 'registro'
+            ELSE NULL
+        END;
+
+        IF v_tipo IS NULL THEN
+            CONTINUE;                            -- transição já aplicada (retry)
+        END IF;
+
+        IF v_tipo <> 'registro' THEN
+            SELECT * INTO v_estoque
+            FROM public.aplicar_delta_estoque(
+                v_produto_id,
+                CASE WHEN v_tipo = 'saida' THEN -v_item.quantidade ELSE 0 END,
+                CASE
+                    WHEN v_tipo = 'reserva' THEN -v_item.quantidade
+                    WHEN v_tipo = 'liberacao' THEN v_item.quantidade
+                    WHEN v_anterior = 'novo' THEN -v_item.quantidade   -- saida direta
+                    ELSE 0                                             -- saida da reserva
+                END,
+                CASE
+                    WHEN v_tipo = 'reserva' THEN v_item.quantidade
+                    WHEN v_anterior = 'reservado' THEN -v_item.quantidade
+                    ELSE 0
+                END
+            );
+
+            INSERT INTO public.movimentacoes_estoque (produto_id, tipo, quantidade, motivo, documento, user_id)
+            VALUES (
+                v_produto_id,
+                v_tipo,
+                v_item.quantidade,
+                'Pedido Mercado Livre ' || p_order_id,
+                p_order_id,
+                p_user_id
+            );
+        END IF;
+
+        UPDATE public.ml_pedidos_estoque pe
+        SET estado = p_estado, quantidade = v_item.quantidade
+        WHERE pe.user_id = p_user_id AND pe.order_id = p_order_id AND pe.produto_id = v_produto_id;
+
+        produto_id := v_produto_id;
+        ml_item_id := v_item.ml_item_id;
+        quantidade := v_item.quantidade;
+        estado_anterior := NULLIF(v_anterior, 'novo');
+        estado := p_estado;
+        tipo_movimentacao := NULLIF(v_tipo, 'registro');
+        estoque_disponivel := CASE WHEN v_tipo = 'registro' THEN NULL ELSE v_estoque.estoque_disponivel END;
+        estoque_insuficiente := v_tipo <> 'registro' AND v_estoque.estoque_disponivel < 0;
+        RETURN NEXT;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+GRANT ALL ON public.ml_pedidos_estoque TO anon, authenticated, service_role;
+GRANT EXECUTE ON FUNCTION public.aplicar_delta_estoque(BIGINT, INTEGER, INTEGER, INTEGER) TO anon, authenticated, service_role;
+GRANT EXECUTE ON FUNCTION public.aplicar_pedido_ml_estoque(UUID, TEXT, TEXT, JSONB) TO anon, authenticated, service_role;
@@ -0,0 +1,78 @@
+-- ============================================================================
+-- SINCRONIZAÇÃO DE ESTOQUE LOCAL <-> MERCADO LIVRE
+-- Intelligestor Backend - /estoque/sync/* (app/services/ml_sync_service.py)
+-- ============================================================================
+--
+-- vinculos_estoque_ml(): anúncios ativos vinculados a produtos + saldo local,
+-- em uma consulta (substitui uma consulta de anúncios por produto).
+--
+-- atualizar_quantidades_anuncios(): grava available_quantity de vários
+-- anúncios em um UPDATE ... FROM jsonb_to_recordset (um round trip por lote).
+--
+-- Depende de sql/estoque_pedidos_ml.sql (índice único uq_estoque_produto).
+--
+-- INSTRUÇÕES: cole no SQL Editor do Supabase e execute (idempotente)
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION public.vinculos_estoque_ml(
+    p_user_id UUID,
+    p_produto_id BIGINT DEFAULT NULL
+)
+RETURNS TABLE (
+    ml_id TEXT,
+    produto_id BIGINT,
+    available_quantity INTEGER,
+    estoque_disponivel INTEGER
+) AS $$
+    SELECT a.ml_id, a.produto_id, a.available_quantity, e.estoque_disponivel
+    FROM public.anuncios_ml a
+    JOIN public.estoque e ON e.produto_id = a.produto_id
+    WHERE a.user_id = p_user_id
+      AND a.status = 'active'
+      AND (p_produto_id IS NULL OR a.produto_id = p_produto_id)
+    ORDER BY a.produto_id, a.ml_id;
+$$ LANGUAGE sql STABLE;
+
+-- p_itens: [{"ml_id": "MLB123", "available_quantity": 7}, ...]
+CREATE OR REPLACE FUNCTION public.atualizar_quantidades_anuncios(
+    p_user_id UUID,
+    p_itens JSONB
+)
+RETURNS INTEGER AS $$
+DECLARE
+    v_atualizados INTEGER;
+BEGIN
+    UPDATE public.anuncios_ml a
+    SET available_quantity = i.available_quantity
+    FROM jsonb_to_recordset(p_itens) AS i(ml_id TEXT, available_quantity INTEGER)
+    WHERE a.ml_id = i.ml_id
+      AND a.user_id = p_user_id
+      AND a.available_quantity IS DISTINCT FROM i.available_quantity;
+
+    GET DIAGNOSTICS v_atualizados = ROW_COUNT;
+    RETURN v_atualizados;
+END;
+$$ LANGUAGE plpgsql;
+
+GRANT EXECUTE ON FUNCTION public.vinculos_estoque_ml(UUID, BIGINT) TO anon, authenticated, service_role;
+GRANT EXECUTE ON FUNCTION public.atualizar_quantidades_anuncios(UUID, JSONB) TO anon, authenticated, service_role;
+
+-- Importação ML -> local: grava estoque_disponivel de vários produtos de uma vez
+-- (cria o registro de estoque se faltar). Produtos de outro usuário são ignorados.
+-- p_itens: [{"produto_id": 1, "estoque_disponivel": 7}, ...] (um por produto)
+CREATE OR REPLACE FUNCTION public.importar_estoques_ml(
+    p_user_id UUID,
+    p_itens JSONB
+)
+RETURNS TABLE (produto_id BIGINT, estoque_disponivel INTEGER) AS $$
+    INSERT INTO public.estoque AS e (produto_id, estoque_atual, estoque_disponivel, estoque_minimo, estoque_reservado)
+    SELECT i.produto_id, i.estoque_disponivel, i.estoque_disponivel, 0, 0
+    FROM jsonb_to_recordset(p_itens) AS i(produto_id BIGINT, estoque_disponivel INTEGER)
+    JOIN public.produtos p ON p.id = i.produto_id AND p.user_id = p_user_id
+    ORDER BY i.produto_id                        -- ordem fixa de locks entre importações
+    ON CONFLICT (produto_id) DO UPDATE
+        SET estoque_disponivel = EXCLUDED.estoque_disponivel
+    RETURNING e.produto_id, e.estoque_disponivel;
+$$ LANGUAGE sql;
+
+GRANT EXECUTE ON FUNCTION public.importar_estoques_ml(UUID, JSONB) TO anon, authenticated, service_role;
@@ -0,0 +1,144 @@
+-- ============================================================================
+-- FILA PERSISTENTE DE NOTIFICAÇÕES DO MERCADO LIVRE
+-- Intelligestor Backend - webhooks /webhooks/ml/notifications
+-- ============================================================================
+--
+-- O endpoint de webhook apenas grava a notificação nesta tabela e responde 200.
+-- Um pool de workers (app/services/webhook_queue.py) consome a fila com
+-- claim_ml_webhook_jobs(), que usa FOR UPDATE SKIP LOCKED: várias instâncias
+-- do backend podem drenar a mesma fila sem processar o mesmo job duas vezes.
+--
+-- INSTRUÇÕES: cole no SQL Editor do Supabase e execute (idempotente)
+-- ============================================================================
+
+-- ============================================================================
+-- PARTE 1: TABELA
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS public.ml_webhook_queue (
+    id BIGSERIAL PRIMARY KEY,
+    topic TEXT NOT NULL,
+    resource TEXT NOT NULL,
+    ml_user_id TEXT,
+    payload JSONB NOT NULL DEFAULT '{}'::jsonb,
+    status TEXT NOT NULL DEFAULT 'pending',      -- pending | processing | failed
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    locked_at TIMESTAMPTZ,
+    last_error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Busca dos próximos jobs prontos
+CREATE INDEX IF NOT EXISTS idx_ml_webhook_queue_pending
+    ON public.ml_webhook_queue(available_at)
+    WHERE status = 'pending';
+
+-- Recuperação de jobs presos (worker morreu no meio)
+CREATE INDEX IF NOT EXISTS idx_ml_webhook_queue_processing
+    ON public.ml_webhook_queue(locked_at)
+    WHERE status = 'processing';
+
+ALTER TABLE public.ml_webhook_queue DISABLE ROW LEVEL SECURITY;
+
+-- Mesma função de setup_supabase_permissions.sql (recriada aqui caso não exista)
+CREATE OR REPLACE FUNCTION public.update_updated_at_column()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = NOW();
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS update_ml_webhook_queue_updated_at ON public.ml_webhook_queue;
+CREATE TRIGGER update_ml_webhook_queue_updated_at
+    BEFORE UPDATE ON public.ml_webhook_queue
+    FOR EACH ROW
+    EXECUTE FUNCTION public.update_updated_at_column();
+
+-- ============================================================================
+-- PARTE 2: CLAIM DE JOBS
+-- ============================================================================
+
+-- Reserva até p_limit jobs prontos (ou presos há mais de p_lock_timeout segundos)
+-- e já incrementa attempts. Retorna as linhas reservadas.
+-- p_topics / p_excluir_topics restringem os topics reservados: o pool reserva
+-- os topics processados em lote separado dos avulsos (limites diferentes).
+DROP FUNCTION IF EXISTS public.claim_ml_webhook_jobs(INTEGER, INTEGER);
+
+CREATE OR REPLACE FUNCTION public.claim_ml_webhook_jobs(
+    p_limit INTEGER DEFAULT 50,
+    p_lock_timeout INTEGER DEFAULT 300,
+    p_topics TEXT[] DEFAULT NULL,
+    p_excluir_topics TEXT[] DEFAULT NULL
+)
+RETURNS SETOF public.ml_webhook_queue AS $$
+BEGIN
+    RETURN QUERY
+    UPDATE public.ml_webhook_queue q
+    SET status = 'processing',
+        locked_at = NOW(),
+        attempts = q.attempts + 1
+    WHERE q.id IN (
+        SELECT id
+        FROM public.ml_webhook_queue
+        WHERE ((status = 'pending' AND available_at <= NOW())
+               OR (status = 'processing' AND locked_at < NOW() - make_interval(secs => p_lock_timeout)))
+          AND (p_topics IS NULL OR topic = ANY(p_topics))
+          AND (p_excluir_topics IS NULL OR topic <> ALL(p_excluir_topics))
+        ORDER BY available_at
+        LIMIT p_limit
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING q.*;
+END;
+$$ LANGUAGE plpgsql;
+
+GRANT ALL ON public.ml_webhook_queue TO anon, authenticated, service_role;
+GRANT USAGE, SELECT ON SEQUENCE public.ml_webhook_queue_id_seq TO anon, authenticated, service_role;
+GRANT EXECUTE ON FUNCTION public.claim_ml_webhook_jobs(INTEGER, INTEGER, TEXT[], TEXT[]) TO anon, authenticated, service_role;
+
+-- ============================================================================
+-- PARTE 3: DEDUPLICAÇÃO / COALESCÊNCIA
+-- ============================================================================
+--
+-- O ML reenvia o mesmo resource (campo attempts) e um anúncio pode mudar várias
+-- vezes por minuto. Só pode existir UM job pendente por (topic, resource):
+-- notificações repetidas atualizam o job existente e adiam o processamento
+-- (debounce) até no máximo p_max_wait segundos após a primeira.
+
+ALTER TABLE public.ml_webhook_queue
+    ADD COLUMN IF NOT EXISTS coalesced_count INTEGER NOT NULL DEFAULT 0;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_ml_webhook_queue_pending_key
+    ON public.ml_webhook_queue(topic, resource)
+    WHERE status = 'pending';
+
+CREATE OR REPLACE FUNCTION public.enqueue_ml_webhook(
+    p_topic TEXT,
+    p_resource TEXT,
+    p_ml_user_id TEXT,
+    p_payload JSONB,
+    p_debounce INTEGER DEFAULT 2,
+    p_max_wait INTEGER DEFAULT 30
+)
+RETURNS TABLE (job_id BIGINT, deduplicada BOOLEAN) AS $$
+BEGIN
+    RETURN QUERY
+    INSERT INTO public.ml_webhook_queue AS q (topic, resource, ml_user_id, payload, available_at)
+    VALUES (p_topic, p_resource, p_ml_user_id, p_payload, NOW() + make_interval(secs => p_debounce))
+    ON CONFLICT (topic, resource) WHERE status = 'pending'
+    DO UPDATE SET
+        payload = EXCLUDED.payload,
+        ml_user_id = COALESCE(EXCLUDED.ml_user_id, q.ml_user_id),
+        coalesced_count = q.coalesced_count + 1,
+        available_at = GREATEST(
+            q.available_at,
+            LEAST(EXCLUDED.available_at, q.created_at + make_interval(secs => p_max_wait))
+        )
+    RETURNING q.id, q.coalesced_count > 0;
+END;
+$$ LANGUAGE plpgsql;
+
+GRANT EXECUTE ON FUNCTION public.enqueue_ml_webhook(TEXT, TEXT, TEXT, JSONB, INTEGER, INTEGER) TO anon, authenticated, service_role;
@@ -7,3 +7,75 @@ import os
 
 # Adicionar o diretório raiz ao path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+class ConsultaFalsa:
+    """Query builder do supabase-py simulado: registra a cadeia de chamadas"""
+
+    def __init__(self, alvo, nome, params=None):
+        self.alvo = alvo          # "table" | "rpc"
+        self.nome = nome
+        self.params = params
+        self.operacoes = []
+
+    def __getattr__(self, metodo):
+        def registrar(*args, **kwargs):
+            self.operacoes.append((metodo, args, kwargs))
+            return self
+        return registrar
+
+    def args(self, metodo):
+        """Argumentos posicionais da primeira chamada a `metodo` (None se não houve)"""
+        for nome, args, _ in self.operacoes:
+            if nome == metodo:
+                return args
+        return None
+
+
+class RespostaFalsa:
+    def __init__(self, data):
+        self.data = data
+
+
+class SupabaseFalso:
+    """
+    Cliente Supabase simulado
+    `responder(consulta)` devolve o .data da consulta (ou levanta para simular erro)
+    """
+
+    def __init__(self):
+        self.consultas = []
+        self.responder = lambda consulta: []
+
+    def table(self, nome):
+        consulta = ConsultaFalsa("table", nome)
+        self.consultas.append(consulta)
+        return consulta
+
+    def rpc(self, nome, params=None):
+        consulta = ConsultaFalsa("rpc", nome, params)
+        self.consultas.append(consulta)
+        return consulta
+
+    def executadas(self, nome, metodo=None):
+        """Consultas à tabela/função `nome` (opcionalmente só as que chamaram `metodo`)"""
+        return [
+            c for c in self.consultas
+            if c.nome == nome and (metodo is None or c.args(metodo) is not None)
+        ]
+
+    def instalar(self, monkeypatch, *modulos):
+        """Troca run_query (e get_supabase_client, se existir) dos módulos pelo cliente falso"""
+        async def run_query(consulta):
+            return RespostaFalsa(self.responder(consulta))
+
+        for modulo in modulos:
+            monkeypatch.setattr(modulo, "run_query", run_query)
+            if hasattr(modulo, "get_supabase_client"):
+                monkeypatch.setattr(modulo, "get_supabase_client", lambda: self)
+        return self
+
+
+@pytest.fixture
+def supabase_falso():
+    return SupabaseFalso()
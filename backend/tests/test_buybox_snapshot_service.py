@@ -0,0 +1,165 @@
+"""
+Testes do histórico de BuyBox (captura, gravação em lotes, paginação e ciclo agendado)
+"""
+import asyncio
+
+import pytest
+
+from app.config.settings import settings
+from app.services import buybox_snapshot_service as snapshots
+from app.services.buybox_snapshot_service import BuyBoxSnapshotService, contar_mudancas, paginar
+
+
+class MLFalso:
+    """Substitui o MercadoLivreService usado pela captura"""
+
+    def __init__(self, itens, precos, concorrencias):
+        self.itens = itens
+        self.precos = precos
+        self.concorrencias = concorrencias
+        self.chamadas_competidores = []
+
+    async def buscar_catalog_items(self, ml_ids):
+        return [item for item in self.itens if item["ml_id"] in ml_ids]
+
+    async def buscar_price_to_win(self, item_id):
+        preco = self.precos[item_id]
+        if isinstance(preco, Exception):
+            raise preco
+        return preco
+
+    async def buscar_competidores_produto(self, produto):
+        self.chamadas_competidores.append(produto)
+        return self.concorrencias.get(produto)
+
+
+@pytest.fixture
+def db(monkeypatch, supabase_falso):
+    monkeypatch.setattr(settings, "BUYBOX_SNAPSHOT_INSERT_BATCH", 2)
+    monkeypatch.setattr(snapshots, "_metricas", {
+        "ciclos": 0, "usuarios": 0, "gravados": 0, "falhas": 0, "ultimo_ciclo": None
+    })
+    return supabase_falso.instalar(monkeypatch, snapshots)
+
+
+def _responder(anuncios):
+    """anuncios_ml devolve `anuncios`; a rpc de gravação devolve quantas linhas recebeu"""
+    def responder(consulta):
+        if consulta.nome == "anuncios_ml":
+            return [{"ml_id": ml_id} for ml_id in anuncios]
+        if consulta.nome == "registrar_buybox_snapshots":
+            return len(consulta.params["p_snapshots"])
+        return []
+    return responder
+
+
+def _service(db, ml):
+    service = BuyBoxSnapshotService(db, "user-1", http_client=object())
+    service.ml = ml
+    return service
+
+
+def _preco(status="winning", preco=100):
+    return {"has_catalog": True, "status": status, "current_price": preco, "price_to_win": preco - 1,
+            "visit_share": "maximum", "winner": {"item_id": "MLB9", "price": 99}}
+
+
+def test_capturar_monta_snapshots_e_grava_em_lotes(db):
+    db.responder = _responder(["MLB1", "MLB2", "MLB3"])
+    ml = MLFalso(
+        itens=[{"ml_id": f"MLB{i}", "catalog_product_id": "P1"} for i in (1, 2, 3)],
+        precos={"MLB1": _preco(), "MLB2": _preco("competing"), "MLB3": _preco()},
+        concorrencias={"P1": {"total_competitors": 4, "price_range": {"min_price": 95}}}
+    )
+
+    resumo = asyncio.run(_service(db, ml).capturar())
+
+    assert resumo == {"itens": 3, "gravados": 3, "falhas": 0}
+    assert ml.chamadas_competidores == ["P1"]  # uma vez por produto de catálogo
+    lotes = [c.params["p_snapshots"] for c in db.executadas("registrar_buybox_snapshots")]
+    assert [len(l) for l in lotes] == [2, 1]
+    assert lotes[0][0] == {
+        "ml_item_id": "MLB1", "catalog_product_id": "P1", "status": "winning", "preco": 100,
+        "price_to_win": 99, "visit_share": "maximum", "vencedor_item_id": "MLB9",
+        "preco_vencedor": 99, "menor_preco_concorrente": 95, "total_concorrentes": 4
+    }
+
+
+def test_capturar_conta_falhas_e_grava_sem_concorrencia_quando_ela_falha(db):
+    db.responder = _responder(["MLB1", "MLB2", "MLB3"])
+    ml = MLFalso(
+        itens=[
+            {"ml_id": "MLB1", "catalog_product_id": "P1"},
+            {"ml_id": "MLB2", "catalog_product_id": "P1"},
+            {"ml_id": "MLB3", "catalog_product_id": "P2"}
+        ],
+        precos={"MLB1": RuntimeError("ML fora"), "MLB2": {"has_catalog": False}, "MLB3": _preco()},
+        concorrencias={"P2": {"error": "indisponível"}}
+    )
+
+    resumo = asyncio.run(_service(db, ml).capturar())
+
+    assert resumo == {"itens": 3, "gravados": 1, "falhas": 2}
+    snapshot = db.executadas("registrar_buybox_snapshots")[0].params["p_snapshots"][0]
+    assert (snapshot["ml_item_id"], snapshot["total_concorrentes"]) == ("MLB3", None)
+
+
+def test_capturar_sem_itens_de_catalogo_nao_grava(db):
+    db.responder = _responder([])
+
+    resumo = asyncio.run(_service(db, MLFalso([], {}, {})).capturar())
+
+    assert resumo == {"itens": 0, "gravados": 0, "falhas": 0}
+    assert db.executadas("registrar_buybox_snapshots") == []
+
+
+def test_paginar_le_todas_as_paginas(db):
+    linhas = [{"ml_id": f"MLB{i}"} for i in range(5)]
+
+    def responder(consulta):
+        inicio, fim = consulta.args("range")
+        return linhas[inicio:fim + 1]
+
+    db.responder = responder
+
+    resultado = asyncio.run(paginar(lambda: db.table("anuncios_ml").select("ml_id"), tamanho=2))
+
+    assert resultado == linhas
+    assert [c.args("range") for c in db.consultas] == [(0, 1), (2, 3), (4, 5)]
+
+
+def test_contar_mudancas_ignora_observacoes_repetidas():
+    historico = [
+        {"status": "winning", "preco": 100, "price_to_win": 99},
+        {"status": "winning", "preco": 100, "price_to_win": 99},
+        {"status": "competing", "preco": 100, "price_to_win": 99},
+        {"status": "competing", "preco": 105, "price_to_win": 99}
+    ]
+
+    assert contar_mudancas(historico) == 2
+    assert contar_mudancas([]) == 0
+
+
+def test_ciclo_captura_cada_usuario_uma_vez_e_aplica_retencao(db, monkeypatch):
+    capturados = []
+
+    async def capturar(self):
+        capturados.append(self.user_id)
+        if self.user_id == "user-2":
+            raise RuntimeError("token revogado")
+        return {"itens": 2, "gravados": 2, "falhas": 0}
+
+    def responder(consulta):
+        if consulta.nome == "tokens_ml":
+            return [{"user_id": "user-1"}, {"user_id": "user-1"}, {"user_id": "user-2"}]
+        return []
+
+    monkeypatch.setattr(BuyBoxSnapshotService, "capturar", capturar)
+    db.responder = responder
+
+    asyncio.run(snapshots.capturar_todos_usuarios())
+
+    assert capturados == ["user-1", "user-2"]
+    assert db.executadas("limpar_buybox_snapshots")[0].params == {"p_dias": settings.BUYBOX_SNAPSHOT_RETENTION_DAYS}
+    stats = snapshots.get_buybox_snapshot_stats()
+    assert (stats["ciclos"], stats["usuarios"], stats["gravados"], stats["falhas"]) == (1, 2, 2, 1)
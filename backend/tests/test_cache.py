@@ -0,0 +1,187 @@
+"""
+Testes do cache em memória (TTLCache) e do cache assíncrono com single-flight (AsyncTTLCache)
+"""
+import asyncio
+
+import pytest
+
+from app.utils import cache as cache_module
+from app.utils.cache import AsyncTTLCache, TTLCache
+
+
+class Relogio:
+    """time.monotonic controlável (só para o TTLCache síncrono)"""
+
+    def __init__(self):
+        self.agora = 1000.0
+
+    def __call__(self):
+        return self.agora
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    relogio = Relogio()
+    monkeypatch.setattr(cache_module.time, "monotonic", relogio)
+    return relogio
+
+
+# ============ TTLCache ============
+
+def test_ttl_cache_expira(relogio):
+    cache = TTLCache(ttl=10)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+
+    relogio.agora += 10
+    assert cache.get("a") is None
+    assert "a" not in cache
+
+
+def test_ttl_cache_ttl_por_item(relogio):
+    cache = TTLCache(ttl=10)
+    cache.set("curto", 1, ttl=1)
+    cache.set("longo", 2)
+
+    relogio.agora += 5
+    assert cache.get("curto") is None
+    assert cache.get("longo") == 2
+
+
+def test_ttl_cache_descarta_menos_usado(relogio):
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")  # "b" passa a ser o menos usado
+    cache.set("c", 3)
+
+    assert "b" not in cache
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_ttl_cache_invalidate_e_clear(relogio):
+    cache = TTLCache()
+    cache.set("a", 1)
+    cache.set("b", None)
+    assert "b" in cache  # None guardado é diferente de ausente
+
+    cache.invalidate("a")
+    assert cache.get("a", "padrao") == "padrao"
+
+    cache.clear()
+    assert len(cache) == 0
+
+
+# ============ AsyncTTLCache ============
+
+def test_async_cache_chamadas_simultaneas_compartilham_carregamento():
+    chamadas = 0
+
+    async def carregar():
+        nonlocal chamadas
+        chamadas += 1
+        await asyncio.sleep(0.01)
+        return {"valor": chamadas}
+
+    async def cenario():
+        cache = AsyncTTLCache(ttl=60)
+        resultados = await asyncio.gather(*[cache.obter("k", carregar) for _ in range(5)])
+        return cache, resultados
+
+    cache, resultados = asyncio.run(cenario())
+    assert chamadas == 1
+    assert all(valor == {"valor": 1} and idade == 0.0 for valor, idade in resultados)
+    assert cache.metricas == {"hits": 0, "misses": 1, "coalescidas": 4}
+
+
+def test_async_cache_hit_informa_idade():
+    async def carregar():
+        return "v"
+
+    async def cenario():
+        cache = AsyncTTLCache(ttl=60)
+        await cache.obter("k", carregar)
+        await asyncio.sleep(0.02)
+        return await cache.obter("k", carregar), cache
+
+    (valor, idade), cache = asyncio.run(cenario())
+    assert valor == "v"
+    assert idade >= 0.02
+    assert cache.metricas["hits"] == 1
+
+
+def test_async_cache_recarrega_apos_ttl():
+    chamadas = 0
+
+    async def carregar():
+        nonlocal chamadas
+        chamadas += 1
+        return chamadas
+
+    async def cenario():
+        cache = AsyncTTLCache(ttl=0.02)
+        primeiro, _ = await cache.obter("k", carregar)
+        await asyncio.sleep(0.03)
+        segundo, _ = await cache.obter("k", carregar)
+        return primeiro, segundo
+
+    assert asyncio.run(cenario()) == (1, 2)
+
+
+def test_async_cache_nao_guarda_valor_rejeitado():
+    chamadas = 0
+
+    async def carregar():
+        nonlocal chamadas
+        chamadas += 1
+        return None
+
+    async def cenario():
+        cache = AsyncTTLCache(ttl=60)
+        for _ in range(2):
+            await cache.obter("k", carregar, cachear=lambda valor: valor is not None)
+
+    asyncio.run(cenario())
+    assert chamadas == 2
+
+
+def test_async_cache_erro_propaga_para_todos_e_nao_e_cacheado():
+    chamadas = 0
+
+    async def carregar():
+        nonlocal chamadas
+        chamadas += 1
+        await asyncio.sleep(0.01)
+        raise RuntimeError("ML fora")
+
+    async def cenario():
+        cache = AsyncTTLCache(ttl=60)
+        resultados = await asyncio.gather(
+            cache.obter("k", carregar), cache.obter("k", carregar), return_exceptions=True
+        )
+        with pytest.raises(RuntimeError):
+            await cache.obter("k", carregar)
+        return resultados, cache
+
+    resultados, cache = asyncio.run(cenario())
+    assert all(isinstance(r, RuntimeError) for r in resultados)
+    assert chamadas == 2  # uma pelos dois simultâneos, outra depois (erro não fica em cache)
+    assert cache.stats()["em_andamento"] == 0
+
+
+def test_async_cache_cancelar_um_chamador_nao_cancela_os_demais():
+    async def carregar():
+        await asyncio.sleep(0.02)
+        return "v"
+
+    async def cenario():
+        cache = AsyncTTLCache(ttl=60)
+        primeiro = asyncio.ensure_future(cache.obter("k", carregar))
+        segundo = asyncio.ensure_future(cache.obter("k", carregar))
+        await asyncio.sleep(0)
+        primeiro.cancel()
+        return await segundo
+
+    assert asyncio.run(cenario()) == ("v", 0.0)
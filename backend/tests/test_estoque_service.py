@@ -0,0 +1,160 @@
+"""
+Testes do EstoqueService (wrappers das funções transacionais de estoque no banco)
+"""
+from decimal import Decimal
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from postgrest.exceptions import APIError
+
+from app.models.schemas import TipoMovimentacao
+from app.routers import estoque
+from app.services import estoque_service
+from app.services.estoque_service import EstoqueService
+
+
+@pytest.fixture
+def db(monkeypatch, supabase_falso):
+    return supabase_falso.instalar(monkeypatch, estoque_service)
+
+
+def _service(db):
+    return EstoqueService(db, "user-1")
+
+
+def _estoque(atual=10, disponivel=8):
+    return {"id": 1, "estoque_atual": atual, "estoque_disponivel": disponivel, "estoque_minimo": 0}
+
+
+def _erro_da_funcao(mensagem):
+    """RAISE EXCEPTION de uma função plpgsql chega como APIError P0001"""
+    return APIError({"code": "P0001", "message": mensagem, "details": None, "hint": None})
+
+
+# ============ MOVIMENTAÇÃO ============
+
+def test_movimentar_estoque_chama_a_funcao_transacional(db):
+    db.responder = lambda consulta: [_estoque()]
+
+    estoque = asyncio.run(_service(db).movimentar_estoque(1, None, TipoMovimentacao.SAIDA, 2, "venda"))
+
+    params = db.executadas("movimentar_estoque")[0].params
+    assert (params["p_user_id"], params["p_tipo"], params["p_quantidade"]) == ("user-1", "saida", 2)
+    assert estoque.estoque_disponivel == 8
+
+
+def test_movimentar_estoque_erro_da_funcao_vira_value_error(db):
+    def responder(consulta):
+        raise _erro_da_funcao("Estoque insuficiente")
+
+    db.responder = responder
+
+    with pytest.raises(ValueError, match="Estoque insuficiente"):
+        asyncio.run(_service(db).movimentar_estoque(1, None, TipoMovimentacao.SAIDA, 99, "venda"))
+
+
+def test_movimentar_estoque_outros_erros_do_banco_propagam(db):
+    def responder(consulta):
+        raise APIError({"code": "57014", "message": "statement timeout", "details": None, "hint": None})
+
+    db.responder = responder
+
+    with pytest.raises(APIError):
+        asyncio.run(_service(db).movimentar_estoque(1, None, TipoMovimentacao.ENTRADA, 1, "compra"))
+
+
+# ============ LOTE ============
+
+def test_lote_vazio_nao_chama_o_banco(db):
+    assert asyncio.run(_service(db).movimentar_estoque_lote([])) == []
+    assert db.consultas == []
+
+
+def test_lote_envia_tudo_em_uma_chamada_e_mapeia_resultados(db):
+    db.responder = lambda consulta: [
+        {"indice": 0, "produto_id": 1, "sucesso": True, "erro": None, "estoque": _estoque()},
+        {"indice": 1, "produto_id": 2, "sucesso": False, "erro": "Produto não encontrado", "estoque": None}
+    ]
+    movimentacoes = [
+        {"produto_id": 1, "tipo": TipoMovimentacao.ENTRADA, "quantidade": 5, "custo_unitario": Decimal("9.90")},
+        {"produto_id": 2, "tipo": "saida", "quantidade": 1, "custo_unitario": None}
+    ]
+
+    resultados = asyncio.run(_service(db).movimentar_estoque_lote(movimentacoes, atomico=True))
+
+    chamadas = db.executadas("movimentar_estoque_lote")
+    assert len(chamadas) == 1
+    linhas = chamadas[0].params["p_movimentacoes"]
+    assert [(l["tipo"], l["custo_unitario"]) for l in linhas] == [("entrada", "9.90"), ("saida", None)]
+    assert chamadas[0].params["p_atomico"] is True
+    assert resultados[0]["estoque"].estoque_atual == 10
+    assert resultados[1]["estoque"] is None
+
+
+def test_endpoint_lote_resume_sucessos_e_falhas(db):
+    db.responder = lambda consulta: [
+        {"indice": 0, "produto_id": 1, "sucesso": True, "erro": None, "estoque": _estoque()},
+        {"indice": 1, "produto_id": 2, "sucesso": False, "erro": "Estoque insuficiente", "estoque": None}
+    ]
+    app = FastAPI()
+    app.include_router(estoque.router)
+    app.dependency_overrides[estoque.get_estoque_service] = lambda: _service(db)
+    client = TestClient(app)
+    mov = {"tipo": "saida", "quantidade": 1, "motivo": "venda"}
+
+    response = client.post("/estoque/movimentacao/lote", json={
+        "movimentacoes": [{**mov, "produto_id": 1}, {**mov, "produto_id": 2}]
+    })
+
+    assert response.status_code == 200
+    assert {k: response.json()[k] for k in ("total", "sucesso", "falhas")} == {"total": 2, "sucesso": 1, "falhas": 1}
+    assert client.post("/estoque/movimentacao/lote", json={"movimentacoes": []}).status_code == 422
+
+
+# ============ PEDIDOS DO ML ============
+
+def _pedido(status, itens=(("MLB1", 2),)):
+    return {
+        "id": 2000001,
+        "status": status,
+        "order_items": [{"item": {"id": ml_id, "seller_sku": "SKU"}, "quantity": q} for ml_id, q in itens]
+    }
+
+
+@pytest.mark.parametrize("status, estado", [
+    ("payment_required", "reservado"),
+    ("paid", "baixado"),
+    ("cancelled", "liberado")
+])
+def test_pedido_aplica_estado_do_status(db, status, estado):
+    asyncio.run(_service(db).aplicar_pedido_ml(_pedido(status)))
+
+    params = db.executadas("aplicar_pedido_ml_estoque")[0].params
+    assert params["p_estado"] == estado
+    assert params["p_order_id"] == "2000001"  # chave de idempotência do pedido
+    assert params["p_itens"] == [{"ml_item_id": "MLB1", "seller_sku": "SKU", "quantidade": 2}]
+
+
+def test_pedido_com_status_desconhecido_ou_sem_itens_nao_chama_o_banco(db):
+    service = _service(db)
+
+    assert asyncio.run(service.aplicar_pedido_ml(_pedido("shipped"))) == []
+    assert asyncio.run(service.aplicar_pedido_ml(_pedido("paid", itens=()))) == []
+    assert db.consultas == []
+
+
+def test_notificacao_repetida_envia_a_mesma_chamada(db):
+    """Idempotência fica no banco: o wrapper manda sempre o mesmo pedido/estado"""
+    respostas = iter([[{"produto_id": 1, "tipo": "saida", "quantidade": 2}], []])
+    db.responder = lambda consulta: next(respostas)
+    service = _service(db)
+
+    primeira = asyncio.run(service.aplicar_pedido_ml(_pedido("paid")))
+    repetida = asyncio.run(service.aplicar_pedido_ml(_pedido("paid")))
+
+    chamadas = [c.params for c in db.executadas("aplicar_pedido_ml_estoque")]
+    assert chamadas[0] == chamadas[1]
+    assert len(primeira) == 1
+    assert repetida == []
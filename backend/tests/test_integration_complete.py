@@ -12,7 +12,7 @@ from pathlib import Path
 import sys
 sys.path.append(str(Path(__file__).parent))
 
-from app.services.ml_official_api import MLOfficialAPI
+from app.services.ml_official_api import MLOfficialAPISync
 from app.routers.ml_real import router
 
 # Item de teste - Martelo de Borracha
@@ -25,7 +25,7 @@ class IntegrationTester:
     """
     
     def __init__(self):
-        self.ml_api = MLOfficialAPI()
+        self.ml_api = MLOfficialAPISync()
         self.results = {
             'timestamp': datetime.now().isoformat(),
             'test_item': TEST_ITEM_ID,
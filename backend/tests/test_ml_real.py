@@ -0,0 +1,147 @@
+"""
+Testes da análise oficial de BuyBox (ml_real) com a API do ML simulada
+Falhas do ML não podem virar dados de exemplo: a seção fica vazia e vai para partial_errors
+"""
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routers import ml_real
+from app.services.ml_buybox_cache import get_buybox_cache
+
+
+class MLFalso:
+    """Substitui o cache do MLOfficialAPI: cada _buscar_* devolve o dicionário configurado (None = falha)"""
+
+    def __init__(self, price_to_win=None, winners=None, competidores=None):
+        self.price_to_win = price_to_win or {}
+        self.winners = winners or {}
+        self.competidores = competidores or {}
+        self.chamadas = {"price_to_win": [], "winner": [], "competidores": []}
+
+    async def buscar_price_to_win(self, item_id):
+        self.chamadas["price_to_win"].append(item_id)
+        return self.price_to_win.get(item_id)
+
+    async def buscar_buybox_winner(self, product_id):
+        self.chamadas["winner"].append(product_id)
+        return self.winners.get(product_id)
+
+    async def buscar_competidores(self, product_id, params):
+        self.chamadas["competidores"].append(product_id)
+        return self.competidores.get(product_id)
+
+
+@pytest.fixture
+def ml(monkeypatch):
+    get_buybox_cache().clear()
+    falso = MLFalso()
+    api = ml_real.ml_official_api
+    monkeypatch.setattr(api, "_buscar_price_to_win", falso.buscar_price_to_win)
+    monkeypatch.setattr(api, "_buscar_buybox_winner", falso.buscar_buybox_winner)
+    monkeypatch.setattr(api, "_buscar_competidores", falso.buscar_competidores)
+    yield falso
+    get_buybox_cache().clear()
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(ml_real.router)
+    return TestClient(app)
+
+
+def _price_to_win(item_id, produto="MLB900"):
+    return {"item_id": item_id, "status": "competing", "catalog_product_id": produto, "boosts": []}
+
+
+def test_analise_registra_falha_de_produto_e_competidores_sem_fallback(ml, client):
+    ml.price_to_win = {"MLB1": _price_to_win("MLB1")}
+
+    data = client.get("/ml/buybox/analysis/MLB1").json()
+
+    assert data["product_context"] is None
+    assert data["competitors_summary"]["top_competitors"] == []
+    assert {e["section"] for e in data["partial_errors"]} == {"product_context", "competitors_summary"}
+
+
+def test_analise_completa_sem_partial_errors(ml, client):
+    ml.price_to_win = {"MLB1": _price_to_win("MLB1")}
+    ml.winners = {"MLB900": {"product_id": "MLB900", "winner": {"item_id": "MLB7"}}}
+    ml.competidores = {"MLB900": {"total_competitors": 1, "competitors": [{"item_id": "MLB7", "price": 10}]}}
+
+    data = client.get("/ml/buybox/analysis/MLB1").json()
+
+    assert data["partial_errors"] == []
+    assert data["product_context"]["winner"] == {"item_id": "MLB7"}
+    assert data["competitors_summary"]["total_competitors"] == 1
+
+
+def test_competidores_sem_price_to_win_ficam_sem_analise(ml, client):
+    ml.competidores = {"MLB900": {
+        "total_competitors": 2,
+        "competitors": [{"item_id": "MLB7", "price": 10}, {"item_id": "MLB8", "price": 11}]
+    }}
+    ml.price_to_win = {"MLB7": {**_price_to_win("MLB7"), "status": "winning"}}
+
+    data = client.get("/ml/competitors/official/MLB900").json()
+    analises = {c["item_id"]: c["buybox_analysis"] for c in data["competitors"]}
+
+    assert analises["MLB7"]["status"] == "winning"
+    assert analises["MLB8"] is None  # falhou no ML: sem análise inventada
+
+
+# ============ LOTE (NDJSON) ============
+
+def _linhas(response):
+    return [json.loads(linha) for linha in response.text.splitlines()]
+
+
+def test_lote_ndjson_deduplica_itens_e_produtos(ml, client):
+    ml.price_to_win = {
+        "MLB1": _price_to_win("MLB1", "MLB900"),
+        "MLB2": _price_to_win("MLB2", "MLB900"),
+        "MLB3": _price_to_win("MLB3", "MLB901")
+    }
+    ml.winners = {p: {"product_id": p, "winner": {}} for p in ("MLB900", "MLB901")}
+    ml.competidores = {p: {"total_competitors": 0, "competitors": []} for p in ("MLB900", "MLB901")}
+
+    response = client.post("/ml/buybox/analysis/batch", json={"item_ids": ["MLB1", "MLB2", "MLB3", "MLB1"]})
+    linhas = _linhas(response)
+
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert sorted(l["item_id"] for l in linhas if l["type"] == "analysis") == ["MLB1", "MLB2", "MLB3"]
+    assert linhas[-1]["type"] == "summary"
+    assert linhas[-1]["total_items"] == 3
+    assert linhas[-1]["catalog_products"] == 2
+    assert sorted(ml.chamadas["winner"]) == ["MLB900", "MLB901"]  # uma vez por produto
+
+
+def test_lote_price_to_win_com_falha_vira_linha_de_erro(ml, client):
+    ml.price_to_win = {"MLB1": _price_to_win("MLB1")}
+    ml.winners = {"MLB900": {"product_id": "MLB900", "winner": {}}}
+    ml.competidores = {"MLB900": {"total_competitors": 0, "competitors": []}}
+
+    linhas = _linhas(client.post("/ml/buybox/analysis/batch", json={"item_ids": ["MLB1", "MLB404"]}))
+    por_item = {l.get("item_id"): l for l in linhas}
+
+    assert por_item["MLB404"]["type"] == "error"
+    assert por_item["MLB1"]["type"] == "analysis"
+    assert linhas[-1]["errors"] == 1
+    assert linhas[-1]["catalog_products"] == 1  # item com falha não cria produto fictício
+
+
+def test_lote_falha_do_produto_vai_para_partial_errors_de_cada_item(ml, client):
+    ml.price_to_win = {"MLB1": _price_to_win("MLB1"), "MLB2": _price_to_win("MLB2")}
+
+    linhas = _linhas(client.post("/ml/buybox/analysis/batch", json={"item_ids": ["MLB1", "MLB2"]}))
+    analises = [l["analysis"] for l in linhas if l["type"] == "analysis"]
+
+    assert len(analises) == 2
+    for analise in analises:
+        assert analise["product_context"] is None
+        assert analise["competitors_summary"]["top_competitors"] == []
+        assert {e["section"] for e in analise["partial_errors"]} == {"product_context", "competitors_summary"}
+    assert linhas[-1]["partial"] == 2
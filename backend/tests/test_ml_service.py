@@ -0,0 +1,162 @@
+"""
+Testes da sincronização de anúncios (scan produtor/consumidor, upsert em lote e limpeza)
+"""
+import asyncio
+
+import httpx
+import pytest
+
+from app.config.settings import settings
+from app.services import ml_service
+from app.services.ml_service import MercadoLivreService
+
+
+class TokenManagerFalso:
+    async def get_access_token(self, user_id):
+        return "token"
+
+    async def get_token(self, user_id):
+        return {"user_id": user_id, "ml_user_id": 99}
+
+
+def _item(ml_id):
+    return {
+        "id": ml_id, "title": ml_id, "price": 10, "available_quantity": 1, "sold_quantity": 0,
+        "status": "active", "permalink": None, "category_id": "MLB1", "listing_type_id": "gold_pro"
+    }
+
+
+def _salvas(linhas):
+    """upsert do PostgREST devolve as linhas gravadas"""
+    linhas = linhas if isinstance(linhas, list) else [linhas]
+    return [{**l, "id": i, "created_at": "2026-01-01T00:00:00+00:00"} for i, l in enumerate(linhas, 1)]
+
+
+@pytest.fixture
+def ml(monkeypatch):
+    """Scan e multiget simulados: `ml.paginas` e `ml.itens` configuram o que o ML devolve"""
+    class ML:
+        paginas = []
+        itens = {}
+        erro_scan = None
+        lotes = []
+
+    async def iterar_falso(http, token, ml_user_id):
+        total = sum(len(p) for p in ML.paginas)
+        for pagina in ML.paginas:
+            yield pagina, total
+        if ML.erro_scan:
+            raise ML.erro_scan
+
+    async def lote_falso(http, token, ids, atributos):
+        ML.lotes.append(list(ids))
+        await asyncio.sleep(0)
+        return {i: ML.itens[i] for i in ids if i in ML.itens}
+
+    monkeypatch.setattr(ml_service, "iterar_ids_anuncios", iterar_falso)
+    monkeypatch.setattr(ml_service, "buscar_lote_itens", lote_falso)
+    monkeypatch.setattr(ml_service, "get_ml_token_manager", lambda: TokenManagerFalso())
+    return ML
+
+
+@pytest.fixture
+def db(monkeypatch, supabase_falso):
+    def responder(consulta):
+        upsert = consulta.args("upsert")
+        return _salvas(upsert[0]) if upsert else []
+
+    supabase_falso.responder = responder
+    return supabase_falso.instalar(monkeypatch, ml_service)
+
+
+def _sincronizar(db, **kwargs):
+    service = MercadoLivreService(db, "user-1", http_client=object())
+    return asyncio.run(service.sincronizar_anuncios(**kwargs))
+
+
+def test_sincroniza_todas_as_paginas_em_lotes_do_multiget(db, ml, monkeypatch):
+    monkeypatch.setattr(settings, "ML_SYNC_UPSERT_BATCH", 25)
+    ids = [f"MLB{i}" for i in range(50)]
+    ml.paginas = [ids[:30], ids[30:]]
+    ml.itens = {i: _item(i) for i in ids}
+    progresso = []
+
+    anuncios = _sincronizar(db, concorrencia=3, on_progress=progresso.append)
+
+    assert sorted(a.ml_id for a in anuncios) == sorted(ids)
+    assert all(len(lote) <= 20 for lote in ml.lotes)
+    assert sorted(sum(ml.lotes, [])) == sorted(ids)
+    assert len(progresso) == 50 and progresso[-1]["concluidos"] == 50
+    upserts = db.executadas("anuncios_ml", "upsert")
+    assert 2 <= len(upserts) < 50  # em lotes, não um por anúncio
+
+
+def test_item_ausente_no_multiget_e_reportado_como_erro(db, ml):
+    ml.paginas = [["MLB1", "MLB2"]]
+    ml.itens = {"MLB1": _item("MLB1")}
+    progresso = []
+
+    anuncios = _sincronizar(db, on_progress=progresso.append)
+
+    assert [a.ml_id for a in anuncios] == ["MLB1"]
+    erros = {p["ml_id"]: p["erro"] for p in progresso if not p["sucesso"]}
+    assert erros == {"MLB2": "Anúncio não retornado pelo ML"}
+
+
+def test_upsert_em_lote_com_erro_salva_linha_a_linha(db, ml):
+    ml.paginas = [["MLB1", "MLB2", "MLB3"]]
+    ml.itens = {i: _item(i) for i in ("MLB1", "MLB2", "MLB3")}
+
+    def responder(consulta):
+        upsert = consulta.args("upsert")
+        if not upsert:
+            return []
+        if isinstance(upsert[0], list) or upsert[0]["ml_id"] == "MLB2":
+            raise RuntimeError("violates check constraint")
+        return _salvas(upsert[0])
+
+    db.responder = responder
+    progresso = []
+
+    anuncios = _sincronizar(db, on_progress=progresso.append)
+
+    assert sorted(a.ml_id for a in anuncios) == ["MLB1", "MLB3"]
+    assert [p["ml_id"] for p in progresso if not p["sucesso"]] == ["MLB2"]
+
+
+def test_scan_completo_remove_anuncios_obsoletos(db, ml):
+    ml.paginas = [["MLB1"]]
+    ml.itens = {"MLB1": _item("MLB1")}
+
+    def responder(consulta):
+        upsert = consulta.args("upsert")
+        if upsert:
+            return _salvas(upsert[0])
+        if consulta.args("select"):
+            return [{"ml_id": "MLB1"}, {"ml_id": "MLB_VELHO"}]
+        return []
+
+    db.responder = responder
+
+    _sincronizar(db)
+
+    remocao = db.executadas("anuncios_ml", "delete")
+    assert [c.args("in_") for c in remocao] == [("ml_id", ["MLB_VELHO"])]
+
+
+def test_scan_interrompido_nao_remove_nada(db, ml):
+    ml.paginas = [["MLB1"]]
+    ml.itens = {"MLB1": _item("MLB1")}
+    ml.erro_scan = httpx.ConnectError("falhou")
+
+    anuncios = _sincronizar(db)
+
+    assert [a.ml_id for a in anuncios] == ["MLB1"]
+    assert db.executadas("anuncios_ml", "delete") == []
+
+
+def test_scan_que_falha_antes_de_qualquer_pagina_levanta(db, ml):
+    ml.erro_scan = httpx.ConnectError("falhou")
+
+    with pytest.raises(httpx.ConnectError):
+        _sincronizar(db)
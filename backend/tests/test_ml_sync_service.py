@@ -0,0 +1,124 @@
+"""
+Testes do envio de estoque ao ML (PUTs em paralelo e filtro do que mudou)
+"""
+import asyncio
+
+import httpx
+
+from app.config.settings import settings
+from app.services import ml_sync_service
+from app.services.ml_sync_service import MLSyncService
+
+
+def _service():
+    return MLSyncService(supabase_client=None, user_id="user-1", http_client=object())
+
+
+def _envio(ml_id, atual, nova):
+    return {"ml_id": ml_id, "produto_id": 1, "available_quantity": atual, "quantidade_nova": nova}
+
+
+def test_filtrar_alterados_ignora_quantidade_igual_ao_cache_local():
+    envios = [_envio("MLB1", 5, 5), _envio("MLB2", 5, 7)]
+
+    pendentes, ignorados, corrigidos = asyncio.run(_service()._filtrar_alterados("token", envios, False))
+
+    assert [e["ml_id"] for e in pendentes] == ["MLB2"]
+    assert ignorados == [{
+        "ml_id": "MLB1", "produto_id": 1, "sucesso": True, "ignorado": True, "quantidade_nova": 5
+    }]
+    assert corrigidos == []
+
+
+def test_filtrar_alterados_com_verificacao_usa_quantidade_do_ml(monkeypatch):
+    async def multiget_falso(http, token, ids, atributos):
+        return {"MLB1": {"available_quantity": 5}, "MLB2": {"available_quantity": 7}}
+
+    monkeypatch.setattr(ml_sync_service, "buscar_itens_multiget", multiget_falso)
+
+    # MLB1: cache local desatualizado (3) mas o ML já tem a quantidade nova (5) -> ignorado + correção
+    # MLB2: cache local diz 7 = nova, mas o ML também tem 7 -> ignorado sem correção
+    # MLB3: não veio do multiget -> decide pelo cache local
+    envios = [_envio("MLB1", 3, 5), _envio("MLB2", 7, 7), _envio("MLB3", 1, 2)]
+
+    pendentes, ignorados, corrigidos = asyncio.run(_service()._filtrar_alterados("token", envios, True))
+
+    assert [e["ml_id"] for e in pendentes] == ["MLB3"]
+    assert [i["ml_id"] for i in ignorados] == ["MLB1", "MLB2"]
+    assert corrigidos == [{"ml_id": "MLB1", "available_quantity": 5}]
+
+
+def test_filtrar_alterados_descarta_correcao_de_anuncio_que_sera_enviado(monkeypatch):
+    async def multiget_falso(http, token, ids, atributos):
+        return {"MLB1": {"available_quantity": 4}}
+
+    monkeypatch.setattr(ml_sync_service, "buscar_itens_multiget", multiget_falso)
+
+    pendentes, ignorados, corrigidos = asyncio.run(
+        _service()._filtrar_alterados("token", [_envio("MLB1", 3, 9)], True)
+    )
+
+    assert [e["available_quantity"] for e in pendentes] == [4]
+    assert ignorados == []
+    assert corrigidos == []  # o próprio envio grava a quantidade nova
+
+
+# ============ ENVIO EM PARALELO ============
+
+def _ml_put(status_por_item=None):
+    """Cliente com PUT /items simulado; registra a concorrência máxima observada"""
+    estado = {"ativos": 0, "maximo": 0, "puts": []}
+
+    async def handler(request):
+        estado["ativos"] += 1
+        estado["maximo"] = max(estado["maximo"], estado["ativos"])
+        await asyncio.sleep(0.01)
+        estado["ativos"] -= 1
+        ml_id = request.url.path.rsplit("/", 1)[-1]
+        estado["puts"].append(ml_id)
+        return httpx.Response((status_por_item or {}).get(ml_id, 200), json={})
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler)), estado
+
+
+def test_enviar_quantidades_respeita_concorrencia_e_grava_em_um_update(monkeypatch, supabase_falso):
+    monkeypatch.setattr(settings, "ML_SYNC_CONCURRENCY", 3)
+    db = supabase_falso.instalar(monkeypatch, ml_sync_service)
+    http, estado = _ml_put()
+    service = MLSyncService(db, "user-1", http_client=http)
+    envios = [_envio(f"MLB{i}", 0, i + 1) for i in range(10)]
+
+    resultados = asyncio.run(service._enviar_quantidades("token", envios))
+
+    assert len(estado["puts"]) == 10
+    assert 1 < estado["maximo"] <= 3
+    assert all(r["sucesso"] for r in resultados)
+    gravacoes = db.executadas("atualizar_quantidades_anuncios")
+    assert len(gravacoes) == 1
+    assert len(gravacoes[0].params["p_itens"]) == 10
+
+
+def test_enviar_quantidades_nao_grava_localmente_o_que_falhou_no_ml(monkeypatch, supabase_falso):
+    db = supabase_falso.instalar(monkeypatch, ml_sync_service)
+    http, _ = _ml_put({"MLB2": 400})
+    service = MLSyncService(db, "user-1", http_client=http)
+
+    resultados = asyncio.run(service._enviar_quantidades("token", [_envio("MLB1", 0, 1), _envio("MLB2", 0, 1)]))
+
+    assert {r["ml_id"]: r["sucesso"] for r in resultados} == {"MLB1": True, "MLB2": False}
+    itens = db.executadas("atualizar_quantidades_anuncios")[0].params["p_itens"]
+    assert itens == [{"ml_id": "MLB1", "available_quantity": 1}]
+
+
+def test_falha_ao_gravar_localmente_nao_derruba_o_envio(monkeypatch, supabase_falso):
+    def responder(consulta):
+        raise RuntimeError("banco fora")
+
+    db = supabase_falso.instalar(monkeypatch, ml_sync_service)
+    db.responder = responder
+    http, _ = _ml_put()
+    service = MLSyncService(db, "user-1", http_client=http)
+
+    resultados = asyncio.run(service._enviar_quantidades("token", [_envio("MLB1", 0, 1)]))
+
+    assert resultados[0]["sucesso"] is True  # o ML já foi atualizado
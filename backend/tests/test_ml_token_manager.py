@@ -0,0 +1,118 @@
+"""
+Testes do gerenciador de tokens ML (cache com TTL, renovação antecipada e single-flight)
+"""
+from datetime import datetime, timedelta, timezone
+import asyncio
+
+import httpx
+import pytest
+
+from app.services import ml_token_manager
+from app.services.ml_token_manager import MLTokenManager
+from app.utils import cache as cache_module
+
+
+def _linha(expira_em_segundos, access_token="velho"):
+    return {
+        "user_id": "user-1",
+        "ml_user_id": 99,
+        "access_token": access_token,
+        "refresh_token": "refresh-1",
+        "expires_at": (datetime.now(timezone.utc) + timedelta(seconds=expira_em_segundos)).isoformat()
+    }
+
+
+@pytest.fixture
+def db(monkeypatch, supabase_falso):
+    return supabase_falso.instalar(monkeypatch, ml_token_manager)
+
+
+def _manager(db, status=200):
+    """Manager com o endpoint OAuth do ML simulado (conta os refresh feitos)"""
+    refreshes = []
+
+    async def handler(request):
+        refreshes.append(request)
+        await asyncio.sleep(0.01)
+        return httpx.Response(status, json={"access_token": "novo", "refresh_token": "refresh-2", "expires_in": 21600})
+
+    http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return MLTokenManager(supabase_client=db, http_client=http, margem_refresh=300), refreshes
+
+
+def test_token_valido_vem_do_cache(db):
+    db.responder = lambda consulta: [_linha(3600)]
+    manager, refreshes = _manager(db)
+
+    async def cenario():
+        return [await manager.get_access_token("user-1") for _ in range(3)]
+
+    assert asyncio.run(cenario()) == ["velho"] * 3
+    assert len(db.executadas("tokens_ml")) == 1
+    assert refreshes == []
+
+
+def test_renovacoes_simultaneas_fazem_um_unico_refresh(db):
+    db.responder = lambda consulta: [_linha(60)]  # dentro da margem de 300 s
+    manager, refreshes = _manager(db)
+
+    async def cenario():
+        return await asyncio.gather(*[manager.get_access_token("user-1") for _ in range(5)])
+
+    assert asyncio.run(cenario()) == ["novo"] * 5
+    assert len(refreshes) == 1  # refresh_token do ML é de uso único
+    assert len(db.executadas("tokens_ml", "update")) == 1
+
+
+def test_renovar_le_a_linha_mais_recente_como_carregar(db):
+    db.responder = lambda consulta: [_linha(60)]
+    manager, _ = _manager(db)
+
+    asyncio.run(manager.get_token("user-1"))
+
+    carregar, renovar = db.executadas("tokens_ml", "select")
+    assert renovar.args("order") == carregar.args("order") == ("created_at",)
+    assert renovar.args("limit") == carregar.args("limit") == (1,)
+    assert renovar.args("maybe_single") is None
+
+
+def test_falha_no_refresh_usa_token_atual_ate_expirar(db):
+    db.responder = lambda consulta: [_linha(60)]
+    manager, _ = _manager(db, status=400)
+
+    assert asyncio.run(manager.get_access_token("user-1")) == "velho"
+
+
+def test_token_expirado_sem_refresh_retorna_none(db):
+    db.responder = lambda consulta: [_linha(-60)]
+    manager, _ = _manager(db, status=400)
+
+    assert asyncio.run(manager.get_token("user-1")) is None
+
+
+def test_cache_expira_e_rele_do_banco(db, monkeypatch):
+    agora = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: agora[0])
+    monkeypatch.setattr(ml_token_manager.settings, "ML_TOKEN_CACHE_TTL", 60)
+    db.responder = lambda consulta: [_linha(3600)]
+    manager, _ = _manager(db)
+
+    asyncio.run(manager.get_token_por_ml_user(99))
+    db.responder = lambda consulta: [_linha(3600, access_token="renovado_em_outra_instancia")]
+
+    assert asyncio.run(manager.get_access_token("user-1")) == "velho"
+
+    agora[0] += 60
+    assert asyncio.run(manager.get_access_token("user-1")) == "renovado_em_outra_instancia"
+    assert len(db.executadas("tokens_ml")) == 2
+
+
+def test_invalidar_por_ml_user_id(db):
+    db.responder = lambda consulta: [_linha(3600)]
+    manager, _ = _manager(db)
+    asyncio.run(manager.get_token("user-1"))
+
+    manager.invalidar(ml_user_id=99)
+    asyncio.run(manager.get_token("user-1"))
+
+    assert len(db.executadas("tokens_ml")) == 2
@@ -0,0 +1,157 @@
+"""
+Testes do rate limit da API do ML (token bucket, Retry-After e retry do transport)
+"""
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.config.settings import settings
+from app.services.ml_rate_limit import MLRateLimitTransport, chave_vendedor, ler_retry_after
+from app.utils.rate_limit import TokenBucket
+
+
+@pytest.fixture
+def retry_rapido(monkeypatch):
+    """Backoff de milissegundos e cotas altas para os testes não esperarem"""
+    monkeypatch.setattr(settings, "ML_RETRY_MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(settings, "ML_RETRY_BASE_SECONDS", 0.001)
+    monkeypatch.setattr(settings, "ML_RETRY_MAX_SECONDS", 0.01)
+    monkeypatch.setattr(settings, "ML_SELLER_RATE_LIMIT_PER_SECOND", 1000)
+    monkeypatch.setattr(settings, "ML_SELLER_RATE_LIMIT_BURST", 1000)
+
+
+def _transport(respostas):
+    """MLRateLimitTransport sobre um MockTransport que devolve `respostas` em ordem"""
+    chamadas = []
+
+    def handler(request):
+        chamadas.append(request)
+        resposta = respostas[min(len(chamadas), len(respostas)) - 1]
+        if isinstance(resposta, Exception):
+            raise resposta
+        return resposta
+
+    transport = MLRateLimitTransport(httpx.MockTransport(handler), TokenBucket(taxa=1000, capacidade=1000))
+    return transport, chamadas
+
+
+async def _enviar(transport, metodo="GET"):
+    async with httpx.AsyncClient(transport=transport) as client:
+        return await client.request(metodo, "https://api.mercadolibre.com/items/MLB1")
+
+
+# ============ TOKEN BUCKET ============
+
+def test_token_bucket_libera_rajada_e_depois_espera_reposicao():
+    async def cenario():
+        balde = TokenBucket(taxa=50, capacidade=2)
+        inicio = time.monotonic()
+        await balde.adquirir()
+        await balde.adquirir()
+        rajada = time.monotonic() - inicio
+        await balde.adquirir()
+        return rajada, time.monotonic() - inicio
+
+    rajada, total = asyncio.run(cenario())
+    assert rajada < 0.01
+    assert total >= 0.015  # terceira ficha só após ~1/50 s
+
+
+def test_token_bucket_pausar_segura_proxima_ficha():
+    async def cenario():
+        balde = TokenBucket(taxa=100, capacidade=10)
+        balde.pausar(0.05)
+        inicio = time.monotonic()
+        await balde.adquirir()
+        return time.monotonic() - inicio
+
+    espera = asyncio.run(cenario())
+    assert 0.04 <= espera < 0.2
+
+
+def test_token_bucket_capacidade_padrao_igual_a_taxa():
+    assert TokenBucket(taxa=5).capacidade == 5
+
+
+# ============ RETRY-AFTER / CHAVE DO VENDEDOR ============
+
+def test_ler_retry_after_segundos(monkeypatch):
+    monkeypatch.setattr(settings, "ML_RETRY_MAX_SECONDS", 30)
+    assert ler_retry_after(httpx.Response(429, headers={"Retry-After": "2"})) == 2.0
+
+
+def test_ler_retry_after_limitado_ao_maximo(monkeypatch):
+    monkeypatch.setattr(settings, "ML_RETRY_MAX_SECONDS", 30)
+    assert ler_retry_after(httpx.Response(429, headers={"Retry-After": "600"})) == 30
+    assert ler_retry_after(httpx.Response(429, headers={"Retry-After": "-5"})) == 0.0
+
+
+def test_ler_retry_after_data_http(monkeypatch):
+    monkeypatch.setattr(settings, "ML_RETRY_MAX_SECONDS", 30)
+    data = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=10), usegmt=True)
+    espera = ler_retry_after(httpx.Response(429, headers={"Retry-After": data}))
+    assert 8 <= espera <= 10
+
+
+def test_ler_retry_after_ausente_ou_invalido():
+    assert ler_retry_after(httpx.Response(429)) is None
+    assert ler_retry_after(httpx.Response(429, headers={"Retry-After": "amanha"})) is None
+
+
+def test_chave_vendedor_usa_sufixo_do_token():
+    request = httpx.Request("GET", "https://x", headers={"Authorization": "Bearer APP_USR-123-456-789"})
+    assert chave_vendedor(request) == "789"
+    assert chave_vendedor(httpx.Request("GET", "https://x")) is None
+
+
+# ============ RETRY DO TRANSPORT ============
+
+def test_get_repete_apos_5xx(retry_rapido):
+    transport, chamadas = _transport([httpx.Response(503), httpx.Response(200)])
+    response = asyncio.run(_enviar(transport))
+    assert response.status_code == 200
+    assert len(chamadas) == 2
+
+
+def test_post_nao_repete_apos_5xx(retry_rapido):
+    transport, chamadas = _transport([httpx.Response(503), httpx.Response(200)])
+    response = asyncio.run(_enviar(transport, "POST"))
+    assert response.status_code == 503
+    assert len(chamadas) == 1
+
+
+def test_429_repete_qualquer_metodo(retry_rapido):
+    transport, chamadas = _transport([httpx.Response(429, headers={"Retry-After": "0"}), httpx.Response(201)])
+    response = asyncio.run(_enviar(transport, "POST"))
+    assert response.status_code == 201
+    assert len(chamadas) == 2
+
+
+def test_devolve_ultima_resposta_apos_esgotar_tentativas(retry_rapido):
+    transport, chamadas = _transport([httpx.Response(502)])
+    response = asyncio.run(_enviar(transport))
+    assert response.status_code == 502
+    assert len(chamadas) == settings.ML_RETRY_MAX_ATTEMPTS
+
+
+def test_erro_de_rede_so_repete_em_metodo_idempotente(retry_rapido):
+    erro = httpx.ConnectError("falhou")
+
+    transport, chamadas = _transport([erro, httpx.Response(200)])
+    assert asyncio.run(_enviar(transport)).status_code == 200
+    assert len(chamadas) == 2
+
+    transport, chamadas = _transport([erro, httpx.Response(200)])
+    with pytest.raises(httpx.ConnectError):
+        asyncio.run(_enviar(transport, "POST"))
+    assert len(chamadas) == 1
+
+
+def test_4xx_nao_e_repetido(retry_rapido):
+    transport, chamadas = _transport([httpx.Response(404)])
+    assert asyncio.run(_enviar(transport)).status_code == 404
+    assert len(chamadas) == 1
@@ -0,0 +1,175 @@
+"""
+Testes da fila persistente de webhooks (intake com deduplicação, retry com backoff, lotes de items)
+"""
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+from app.config.settings import settings
+from app.services import webhook_queue
+from app.services.webhook_queue import WebhookWorkerPool, calcular_backoff
+
+
+@pytest.fixture
+def db(monkeypatch, supabase_falso):
+    monkeypatch.setattr(webhook_queue, "_estatisticas", {"recebidas": 0, "enfileiradas": 0, "deduplicadas": 0})
+    monkeypatch.setattr(webhook_queue, "_pool", None)
+    monkeypatch.setattr(settings, "WEBHOOK_MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(settings, "WEBHOOK_RETRY_BASE_SECONDS", 10)
+    monkeypatch.setattr(settings, "WEBHOOK_RETRY_MAX_SECONDS", 60)
+    return supabase_falso.instalar(monkeypatch, webhook_queue)
+
+
+def _pool(db, **kwargs):
+    async def processador(payload):
+        pass
+    return WebhookWorkerPool(processador, workers=2, supabase_client=db, **kwargs)
+
+
+def _job(job_id, attempts=1, topic="orders_v2"):
+    return {"id": job_id, "topic": topic, "ml_user_id": "99", "attempts": attempts, "payload": {}}
+
+
+# ============ INTAKE ============
+
+def test_enfileirar_conta_deduplicadas(db):
+    respostas = iter([[{"job_id": 1, "deduplicada": False}], [{"job_id": 1, "deduplicada": True}]])
+    db.responder = lambda consulta: next(respostas)
+
+    notificacao = {"topic": "items", "resource": "/items/MLB1", "user_id": 99}
+    asyncio.run(webhook_queue.enfileirar_notificacao(notificacao))
+    job = asyncio.run(webhook_queue.enfileirar_notificacao(notificacao))
+
+    assert job["deduplicada"] is True
+    assert db.consultas[0].params["p_ml_user_id"] == "99"
+    assert webhook_queue.get_webhook_stats()["intake"] == {"recebidas": 2, "enfileiradas": 1, "deduplicadas": 1}
+
+
+# ============ RETRY / BACKOFF ============
+
+def test_backoff_exponencial_limitado(db, monkeypatch):
+    monkeypatch.setattr(webhook_queue.random, "uniform", lambda a, b: b)
+
+    assert [calcular_backoff(t) for t in (1, 2, 3, 4, 5)] == [10, 20, 40, 60, 60]
+
+
+def test_backoff_com_jitter_fica_entre_metade_e_o_total(db):
+    for _ in range(20):
+        assert 20 <= calcular_backoff(3) <= 40
+
+
+def test_falha_reagenda_com_backoff(db, monkeypatch):
+    monkeypatch.setattr(webhook_queue.random, "uniform", lambda a, b: b)
+    pool = _pool(db)
+    antes = datetime.now(timezone.utc)
+
+    asyncio.run(pool._registrar_falha(_job(1, attempts=2), RuntimeError("ML fora")))
+
+    atualizacao = db.executadas("ml_webhook_queue", "update")[0].args("update")[0]
+    disponivel = datetime.fromisoformat(atualizacao["available_at"])
+    assert atualizacao["status"] == "pending"
+    assert atualizacao["locked_at"] is None
+    assert atualizacao["last_error"] == "ML fora"
+    assert 19 <= (disponivel - antes).total_seconds() <= 21
+    assert pool.metricas["reagendados"] == 1
+
+
+def test_falha_na_ultima_tentativa_marca_failed(db):
+    pool = _pool(db)
+
+    asyncio.run(pool._registrar_falha(_job(1, attempts=3), RuntimeError("ML fora")))
+
+    atualizacao = db.executadas("ml_webhook_queue", "update")[0].args("update")[0]
+    assert atualizacao["status"] == "failed"
+    assert "available_at" not in atualizacao
+    assert pool.metricas["descartados"] == 1
+
+
+def test_reagendar_com_notificacao_nova_pendente_remove_o_retry(db):
+    def responder(consulta):
+        if consulta.args("update") is not None:
+            raise RuntimeError('duplicate key value violates unique constraint (23505)')
+        return []
+
+    db.responder = responder
+    pool = _pool(db)
+
+    asyncio.run(pool._registrar_falha(_job(1), RuntimeError("ML fora")))
+
+    assert len(db.executadas("ml_webhook_queue", "delete")) == 1
+    assert pool.metricas["deduplicados"] == 1
+
+
+def test_job_com_sucesso_sai_da_fila(db):
+    pool = _pool(db)
+
+    asyncio.run(pool._processar_job(_job(7)))
+
+    remocao = db.executadas("ml_webhook_queue", "delete")[0]
+    assert remocao.args("in_") == ("id", [7])
+    assert pool.metricas["processados"] == 1
+
+
+# ============ LOTES (items) ============
+
+def test_agrupar_separa_avulsos_e_lotes_por_vendedor(db, monkeypatch):
+    monkeypatch.setattr(settings, "WEBHOOK_BATCH_SIZE", 2)
+    pool = _pool(db, processadores_lote={"items": None})
+    jobs = [
+        _job(1), _job(2, topic="items"), _job(3, topic="items"), _job(4, topic="items"),
+        {**_job(5, topic="items"), "ml_user_id": "100"}
+    ]
+
+    unidades = pool._agrupar(jobs)
+
+    assert unidades[0] == jobs[0]
+    assert [[j["id"] for j in u] for u in unidades[1:]] == [[2, 3], [4], [5]]
+
+
+def test_despachante_so_reserva_a_mais_para_topics_em_lote(db, monkeypatch):
+    monkeypatch.setattr(settings, "WEBHOOK_BATCH_SIZE", 20)
+    monkeypatch.setattr(settings, "WEBHOOK_POLL_INTERVAL", 60)
+    db.responder = lambda consulta: [_job(1)] if consulta.params["p_excluir_topics"] else []
+    pool = _pool(db, processadores_lote={"items": None})
+
+    async def cenario():
+        pool._fila = asyncio.Queue()
+        pool._acordar = asyncio.Event()
+        tarefa = asyncio.create_task(pool._despachante())
+        await asyncio.sleep(0.01)
+        tarefa.cancel()
+        await asyncio.gather(tarefa, return_exceptions=True)
+
+    asyncio.run(cenario())
+
+    avulsos, lotes = [c.params for c in db.executadas("claim_ml_webhook_jobs")]
+    assert (avulsos["p_limit"], avulsos["p_excluir_topics"], avulsos["p_topics"]) == (2, ["items"], None)
+    assert (lotes["p_limit"], lotes["p_topics"]) == (20, ["items"])  # 1 worker livre x 1 lote
+    assert pool._em_andamento == 1
+
+
+def test_lote_com_falha_parcial_so_reagenda_os_jobs_que_falharam(db):
+    async def processar_items(jobs):
+        return {2: ValueError("Anúncio MLB2 não retornado pelo ML")}
+
+    pool = _pool(db, processadores_lote={"items": processar_items})
+
+    asyncio.run(pool._processar_lote([_job(1, topic="items"), _job(2, topic="items")]))
+
+    assert db.executadas("ml_webhook_queue", "update")[0].args("eq") == ("id", 2)
+    assert db.executadas("ml_webhook_queue", "delete")[0].args("in_") == ("id", [1])
+    assert pool.metricas["processados"] == 1
+    assert pool.metricas["reagendados"] == 1
+
+
+def test_lote_que_levanta_reagenda_todos(db):
+    async def processar_items(jobs):
+        raise RuntimeError("ML fora")
+
+    pool = _pool(db, processadores_lote={"items": processar_items})
+
+    asyncio.run(pool._processar_lote([_job(1, topic="items"), _job(2, topic="items")]))
+
+    assert len(db.executadas("ml_webhook_queue", "update")) == 2
+    assert db.executadas("ml_webhook_queue", "delete") == []
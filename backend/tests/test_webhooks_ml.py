@@ -0,0 +1,107 @@
+"""
+Testes do processamento em lote das notificações de items (workers da fila de webhooks)
+"""
+import asyncio
+
+import pytest
+
+from app.routers import webhooks_ml
+
+
+class TokenManagerFalso:
+    def __init__(self, token):
+        self.token = token
+
+    async def get_token_por_ml_user(self, ml_user_id):
+        return self.token
+
+
+def _job(job_id, ml_id, attempts=1):
+    return {
+        "id": job_id,
+        "ml_user_id": 99,
+        "resource": f"/items/{ml_id}",
+        "attempts": attempts,
+        "payload": {"resource": f"/items/{ml_id}"}
+    }
+
+
+@pytest.fixture
+def db(monkeypatch, supabase_falso):
+    return supabase_falso.instalar(monkeypatch, webhooks_ml)
+
+
+@pytest.fixture
+def ml(monkeypatch):
+    """Token válido e multiget que devolve os anúncios de `ml.itens`"""
+    class ML:
+        itens = {}
+
+    async def multiget_falso(http, token, ids, atributos):
+        return {i: ML.itens[i] for i in ids if i in ML.itens}
+
+    monkeypatch.setattr(webhooks_ml, "buscar_itens_multiget", multiget_falso)
+    monkeypatch.setattr(
+        webhooks_ml, "get_ml_token_manager",
+        lambda: TokenManagerFalso({"user_id": "user-1", "access_token": "token"})
+    )
+    return ML
+
+
+def _item(ml_id):
+    return {"id": ml_id, "title": ml_id, "price": 10, "available_quantity": 1, "status": "active"}
+
+
+def _processar(jobs):
+    return asyncio.run(webhooks_ml.process_item_notifications_batch(jobs, http_client=object()))
+
+
+def test_lote_sem_token_devolve_todos_os_jobs_como_falha(monkeypatch, db):
+    monkeypatch.setattr(webhooks_ml, "get_ml_token_manager", lambda: TokenManagerFalso(None))
+
+    falhas = _processar([_job(1, "MLB1"), _job(2, "MLB2")])
+
+    assert set(falhas) == {1, 2}
+    assert all(isinstance(e, ValueError) for e in falhas.values())
+
+
+def test_lote_grava_todos_os_anuncios_em_um_upsert(db, ml):
+    ml.itens = {"MLB1": _item("MLB1"), "MLB2": _item("MLB2")}
+
+    falhas = _processar([_job(1, "MLB1"), _job(2, "MLB2"), _job(3, "MLB3")])
+
+    upserts = db.executadas("anuncios_ml", "upsert")
+    assert len(upserts) == 1
+    assert [l["ml_id"] for l in upserts[0].args("upsert")[0]] == ["MLB1", "MLB2"]
+    assert list(falhas) == [3]  # MLB3 não voltou do multiget
+
+
+def test_upsert_em_lote_com_erro_salva_linha_a_linha_e_so_falha_a_invalida(db, ml):
+    ml.itens = {"MLB1": _item("MLB1"), "MLB2": _item("MLB2")}
+
+    def responder(consulta):
+        if consulta.nome == "anuncios_ml":
+            linhas = consulta.args("upsert")[0]
+            if isinstance(linhas, list) or linhas["ml_id"] == "MLB2":
+                raise RuntimeError("violates check constraint")
+        return []
+
+    db.responder = responder
+
+    falhas = _processar([_job(1, "MLB1"), _job(2, "MLB2")])
+
+    assert len(db.executadas("anuncios_ml", "upsert")) == 3  # lote + uma por linha
+    assert list(falhas) == [2]
+    assert isinstance(falhas[2], RuntimeError)
+
+
+def test_log_do_lote_so_na_primeira_tentativa(db, ml):
+    ml.itens = {"MLB1": _item("MLB1"), "MLB2": _item("MLB2")}
+
+    _processar([_job(1, "MLB1", attempts=1), _job(2, "MLB2", attempts=3)])
+    logs = db.executadas("logs_sistema", "insert")
+    assert len(logs) == 1
+    assert len(logs[0].args("insert")[0]) == 1
+
+    _processar([_job(2, "MLB2", attempts=4)])
+    assert len(db.executadas("logs_sistema", "insert")) == 1  # retry não grava log de novo